@@ -0,0 +1,369 @@
+#!/usr/bin/env python
+
+import sys
+import os
+import argparse
+import functools
+import gc
+import json
+import math
+import random
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'biobab'))
+
+import numpy
+
+import basicdata
+import flexiblequeue
+import integersolution
+import lowerboundset
+import nodepriority
+import params
+import segment
+import treesearch
+import upperboundset
+
+# Microbenchmarks for the pure-Python parts of BIOBAB: LB set filtering and
+# splitting, UB set updates, node queues and brancher scores
+# Inputs are synthetic (no solver is needed): the LB set is a convex curve in
+# the objective space and UB points are integer points slightly above it
+# Each benchmark reports its throughput (operations per second, best of
+# several runs) and the memory it allocates (peak and retained, measured in a
+# separate run with tracemalloc). Results can be saved as a baseline and
+# compared with a previous baseline; baselines only make sense on the machine
+# they were recorded on
+
+# synthetic objective space: LB and UB sets lie in [0, width] x [0, width]
+def curve(x, width):
+    # convex and decreasing, with slopes between -1.5 and -.5
+    return (width - x) * (1 + (width - x) / width) / 2
+
+# n + 1 points of the convex curve, from left to right, far enough from
+# each other not to be merged by LB set calculations
+def convexPoints(n, width, rng):
+    xs = sorted(rng.sample(range(1, int(width) // 100), n - 1))
+    return [ (float(x), curve(x, width))
+             for x in [ 0 ] + [ 100 * x for x in xs ] + [ width ] ]
+
+# n non-dominated integer solutions close to the curve, sorted by z1
+def ubSolutions(n, width, rng, gap):
+    xs = sorted(rng.sample(range(int(width)), n))
+    solutions = []
+    previous = None
+    for x in xs:
+        y = math.ceil(curve(x, width) + rng.uniform(0, gap))
+        if previous is not None:
+            y = min(y, previous - 1)
+        previous = y
+        solutions.append(integersolution.IntegerSolution(z1=float(x),
+                                                         z2=float(y),
+                                                         variables={}))
+    return solutions
+
+def ubSet(solutions):
+    ub = upperboundset.UpperBoundSet()
+    ub.solutions = solutions
+    return ub
+
+# LB set of a node covering the whole objective space
+def lbSegments(points, width):
+    return [ segment.Segment(p1, p2, p2[0] if i < len(points) - 2 else width,
+                             width, None, None)
+             for i, (p1, p2) in enumerate(zip(points[:-1], points[1:])) ]
+
+# queued items only need what node keys look at
+class BenchmarkNode:
+    __slots__ = ('score', 'lbPoints', 'right', 'top', 'depth')
+
+    def __init__(self, score, lbPoints, right, top, depth):
+        self.score = score
+        self.lbPoints = lbPoints
+        self.right = right
+        self.top = top
+        self.depth = depth
+
+# Benchmarks
+# each benchmark is a function of the input size that builds its inputs and
+# returns (run, nOps): run is the function being timed, and performs nOps
+# operations; a new run function is built for each timed run, so inputs can
+# be modified by it
+
+# each segment filtered with the UB solution closest to its middle, 10 times
+def segmentFilter(size):
+    rng = random.Random(1)
+    width = 1e6
+    segments = lbSegments(convexPoints(size, width, rng), width)
+    solutions = ubSolutions(size, width, rng, width / 1000)
+    z1Values = [ u.z1 for u in solutions ]
+    pairs = []
+    for s in segments:
+        i = numpy.searchsorted(z1Values, (s.p1[0] + s.p2[0]) / 2)
+        pairs.append( (s, solutions[min(i, len(solutions) - 1)]) )
+    def run():
+        for i in range(10):
+            for s, u in pairs:
+                s.filter(u)
+    return run, 10 * len(pairs)
+
+# LB set with size segments filtered with a UB set of 2 * size solutions
+def lbFilter(size):
+    rng = random.Random(2)
+    width = 1e6
+    segments = lbSegments(convexPoints(size, width, rng), width)
+    ub = ubSet(ubSolutions(2 * size, width, rng, width / 200))
+    lb = lowerboundset.LowerBoundSet(list(segments))
+    def run():
+        lb.segments = list(segments)
+        lb.filter(ub)
+    return run, len(segments)
+
+# filtered LB sets are split in as many regions as there are gaps
+def filteredLB(size, seed):
+    rng = random.Random(seed)
+    width = 1e6
+    points = convexPoints(size, width, rng)
+    lb = lowerboundset.LowerBoundSet(lbSegments(points, width))
+    lb.filter(ubSet(ubSolutions(size // 4, width, rng, width / 500)))
+    return lb
+
+def lbDiscontinuousRegions(size):
+    lb = filteredLB(size, 3)
+    def run():
+        for i in range(1000):
+            lb.discontinuousRegions()
+    return run, 1000 * len(lb.segments)
+
+def lbSplit(size):
+    lb = filteredLB(size, 4)
+    segments = list(lb.segments)
+    ub = upperboundset.UpperBoundSet()
+    def run():
+        for i in range(500):
+            split = lowerboundset.LowerBoundSet(list(segments))
+            split.split(None, ub)
+    return run, 500 * len(segments)
+
+# large UB sets take a while to generate: they are generated once per size
+# the second set is made of other solutions of the same kind
+@functools.lru_cache(maxsize=None)
+def largeUBSolutions(size):
+    rng = random.Random(5)
+    width = 10.0 * size
+    return ( ubSolutions(size, width, rng, 20),
+             ubSolutions(size, width, rng, 20) )
+
+# 1000 candidate solutions near the UB set, most of them dominated
+def ubUpdate(size):
+    rng = random.Random(6)
+    width = 10.0 * size
+    solutions, others = largeUBSolutions(size)
+    candidates = [ integersolution.IntegerSolution(
+        z1=float(x), z2=float(math.ceil(curve(x, width) + rng.uniform(-5, 20))),
+        variables={})
+                   for x in rng.sample(range(int(width)), 1000) ]
+    ub = ubSet(solutions)
+    def run():
+        for u in candidates:
+            ub.updateWithSolution(u)
+    return run, len(candidates)
+
+def ubMerge(size):
+    solutions, others = largeUBSolutions(size)
+    def run():
+        ub = ubSet(solutions)
+        ub.merge(others)
+    return run, len(others)
+
+# size nodes pushed, then popped
+def queue(mode, keyName=None):
+    def benchmark(size):
+        rng = random.Random(7)
+        width = 1e6
+        nodes = []
+        for i in range(size):
+            x = rng.uniform(0, width)
+            y = curve(x, width)
+            points = [ (x, y), (x + 10, y - 10) ] if keyName else None
+            nodes.append(BenchmarkNode(rng.random(), points, x + 100,
+                                       y + 100, rng.randrange(30)))
+        if keyName:
+            ub = ubSet(ubSolutions(1000, width, rng, width / 100))
+            key = nodepriority.nodeKey(keyName, ub)
+        else:
+            key = None
+        def run():
+            q = flexiblequeue.Queue(mode, key)
+            for n in nodes:
+                q.push(n)
+            while not q.empty():
+                q.pop()
+        return run, 2 * size
+    return benchmark
+
+# scores of 1000 integer variables at the points of an LB set
+def brancherScores(brancherClass):
+    def benchmark(size):
+        rng = numpy.random.default_rng(8)
+        values = rng.random( (size, 1000) )
+        values[values < .5] = 0
+        values[values > .9] = 1
+        brancher = brancherClass()
+        def run():
+            for i in range(100):
+                brancher.scores(None, values)
+        return run, 100 * values.size
+    return benchmark
+
+# name, function, sizes (quick sizes are used with --quick)
+benchmarks = [
+    ('segment-filter', segmentFilter, [ 10000 ], [ 1000 ]),
+    ('lb-filter', lbFilter, [ 100, 500 ], [ 100 ]),
+    ('lb-discontinuous-regions', lbDiscontinuousRegions, [ 1000 ], [ 100 ]),
+    ('lb-split', lbSplit, [ 1000 ], [ 100 ]),
+    ('ub-update', ubUpdate, [ 1000, 100000, 1000000 ], [ 1000, 10000 ]),
+    ('ub-merge', ubMerge, [ 1000, 100000 ], [ 1000 ]),
+    ('queue-fifo', queue('fifo'), [ 1000000 ], [ 100000 ]),
+    ('queue-lifo', queue('lifo'), [ 1000000 ], [ 100000 ]),
+    ('queue-best-area', queue('best'), [ 1000000 ], [ 100000 ]),
+    ('queue-best-hypervolume', queue('best', 'hypervolume'), [ 100000 ],
+     [ 10000 ]),
+    ('scores-closest-to-one',
+     brancherScores(treesearch.ClosestToOneBinaryPriorityBrancher),
+     [ 200 ], [ 50 ]),
+    ('scores-furthest-to-one',
+     brancherScores(treesearch.FurthestToOneBinaryPriorityBrancher),
+     [ 200 ], [ 50 ]),
+    ('scores-often-fractional',
+     brancherScores(treesearch.OftenFractionalBinaryPriorityBrancher),
+     [ 200 ], [ 50 ]),
+    ('scores-fractional-on-average',
+     brancherScores(treesearch.FractionalOnAverageBinaryPriorityBrancher),
+     [ 200 ], [ 50 ]),
+    ('scores-fractional-average',
+     brancherScores(treesearch.FractionalAverageBinaryPriorityBrancher),
+     [ 200 ], [ 50 ]),
+]
+
+# best time over several runs, then memory allocated by one more run
+def measure(function, size, repeat):
+    times = []
+    for r in range(repeat):
+        run, nOps = function(size)
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    run, nOps = function(size)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    run()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    best = min(times)
+    return { 'ops': nOps,
+             'seconds': best,
+             'opsPerSecond': nOps / best if best > 0 else float('inf'),
+             'peakBytes': peak - before,
+             'retainedBytes': current - before }
+
+def humanBytes(n):
+    for unit in [ 'B', 'KB', 'MB' ]:
+        if abs(n) < 1024:
+            return '%.1f%s' % (n, unit)
+        n /= 1024.0
+    return '%.1fGB' % n
+
+# regressions of a result with respect to its baseline
+def regressions(result, baseline, tolerance):
+    problems = []
+    if result['opsPerSecond'] < (1 - tolerance) * baseline['opsPerSecond']:
+        problems.append('throughput %.0f%% of baseline' %
+                        (100 * result['opsPerSecond'] /
+                         baseline['opsPerSecond']))
+    # small allocations vary with the interpreter state
+    if result['peakBytes'] > (1 + tolerance) * baseline['peakBytes'] + 65536:
+        problems.append('peak memory ' + humanBytes(result['peakBytes']) +
+                        ' instead of ' + humanBytes(baseline['peakBytes']))
+    return problems
+
+def parse():
+    parser = argparse.ArgumentParser(
+        description='microbenchmarks of the pure-Python parts of BIOBAB')
+    parser.add_argument('-b', '--benchmark',
+                        dest='selected', action='append',
+                        help='only run benchmarks whose name contains this ' +
+                        '(can be repeated)')
+    parser.add_argument('-q', '--quick',
+                        help='smaller inputs', action='store_true')
+    parser.add_argument('-r', '--repeat',
+                        help='timed runs per benchmark (best one is kept)',
+                        type=int, default=5)
+    parser.add_argument('-s', '--save',
+                        help='save results as a baseline in this JSON file')
+    parser.add_argument('-c', '--compare',
+                        help='compare results with the baseline in this file')
+    parser.add_argument('-t', '--tolerance',
+                        help='relative slowdown or memory growth reported ' +
+                        'as a regression',
+                        type=float, default=.2)
+    parser.add_argument('-l', '--list',
+                        help='list benchmarks and exit', action='store_true')
+    return parser.parse_args()
+
+def main():
+    args = parse()
+    # synthetic instance with integer objective values
+    params.inputData = basicdata.BasicData()
+    params.verbosity = 0
+    selected = [ (name, function, quick if args.quick else sizes)
+                 for name, function, sizes, quick in benchmarks
+                 if not args.selected or
+                 any(s in name for s in args.selected) ]
+    if args.list:
+        for name, function, sizes in selected:
+            print(name, sizes)
+        return
+    baseline = {}
+    if args.compare:
+        try:
+            with open(args.compare) as f:
+                baseline = json.load(f)['results']
+        except (IOError, ValueError, KeyError):
+            print('Error: cannot read baseline', args.compare)
+            sys.exit(1)
+    results = {}
+    nRegressions = 0
+    print('%-36s %12s %10s %10s %10s' % ('benchmark', 'ops/s', 'time',
+                                         'peak', 'retained'))
+    for name, function, sizes in selected:
+        for size in sizes:
+            key = name + '/' + str(size)
+            result = measure(function, size, args.repeat)
+            results[key] = result
+            print('%-36s %12.0f %9.3fs %10s %10s' %
+                  (key, result['opsPerSecond'], result['seconds'],
+                   humanBytes(result['peakBytes']),
+                   humanBytes(result['retainedBytes'])))
+            if key in baseline:
+                problems = regressions(result, baseline[key], args.tolerance)
+                for p in problems:
+                    print('\tREGRESSION:', p)
+                nRegressions += len(problems) > 0
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({ 'python': sys.version,
+                        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                        'quick': args.quick,
+                        'results': results }, f, indent=1, sort_keys=True)
+        print('Saved results to', args.save)
+    if args.compare:
+        print(nRegressions, 'regression(s) with respect to', args.compare)
+        if nRegressions > 0:
+            sys.exit(2)
+
+if __name__ == '__main__':
+    main()
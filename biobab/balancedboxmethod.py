@@ -1,12 +1,18 @@
 import sys
 
+import numpy
+
+import checkpoint
 import params
+import profiler
 import util
 import integersolution
 import flexiblequeue
 import treesearch
 import biobabnode
 import upperboundset
+import workerpool
+import dominance
 
 from weightedsumsolver import WeightedSumSolver, LexminSolver
 
@@ -26,16 +32,52 @@ class Rectangle:
         return point[0] >= self.z1[0] and point[0] <= self.z2[0] and  \
             point[1] >= self.z2[1] and point[1] <= self.z1[1]
 
+    # solutions of UB set ubSet that are in this rectangle, in the same order
+    def solutionsIn(self, ubSet):
+        z1, z2 = dominance.objectiveArrays(ubSet)
+        mask = dominance.inRectangleMask(z1, z2, self.z1[0], self.z2[0],
+                                         self.z2[1], self.z1[1])
+        return [ ubSet.solutions[i] for i in numpy.flatnonzero(mask) ]
+
     # negative area comparison
     def __lt__(self, other):
         return self.score < other.score
         
+# balanced box method of a worker process, built with its first rectangle and
+# used for all the following ones
+workerMethod = None
+
+# explore rectangle R in a worker process (see workerpool)
+# returns the rectangles that should be explored next and the new UB solutions
+def exploreRectangleInWorker(lp, ub, payload):
+    global workerMethod
+    relaxed, right, top, area, R = payload
+    if workerMethod is None or workerMethod.relaxed != relaxed:
+        workerMethod = BalancedBoxMethod(relaxed)
+    method = workerMethod
+    method.right, method.top, method.area = right, top, area
+    known = set( id(u) for u in ub.solutions )
+    try:
+        method.exploreRectangle(R, lp, ub)
+        rectangles = method.queue.items()
+    finally:
+        # the queue only holds the rectangles of the current one
+        while not method.queue.empty():
+            method.queue.pop()
+    return rectangles, [ u for u in ub.solutions if not id(u) in known ]
+
 class BalancedBoxMethod(treesearch.TreeSearch):
-    def __init__(self, relaxed, strategy='breadth', nodeClass=biobabnode.Node):
+    def __init__(self, relaxed, strategy='breadth', nodeClass=biobabnode.Node,
+                 nJobs=1):
         treesearch.TreeSearch.__init__(self,
                                        strategy='best',
-                                       nodeClass=nodeClass)
+                                       nodeClass=nodeClass,
+                                       nJobs=nJobs)
         self.relaxed = relaxed
+        # area of the initial rectangle, known once it is computed
+        self.area = None
+        # rectangles being explored (by worker processes in parallel mode)
+        self.running = {}
         # used multiple times
         if relaxed:
             self.wsSolver = WeightedSumSolver()
@@ -53,8 +95,7 @@ class BalancedBoxMethod(treesearch.TreeSearch):
             point = self.wsSolver.solve(lp, w1, w2, right, top, self.harvested)
         else:
             point = lp.solveWeightedSum(w1, w2, right, top, self.harvested)
-        for u in self.harvested.solutions:
-            ub.updateWithSolution(u)
+        ub.merge(self.harvested.solutions)
         return point
 
     # push rectangle R into the queue of rectangles to process, but only if
@@ -67,7 +108,16 @@ class BalancedBoxMethod(treesearch.TreeSearch):
                 print('(BBM)\tPushing', R)
             self.queue.push(R)
             
-    def search(self, lp, ubSet):
+    # search state saved in checkpoints: rectangles that remain to be
+    # explored, including the ones being explored, and area of the initial
+    # rectangle
+    def getState(self):
+        state = treesearch.TreeSearch.getState(self, self.running.values())
+        state['area'] = self.area
+        return state
+
+    # if state is given (see getState), the search is resumed from there
+    def search(self, lp, ubSet, state=None):
         # initialisations...
         self.right = lp.validBoundRight or params.inputData.boundRight()
         self.top = lp.validBoundTop or params.inputData.boundTop()
@@ -75,30 +125,76 @@ class BalancedBoxMethod(treesearch.TreeSearch):
         print('and boundTop =', self.top)
         # queue of boxes that still need to be processed
         try:
-            # extreme points
-            #zT = lp.lexmin(1, self.right, self.top, ubSet)
-            zT = self.solveLexmin(lp, 1, self.right, self.top, ubSet)
-            print(util.TS() + '\t\tzT:\tz1 =', zT[0], '\tz2 =', zT[1])
-            #zB = lp.lexmin(2, self.right, self.top, ubSet)
-            zB = self.solveLexmin(lp, 2, self.right, self.top, ubSet)
-            print(util.TS() + '\t\tzB:\tz1 =', zB[0], '\tz2 =', zB[1])
-            self.area = (zB[0] - zT[0]) * (zT[1] - zB[1])
-            if params.verbosity > 1:
-                print('Area of initial rectangle:', self.area)
-            # add the first box to the list of boxes that need to be processed
-            self.pushIfMust( Rectangle(zT, zB) )
+            if state is None:
+                # extreme points
+                #zT = lp.lexmin(1, self.right, self.top, ubSet)
+                zT = self.solveLexmin(lp, 1, self.right, self.top, ubSet)
+                print(util.TS() + '\t\tzT:\tz1 =', zT[0], '\tz2 =', zT[1])
+                #zB = lp.lexmin(2, self.right, self.top, ubSet)
+                zB = self.solveLexmin(lp, 2, self.right, self.top, ubSet)
+                print(util.TS() + '\t\tzB:\tz1 =', zB[0], '\tz2 =', zB[1])
+                self.area = (zB[0] - zT[0]) * (zT[1] - zB[1])
+                if params.verbosity > 1:
+                    print('Area of initial rectangle:', self.area)
+                # add the first box to the list of boxes that need to be
+                # processed
+                self.pushIfMust( Rectangle(zT, zB) )
+            else:
+                self.area = state['area']
+                self.start(None, state)
             # main loop
+            if self.nJobs > 1:
+                self.exploreInParallel(ubSet)
             while not self.queue.empty():
+                checkpoint.saveIfDue(ubSet, self.getState)
                 R = self.queue.pop()
+                self.running = { 0: R }
                 self.exploreRectangle(R, lp, ubSet)
+                self.running = {}
+            checkpoint.save(ubSet, None)
         # we're done
         except util.TimeLimitReachedException as e:
             print(e)
+            # nothing to resume before the initial rectangle is known
+            if self.area is not None:
+                checkpoint.save(ubSet, self.getState())
         print(util.TS() + '\tbalanced box method is over')        
 
+    # main loop of search, where rectangles are explored by a pool of worker
+    # processes, each with its own copy of the model
+    # largest rectangles are still sent first; the rectangles created by the
+    # workers and the UB solutions they find come back to this process,
+    # which keeps the reference UB set and shares them with other workers
+    def exploreInParallel(self, ubSet):
+        print(util.TS() + '\texploring rectangles with', self.nJobs, end=' ')
+        print('workers')
+        pool = workerpool.WorkerPool(self.nJobs)
+        pool.share(ubSet.solutions)
+        try:
+            while not self.queue.empty() or pool.busy():
+                checkpoint.saveIfDue(ubSet, self.getState)
+                while pool.hasIdleWorker() and not self.queue.empty():
+                    R = self.queue.pop()
+                    workerId = pool.submit(exploreRectangleInWorker,
+                                           (self.relaxed, self.right, self.top,
+                                            self.area, R))
+                    self.running[workerId] = R
+                workerId, (rectangles, newSolutions) = pool.result()
+                del self.running[workerId]
+                ubSet.merge(newSolutions)
+                pool.share(newSolutions)
+                for R in rectangles:
+                    self.queue.push(R)
+        except util.TimeLimitReachedException as e:
+            ubSet.merge(pool.interruptedSolutions())
+            raise e
+        finally:
+            pool.close()
+
     # explore rectangle R
     # side effect: self.queue is updated with new rectangles that
     # should be explored
+    @profiler.timed('rectangle')
     def exploreRectangle(self, R, lp, ubSet):
         if params.verbosity > 1:
             print('(BBM)')
@@ -187,13 +283,13 @@ class BalancedBoxMethod(treesearch.TreeSearch):
             if z1Hat.z1 < z1Bar[0] - util.epsilon:
                 z2Bar = self.solveWS(lp, 1, 0, Rt.z2[0], z1Hat.z2, ubSet)
             else:
-                lHat.solutions = [ zi for zi in lHat.solutions
-                                   if (zi.z1, zi.z2) in Rt and zi != z1Hat ]
+                lHat.solutions = [ zi for zi in Rt.solutionsIn(lHat)
+                                   if zi != z1Hat ]
                 z2Bar = self.solveLexmin(lp, 2, Rt.z2[0], Rt.z1[1], ubSet, R)
             if z2Bar and not util.closeEnough(z2Bar, R.z1):
                 tmpR = Rectangle(R.z1, z2Bar)
-                lHat.solutions = [ zi for zi in lHat.solutions
-                                   if (zi.z1, zi.z2) in tmpR and zi != z1Hat
+                lHat.solutions = [ zi for zi in tmpR.solutionsIn(lHat)
+                                   if zi != z1Hat
                                    and (zi.z1, zi.z2) != z2Bar ]
                 if len(lHat.solutions) == 0:
                     done = True
@@ -211,7 +307,5 @@ class BalancedBoxMethod(treesearch.TreeSearch):
         z2 = ( R.z2[0] - params.inputData.z1Epsilon,
                R.z2[1] + params.inputData.z2Epsilon )
         newRect = Rectangle(z1, z2)
-        for u in ubSet.solutions:
-            if (u.z1, u.z2) in newRect:
-                ub.updateWithSolution(u)
+        ub.merge(newRect.solutionsIn(ubSet))
         return ub
@@ -1,90 +1,234 @@
+import sys
 import time
 
+import numpy
+
 import integersolution
+import lpbackend
+import lpcache
+import profiler
 import upperboundset
-import grbvalues
 import params
 import util
 
-from gurobipy import *
-
 integralityEpsilon = 1e-6
 # true if value represents a fractional value for a binary variable
 def isFractional(value):
     return value > integralityEpsilon and value < 1 - integralityEpsilon
 
+# same as isFractional, for an array of values
+def fractionalMask(values):
+    return (values > integralityEpsilon) & (values < 1 - integralityEpsilon)
+
 # main callback wrapper
 def callbackWrapper(model, where):
     for contexts, callback in model._parent.callbacks:
         if where in contexts:
             callback(model, where)
 
+# callbacks are only used with the Gurobi backend (the HiGHS backend checks
+# the time limit and reports incumbents by itself)
 # callbacks always take two parameters, model and where
-# this simple callback checks the CPU time limit
+# this simple callback checks the time limit
 def checkTimeLimitCallback(model, where):
     if params.timeLimit and util.isTimeUp(raiseException=False):
         model.terminate()
-        
+
+# collect each new incumbent found while solving a MIP (see
+# BasicLP.harvestedSolutions)
+def harvestIncumbentCallback(model, where):
+    lp = model._parent
+    if params.harvestIncumbents and lp.incumbents is not None:
+        lp.newIncumbent(numpy.array(model.cbGetSolution(lp.variables())))
+
+# batch of bound changes, committed to the model all at once followed by a
+# single model update
+class ModelChanges:
+    def __init__(self, lp):
+        self.lp = lp
+        # for each bound type, new bound value for each variable
+        self.bounds = { lpbackend.LB: {}, lpbackend.UB: {} }
+
+    def setBound(self, var, boundType, value):
+        self.bounds[boundType][var] = value
+
+    def commit(self):
+        for boundType, values in self.bounds.items():
+            if len(values) > 0:
+                self.lp.backend.setBounds(boundType, list(values.keys()),
+                                          list(values.values()))
+        self.lp.backend.update()
+
 class BasicLP:
 
     nLPs = 0
     lastSavedModel=0
 
+    # cache for solutionValues()
+    lastSolutionValues = None
+    # solution pool of the last weighted-sum LP when it was replayed from the
+    # LP cache (see replaySolve), None if it was solved
+    replayedPool = None
+
+    # branching decisions currently applied to the model
+    # (a biobabnode.DecisionPath, None if there is none)
+    appliedPath = None
+
     validBoundRight = util.infinity
     validBoundTop = util.infinity
 
     # list of pairs of the form: ( set([contexts]), callback )
     # then every time the main callback is called, it checks the context and
     # calls the callbacks accordingly
-    callbacks = [ ( set([ GRB.Callback.MIPNODE ]), checkTimeLimitCallback) ]
+    callbacks = [ ( set([ lpbackend.MIPNODE ]), checkTimeLimitCallback),
+                  ( set([ lpbackend.MIPSOL ]), harvestIncumbentCallback) ]
+
+    # integer solutions collected by harvestIncumbentCallback during the
+    # current solve (None outside of solveWeightedSum)
+    incumbents = None
+
+    # create the solver model (self.model) and its backend (self.backend),
+    # with the solver selected in params.solverBackend
+    # models are built through the backend (see lpbackend)
+    def createModel(self, name):
+        self.backend = lpbackend.newBackend(name, self)
+        self.model = self.backend.model
     
     def showSol(self):
-        for var in self.model.getVars():
-            if var.getAttr(GRB.Attr.X) > 0:
-                print(var.getAttr(GRB.Attr.VarName), var.getAttr(GRB.Attr.X))
+        values = self.solutionValues()
+        nonZeros = [ self.variables()[i] for i in numpy.flatnonzero(values > 0) ]
+        for var, name, value in zip(nonZeros,
+                                    self.variableNames(nonZeros),
+                                    values[values > 0]):
+            print(name, value)
                 
     def exportModel(self, fName='debug'):
-        self.model.update()
+        self.backend.update()
         BasicLP.lastSavedModel += 1        
         modelFileName = fName + ('-%04d' % BasicLP.lastSavedModel) + '.lp'
-        self.model.write(modelFileName)
+        self.backend.write(modelFileName)
         print('Exported model to', modelFileName)
             
+    # values of all variables in the last solution found by solveWeightedSum
+    # they are fetched from the solver in one call, then cached until the next
+    # call to solveWeightedSum
+    # pre-condition: the model has been solved
+    def solutionValues(self):
+        if self.lastSolutionValues is None:
+            self.lastSolutionValues = self.backend.values(self.variables())
+        return self.lastSolutionValues
+
+    # indices of the integer variables in the model
+    def integerIndices(self):
+        try:
+            return self.integerVarIndices
+        except AttributeError:
+            self.integerVarIndices = numpy.array([ z.index
+                                                   for z in self.integerVars ],
+                                                 dtype=int)
+            return self.integerVarIndices
+
+    # branching priority of each integer variable
+    # priorities are set when the model is built, so they are cached
+    def branchPriorities(self):
+        try:
+            return self.integerVarPriorities
+        except AttributeError:
+            self.integerVarPriorities = \
+                numpy.array(self.backend.branchPriorities(self.integerVars))
+            return self.integerVarPriorities
+
+    # position of an integer variable in self.integerVars, given its index
+    def integerPosition(self, varIndex):
+        try:
+            return self.integerVarPositions[varIndex]
+        except AttributeError:
+            self.integerVarPositions = { z.index: i
+                                         for i, z in
+                                         enumerate(self.integerVars) }
+            return self.integerVarPositions[varIndex]
+
+    # indices, coefficients and constant of a linear expression, used to
+    # evaluate it for a whole vector of variable values at once
+    def linearCoefficients(self, expr):
+        return self.backend.linearCoefficients(expr)
+
+    # objective values for a vector of values of all variables
+    def objectiveValues(self, values):
+        try:
+            self.objectiveCoefficients
+        except AttributeError:
+            self.objectiveCoefficients = \
+                [ self.linearCoefficients(self.z1Expr),
+                  self.linearCoefficients(self.z2Expr) ]
+        return tuple( float(numpy.dot(values[indices], coefficients)) +
+                      constant
+                      for indices, coefficients, constant
+                      in self.objectiveCoefficients )
+
     def integerSolution(self):
-        for z in self.integerVars:
-            if isFractional( z.getAttr(GRB.Attr.X) ):
-                return False
-        return True
+        values = self.solutionValues()[self.integerIndices()]
+        return not fractionalMask(values).any()
                                 
     # pre-condition: the model has been solved
     def getDataOnIntegers(self):
-        return [ ( z, z.getAttr(GRB.Attr.X) ) for z in self.integerVars ]
+        return list(zip(self.integerVars,
+                        self.solutionValues()[self.integerIndices()].tolist()))
 
     # pre-condition: the model has been solved
     def getNonZeros(self):
-        vars = {}
-        for var in self.model.getVars():
-            if var.getAttr(GRB.Attr.X) > 0:
-                vars[var] = var.getAttr(GRB.Attr.X)
-        return vars
+        values = self.solutionValues()
+        variables = self.variables()
+        return { variables[i]: float(values[i])
+                 for i in numpy.flatnonzero(values > 0).tolist() }
         
+    # all solver variables in the model
+    # variables are never added once the model is built, so the list is cached
+    def variables(self):
+        try:
+            return self.allVars
+        except AttributeError:
+            self.allVars = self.backend.variables()
+            return self.allVars
+
+    # solver variable with a given index in the model
+    def variable(self, index):
+        return self.variables()[index]
+
+    # without params.modelNames, variables have no name in the solver: their
+    # names are given by variableName
+    def variableNames(self, variables):
+        if params.modelNames:
+            return self.backend.variableNames(variables)
+        else:
+            return [ self.variableName(x.index) for x in variables ]
+
+    # name of the variable with a given index, for models that do not name
+    # their variables in the solver
+    def variableName(self, index):
+        return self.backend.variableNames([ self.variable(index) ])[0]
+
+    # change one bound of a variable
+    def setBound(self, var, boundType, value):
+        self.backend.setBounds(boundType, [ var ], [ value ])
+
     # get objective value of the current solution
     # pre-condition: the model has been solved
     def getObjectiveValue(self):
-        return self.model.getObjective().getValue()
+        return self.backend.objectiveValue()
 
     # Add a constraint to the model
     # The added constraint is returned so that it can later be removed
     def addConstraint(self, constraint):
-        return self.model.addConstr(constraint)
+        return self.backend.addConstr(constraint)
 
     # Remove a constraint from the model
     def removeConstraint(self, constraint):
-        self.model.remove(constraint)
+        self.backend.removeConstr(constraint)
 
     # was a feasible solution found when last solving this model?
     def optimumFound(self):
-        return self.model.getAttr('status') == GRB.OPTIMAL
+        return self.backend.status() == lpbackend.OPTIMAL
 
     def updateBounds(self, right, top):
         # do we need to update the model at the end?
@@ -92,95 +236,124 @@ class BasicLP:
         # do we need a right bound?
         if right < util.infinity:
             try:
-                self.z1Bound.setAttr('RHS', right)
+                self.backend.setRHS(self.z1Bound, right)
             except Exception:
-                self.z1Bound = self.model.addConstr( self.z1Expr <= right,
-                                                     name='boundRight' )
+                self.z1Bound = self.backend.addConstr( self.z1Expr <= right,
+                                                       name='boundRight' )
                 atLeastOne = True
         else: # if not...
             try:
                 atLeastOne = True
-                self.model.remove(self.z1Bound)
+                self.backend.removeConstr(self.z1Bound)
             except Exception as e:
                 pass
         # now do we need a top bound?
         if top < util.infinity:
             try:
-                self.z2Bound.setAttr('RHS', top)
+                self.backend.setRHS(self.z2Bound, top)
             except Exception:
-                self.z2Bound = self.model.addConstr( self.z2Expr <= top,
-                                                     name='boundTop' )
+                self.z2Bound = self.backend.addConstr( self.z2Expr <= top,
+                                                       name='boundTop' )
                 atLeastOne = True
         else:
             try:
                 atLeastOne = True
-                self.model.remove(self.z2Bound)
+                self.backend.removeConstr(self.z2Bound)
             except Exception as e:
                 pass
         # update model if necessary
         if atLeastOne:
-            self.model.update()
+            self.backend.update()
 
     def feasibleSolution(self, sol):
         # check if non-zeros are allowed
-        for var, value in sol.vars.items():
-            if value > var.getAttr(GRB.Attr.UB):
-                return False
-        # check if variables that should be non-zeros actually are non-zero
-        for var in self.integerVars:
-            if var.getAttr(GRB.Attr.LB) > 0:
-                if (not var in sol.vars) or \
-                   sol.vars[var] < var.getAttr(GRB.Attr.LB):
+        if len(sol.vars) > 0:
+            upperBounds = self.backend.getBounds(lpbackend.UB,
+                                                 list(sol.vars.keys()))
+            for value, upperBound in zip(sol.vars.values(), upperBounds):
+                if value > upperBound:
                     return False
+        # check if variables that should be non-zeros actually are non-zero
+        lowerBounds = numpy.array(self.backend.getBounds(lpbackend.LB,
+                                                         self.integerVars))
+        for i in numpy.flatnonzero(lowerBounds > 0).tolist():
+            var = self.integerVars[i]
+            if (not var in sol.vars) or sol.vars[var] < lowerBounds[i]:
+                return False
         return True
     
+    @profiler.timed('weighted-sum')
     def solveWeightedSum(self, w1, w2, right, top, upperBound):
         if params.verbosity > 2:
             print('*** optimising weighted sum:', w1, w2, '\t|\tz1 <=', \
                 right, '\t|\tz2 <=', top)
+        # the same LP may have been solved before
+        cache = lpcache.getCache()
+        key = None
+        if cache is not None:
+            key = cache.key(self, w1, w2, right, top)
+            entry = cache.get(key) if key is not None else None
+            if entry is not None:
+                return self.replaySolve(entry, upperBound)
         # update bounds
         self.updateBounds(right, top)
         # update objective function
-        self.model.setObjective(w1 * self.z1Expr + w2 * self.z2Expr,
-                                GRB.MINIMIZE)
-        self.model.update()
+        self.backend.setObjective(w1 * self.z1Expr + w2 * self.z2Expr)
+        self.backend.update()
         #
         # help the MIP solver in case we're solving a MIP:
         # use best known upper bound
         if params.mipCutoff:
-            cutoff = GRB.INFINITY
-            if len(upperBound.solutions) > 0:
-                for u in upperBound.solutions:
-                    if u.z1 <= right and u.z2 <= top and \
-                       u.z1 * w1 + u.z2 * w2 < cutoff:
-                        # it is a good candidate for cutoff, let's make sure it
-                        # respects all current branching decisions
-                        if self.feasibleSolution(u):
-                            cutoff = u.z1 * w1 + u.z2 * w2
-                            cutoffPoint = (u.z1, u.z2)
-            self.model.params.Cutoff = cutoff - 1e-7
+            cutoff = None
+            # candidates are considered from best to worst: the first one
+            # that respects all current branching decisions is the cutoff
+            candidates = sorted(upperBound.inBox(right, top),
+                                key=lambda u: u.z1 * w1 + u.z2 * w2)
+            for u in candidates:
+                if self.feasibleSolution(u):
+                    cutoff = u.z1 * w1 + u.z2 * w2
+                    cutoffPoint = (u.z1, u.z2)
+                    break
+            self.backend.setCutoff(None if cutoff is None else cutoff - 1e-7)
+        # the solver stops by itself when the time limit is reached, even
+        # in an LP or in a MIP between two MIPNODE callbacks
+        if params.timeLimit:
+            self.backend.setTimeLimit(util.remainingTime())
         # solve it ffs
-        self.optimize()
+        self.incumbents = []
+        with profiler.phase('solver'):
+            self.optimize()
+        self.lastSolutionValues = None
+        self.replayedPool = None
         if params.mipCutoff:
-            self.model.params.Cutoff = GRB.INFINITY
-        # Gurobi doesn't count the root node
-        self.__class__.nLPs += 1 + int(self.model.getAttr('NodeCount'))
-        # check if time limit was reached
+            self.backend.setCutoff(None)
+        # integer solutions met by the MIP solver are kept even if the time
+        # limit is reached
+        harvested = self.harvestedSolutions()
+        if len(harvested) > 0:
+            upperBound.merge(harvested)
+        # the root node is not counted by the solver
+        self.__class__.nLPs += 1 + self.backend.nodeCount()
+        # check if time limit was reached; the solver measures time on its
+        # own, so it may stop a little before the limit
         if params.timeLimit:
-            util.isTimeUp(self.model)
+            if self.backend.status() == lpbackend.TIME_LIMIT:
+                raise util.timeLimitReached()
+            util.isTimeUp()
         if params.debug:
             self.exportModel(params.outputFilePrefix + '-debug')
         # return newly found point
-        if self.model.getAttr('status') == GRB.OPTIMAL:
+        status = self.backend.status()
+        if status == lpbackend.OPTIMAL:
             if params.verbosity > 3:
                 print(self.getNonZeros())
             if params.verbosity > 2:
                 print('\tobjective values:', self.z1(), self.z2())
                 print('\tweighted sum:', self.getObjectiveValue())
             # if it is integer, update upperBound with it
+            found = []
             if self.integerSolution():
-                newSol = params.solutionClass(self)
-                upperBound.updateWithSolution(newSol)
+                found.append(params.solutionClass(self))
             else:
                 try:
                     # stop right here if there doesn't exist a heuristic for
@@ -189,42 +362,72 @@ class BasicLP:
                     # otherwise make integer solutions out of this
                     # fractional solution
                     newSol = params.solutionClass(self)
-                    harvest = newSol.integerHeuristic(self)
-                    for newHeuristicSolution in harvest:
-                        upperBound.updateWithSolution(newHeuristicSolution)
+                    found = list(newSol.integerHeuristic(self))
                 except Exception as e:
                     pass
+            upperBound.merge(found)
             if w1 == 0:
-                return self.z1(), self.getObjectiveValue() / w2
+                point = self.z1(), self.getObjectiveValue() / w2
             elif w2 == 0:
-                return self.getObjectiveValue() / w1, self.z2()
+                point = self.getObjectiveValue() / w1, self.z2()
             else:
-                return self.z1(), self.z2()
-        elif params.mipCutoff and self.model.getAttr('status') == GRB.CUTOFF:
+                point = self.z1(), self.z2()
+            if key is not None:
+                values = self.solutionValues()
+                indices = numpy.flatnonzero(values)
+                # the pool of an LP is its optimal solution, which is
+                # restored from the cached values
+                pool = self.getSolutionPoolVectors().solutions \
+                    if self.backend.isMIP() else None
+                cache.put(key, (point, indices, values[indices],
+                                harvested + found, pool))
+            return point
+        elif params.mipCutoff and status == lpbackend.CUTOFF:
             if params.verbosity > 2:
                 print('\tcutoff point', cutoffPoint, 'is optimal')
             return cutoffPoint
         else:
-            if self.model.getAttr('status') != GRB.INFEASIBLE and \
-               self.model.getAttr('status') != GRB.INF_OR_UNBD:
+            if status != lpbackend.INFEASIBLE and \
+               status != lpbackend.INF_OR_UNBD:
                 print('Unexpected status:', end=' ')
-                print(grbvalues.status[self.model.getAttr('status')])
+                print(self.backend.statusName())
                 self.exportModel('unexpected')
+            elif key is not None:
+                cache.put(key, (None, numpy.empty(0, dtype=int),
+                                numpy.empty(0), [], []))
             return None
 
-    # wrapper for calling gurobi to solve the current model ; important to
+    # same effect as solving again an LP cached by solveWeightedSum: the
+    # solution values and the solution pool are restored and the integer
+    # solutions found with it are merged into the UB set
+    def replaySolve(self, entry, upperBound):
+        point, indices, values, solutions, pool = entry
+        if params.verbosity > 2:
+            print('\tcached result:', point)
+        self.lastSolutionValues = numpy.zeros(len(self.variables()))
+        self.lastSolutionValues[indices] = values
+        if pool is None:
+            pool = [ self.solutionFromValues(self.lastSolutionValues) ] \
+                if point is not None else []
+        self.replayedPool = pool
+        upperBound.merge(solutions)
+        return point
+
+    # wrapper for calling the solver on the current model ; important to
     # encapsulate it so that callbacks are easily added
     # (by overloading this method)
     def optimize(self):
-        self.model.optimize(callbackWrapper)
+        self.backend.optimize(callbackWrapper)
 
     def z1(self):
-        return self.z1Expr.getValue()
+        return self.backend.value(self.z1Expr)
     
     def z2(self):
-        return self.z2Expr.getValue()
+        return self.backend.value(self.z2Expr)
 
     # lexicographic min with specified objective as first objective
+    @profiler.timed('lexmin')
+    @util.reserved('lexmin')
     def lexmin(self, objective, boundRight, boundTop, upperBound):
         if params.lexminMethod == 'lex':
             return self.lexminLexicographic(objective, boundRight, boundTop,
@@ -260,29 +463,50 @@ class BasicLP:
             right, top = self.data.boundRight(), eTmp[1]
         return self.solveWeightedSum(w2, w1, right, top, upperBound)
 
-    # objective values of each solution in the solution pool
+    # integer solution with the given values of all variables
+    # objective values are rounded the same way as for the current solution
+    # of the model (see IntegerSolution)
+    def solutionFromValues(self, values):
+        allVars = self.variables()
+        variables = { allVars[i]: float(values[i])
+                      for i in numpy.flatnonzero(values > 0).tolist() }
+        digits = params.solutionClass.digits
+        z1, z2 = self.objectiveValues(values)
+        return params.solutionClass(z1=round(z1, digits), z2=round(z2, digits),
+                                    variables=variables)
+
+    # called by the backend with the values of all variables for each new
+    # incumbent found while solving a MIP
+    def newIncumbent(self, values):
+        if params.harvestIncumbents and self.incumbents is not None:
+            self.incumbents.append(self.solutionFromValues(values))
+
+    # integer solutions found by the last call to optimize besides the final
+    # one: incumbents reported to newIncumbent and, if required, the solution
+    # pool
+    def harvestedSolutions(self):
+        solutions = self.incumbents or []
+        self.incumbents = None
+        if params.harvestSolutionPool and self.backend.isMIP() and \
+           self.backend.solutionCount() > 0:
+            solutions += self.getSolutionPoolVectors().solutions
+        return solutions
+
+    # objective values of each solution in the solution pool of the last
+    # weighted-sum LP, solved or replayed
     def getSolutionPoolVectors(self):
-        nSolutions = self.model.getAttr('SolCount')
         ub = upperboundset.UpperBoundSet()
-        for n in range(nSolutions):
-            z1, z2 = 0, 0
-            variables = {}
-            self.model.params.solutionNumber = n
-            for var in self.model.getVars():
-                if var.getAttr(GRB.Attr.Xn) > 0:
-                    variables[var] = var.getAttr(GRB.Attr.Xn)
-            for i in range(self.z1Expr.size()):
-                z1 += self.z1Expr.getCoeff(i) * \
-                      self.z1Expr.getVar(i).getAttr(GRB.Attr.Xn)
-            for i in range(self.z2Expr.size()):
-                z2 += self.z2Expr.getCoeff(i) * \
-                      self.z2Expr.getVar(i).getAttr(GRB.Attr.Xn)
-            ub.updateWithSolution(params.solutionClass(z1=z1, z2=z2,
-                                                       variables=variables))
+        if self.replayedPool is not None:
+            ub.merge(self.replayedPool)
+        else:
+            ub.merge([ self.solutionFromValues(values)
+                       for values in self.backend.poolValues(
+                               self.variables()) ])
         #
         return ub
 
     # export instance to fit Charkhgard's format
+    # only available with the Gurobi backend
     def exportToCharkhgard(self, fName='exported.lp'):
         # sanitise variable names
         def sanitise(v):
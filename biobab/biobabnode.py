@@ -1,11 +1,11 @@
 import sys
 import math
 
-from gurobipy import *
-
+import basiclp
 import segment
 import lowerboundset
 import params
+import profiler
 import util
 import upperboundset
 
@@ -26,26 +26,207 @@ def similarValues(ub, opt):
     else:
         return math.fabs( (ub - opt) / opt ) <=  params.onSegmentTolerance
 
+# approximate LB sets (see params.biobabLbRatio)
+# when c3 is found below (c1, c2) but the triangle (c1, c2, c3) is smaller
+# than biobabLbRatio times the triangle (c1, c2, z), z being the local nadir
+# point, (c1, c2) is not refined any further; the convex hull between c1 and
+# c2 is then above the line through c3 parallel to (c1, c2), and above the
+# lines supporting c1 and c2 (support[c] are the weights of a weighted sum
+# that c optimises), so the LB is the polyline c1, p, q, c2 where these lines
+# intersect
+# returns the points of this polyline, from left to right, and the worst-case
+# LB error, i.e. the largest distance between the polyline and (c1, c3, c2)
+# along the diagonal; None if (c1, c2) must be refined
+def approximateLB(c1, c2, c3, support):
+    alpha = float(c2[0] - c1[0])
+    beta = float(c1[1] - c2[1])
+    if alpha <= 0 or beta <= 0:
+        return None
+    value = scalar(c3, beta, alpha)
+    # the area of (c1, c2, c3) is half this gap, that of (c1, c2, z) is
+    # alpha * beta / 2
+    if scalar(c1, beta, alpha) - value >= \
+       params.biobabLbRatio * alpha * beta:
+        return None
+    p = intersection(support[c1], c1, (beta, alpha), value)
+    q = intersection(support[c2], c2, (beta, alpha), value)
+    if p is None or q is None or not c1[0] <= p[0] <= q[0] <= c2[0]:
+        return None
+    points = [ p, q ]
+    # the supporting line of a lexmin point may be vertical or horizontal,
+    # the polyline then starts below it or ends left of it
+    if p[0] > c1[0]:
+        points.insert(0, c1)
+    if q[1] > c2[1]:
+        points.append(c2)
+    error = max(diagonalDistance(v, c1, c3, c2) for v in (p, q))
+    return points, error
+
+# intersection of the line through c with weights w, and of the line where
+# the weighted sum with weights (beta, alpha) takes the given value
+def intersection(w, c, weights, value):
+    beta, alpha = weights
+    if w[1] == 0:
+        return c[0], (value - beta * c[0]) / alpha
+    if w[0] == 0:
+        return (value - alpha * c[1]) / beta, c[1]
+    det = w[0] * alpha - w[1] * beta
+    if det == 0:
+        return None
+    s = scalar(c, w[0], w[1])
+    return (s * alpha - w[1] * value) / det, (w[0] * value - beta * s) / det
+
+# distance t such that v + (t, t) is on the polyline (c1, c3, c2)
+def diagonalDistance(v, c1, c3, c2):
+    t = 0
+    for p1, p2 in ((c1, c3), (c3, c2)):
+        n = (p1[1] - p2[1], p2[0] - p1[0])
+        if n[0] + n[1] > 0:
+            t = max(t, (scalar(p1, *n) - scalar(v, *n)) / (n[0] + n[1]))
+    return t
+
+# persistent list of branching decisions, from the root down to a node
+# a child only adds its own decision to the path of its parent, which it shares
+# with its siblings; the empty path is None
+class DecisionPath:
+    __slots__ = ('parent', 'decision', 'length')
+
+    def __init__(self, parent, decision):
+        self.parent = parent
+        self.decision = decision
+        self.length = pathLength(parent) + 1
+
+def pathLength(path):
+    return 0 if path is None else path.length
+
+# decisions in a path, from the root down
+def pathToList(path):
+    decisions = []
+    while path is not None:
+        decisions.append(path.decision)
+        path = path.parent
+    decisions.reverse()
+    return decisions
+
+def pathFromList(decisions):
+    path = None
+    for decision in decisions:
+        path = DecisionPath(path, decision)
+    return path
+
 class Node:
+    # there may be millions of nodes in the queue: keep them small
+    __slots__ = ('lp', 'right', 'top', 'path', 'depth', 'parentVertices',
+                 'vertices', 'lbPoints', 'score')
+
+    # path may also be given as a list of branching decisions, from the root
+    # down, either positionally or as branchingDecisions (former signature)
     def __init__(self, lp, right=util.infinity, top=util.infinity,
-                 branchingDecisions=[], depth=0):
+                 path=None, depth=0, parentVertices=None,
+                 branchingDecisions=None):
         self.lp = lp
         self.right = right
         self.top = top
-        self.branchingDecisions = branchingDecisions
+        if branchingDecisions is not None:
+            path = branchingDecisions
+        if isinstance(path, list):
+            path = pathFromList(path)
+        # branching decisions of this node (a DecisionPath)
+        self.path = path
         self.depth = depth
-        # used for best-first tree exploration
+        # points computed for the LB set of the parent node, some of which may
+        # be reused (see lowerboundset.LBVertices)
+        # queued nodes do not hold them: they are given to the node when it
+        # is about to be bounded (see TreeSearch.warmStart)
+        self.parentVertices = parentVertices if params.lbWarmStart else None
+        # points computed for the LB set of this node
+        self.vertices = None
+        # used for best-first tree exploration: end points of the LB set of
+        # the parent in the box of this node (see nodepriority), and area of
+        # this box
+        self.lbPoints = None
         self.score = self.right * self.top
 
+    # queued nodes may be written to disk: only keep what is needed to bound
+    # them, warm start data is dropped
+    def __getstate__(self):
+        return (self.right, self.top, pathToList(self.path), self.depth,
+                self.lbPoints, self.score)
+
+    def __setstate__(self, state):
+        self.right, self.top, decisions, self.depth, self.lbPoints, \
+            self.score = state
+        self.lp = params.model
+        self.path = pathFromList(decisions)
+        self.parentVertices = None
+        self.vertices = None
+
+    # LB vertices of the parent node, used to warm start the computation of
+    # the LB set of this node
+    def setParentData(self, parentVertices):
+        self.parentVertices = parentVertices if params.lbWarmStart else None
+
+    # list of the branching decisions of this node, from the root down
+    @property
+    def branchingDecisions(self):
+        return pathToList(self.path)
+
     def __repr__(self):
         return 'Node(' + str(self.lp) + ', ' + str(self.right) + ', ' + \
             str(self.top) + ', ' + str(self.branchingDecisions) + ')'
         
+    # True if a point computed for the parent node is also feasible here
+    def admits(self, point, metaData, parentVertices):
+        if point[0] > self.right or point[1] > self.top:
+            return False
+        # only decisions taken since the parent need to be checked
+        path = self.path
+        while pathLength(path) > parentVertices.nDecisions:
+            if not path.decision.admits(self.lp, metaData):
+                return False
+            path = path.parent
+        return True
+
+    # when the parent's lexmin point for the given objective is still
+    # feasible, it is also the lexmin point of this node
+    def reusableLexmin(self, objective):
+        vertices = self.parentVertices
+        if vertices is None or len(vertices.points) == 0:
+            return None
+        i = 0 if objective == 1 else len(vertices.points) - 1
+        if self.admits(vertices.points[i], vertices.metaData[i], vertices):
+            return vertices.points[i], vertices.metaData[i]
+        else:
+            return None
+
+    # parent point optimising the given weighted sum, if it is still feasible
+    def reusableWeightedSum(self, beta, alpha):
+        vertices = self.parentVertices
+        if vertices is None:
+            return None
+        i = vertices.supportingPoint(beta, alpha)
+        if i is not None and \
+           self.admits(vertices.points[i], vertices.metaData[i], vertices):
+            return vertices.points[i], vertices.metaData[i]
+        else:
+            return None
+
+    @profiler.timed('lower-bound')
+    @util.reserved('lower-bound')
     def lowerBound(self, upperBound=None):
         # use an array as a stack to store segments that need to be processed
         C = []
         # use a set for segments that are part of the convex hull
         E = []
+        # weights of a weighted sum optimised by each point, and worst-case
+        # error of the approximate parts of the LB set
+        support = {}
+        lbError = 0
+        if params.lexminMethod == 'lex':
+            leftWeights, rightWeights = (1, 0), (0, 1)
+        else:
+            leftWeights = (1, self.lp.wsEpsilon)
+            rightWeights = (self.lp.wsEpsilon, 1)
         # done in different places
         def addIfMustSub(c1, c2, E, metaData):
             # we can improve the value of 'right' using the fact that the
@@ -66,17 +247,32 @@ class Node:
         params.mipCutoff = False
         # we give an empty ub set for calculating this point, in order to
         # avoid cutoff at this stage (we need metadat on this solution)
-        e1 = self.lp.lexmin(1, self.right, self.top, upperBound)
-        # case where the model is infeasible
-        if e1 is None:
-            return lowerboundset.LowerBoundSet([])
-        metaData[e1] = lowerboundset.LBMetaData(self.lp)
+        # points computed for the parent node are reused when possible:
+        # a point optimising a weighted sum for the parent also optimises it
+        # for this node, as long as it is feasible here
+        reused = self.reusableLexmin(1)
+        if reused is not None:
+            e1, metaData[e1] = reused
+        else:
+            e1 = self.lp.lexmin(1, self.right, self.top, upperBound)
+            # case where the model is infeasible
+            if e1 is None:
+                return lowerboundset.infeasibleLB()
+            metaData[e1] = lowerboundset.LBMetaData(self.lp)
+        support[e1] = leftWeights
         # regular case
-        e2 = self.lp.lexmin(2, self.right, self.top, upperBound)
-        if e2 is None:
-            return lowerboundset.LowerBoundSet([])
-        metaData[e2] = lowerboundset.LBMetaData(self.lp)
+        reused = self.reusableLexmin(2)
+        if reused is not None:
+            e2, metaData[e2] = reused
+        else:
+            e2 = self.lp.lexmin(2, self.right, self.top, upperBound)
+            if e2 is None:
+                return lowerboundset.infeasibleLB()
+            metaData[e2] = lowerboundset.LBMetaData(self.lp)
+        support[e2] = rightWeights
         params.mipCutoff = mc
+        # segments proven to be part of the convex hull
+        certified = set()
         if params.verbosity > 2:
             print()
             print('*** extreme points:')
@@ -107,9 +303,13 @@ class Node:
             alpha = float(c2[0] - c1[0])
             beta = float(c1[1] - c2[1])
             # alpha, beta = 1, beta / alpha
-            c3 = self.lp.solveWeightedSum(beta, alpha,
-                                          self.right, self.top,
-                                          upperBound)
+            reused = self.reusableWeightedSum(beta, alpha)
+            if reused is not None:
+                c3, c3MetaData = reused
+            else:
+                c3 = self.lp.solveWeightedSum(beta, alpha,
+                                              self.right, self.top,
+                                              upperBound)
             if params.verbosity > 2:
                 print('\tbeta:', beta)
                 print('\talpha:', alpha)
@@ -126,9 +326,36 @@ class Node:
             elif similarValues(scalar(c1, beta, alpha),
                                scalar(c3, beta, alpha)):
                 addIfMustSub(c1, c2, E, metaData)
+                certified.add((c1, c2))
                 if params.verbosity > 2:
                     print('\t--> segment in hull:', (c1, c2))
             else:
+                if reused is not None:
+                    metaData[c3] = c3MetaData
+                else:
+                    metaData[c3] = lowerboundset.LBMetaData(self.lp)
+                support[c3] = (beta, alpha)
+                # p and q get the metadata of c3, which must be fractional:
+                # otherwise a piece (p, q) left after filtering would have
+                # no branching candidate and its node would be dropped
+                approximation = approximateLB(c1, c2, c3, support) \
+                    if params.biobabLbRatio > 0 and \
+                       not metaData[c3].isInteger else None
+                if approximation is not None:
+                    points, error = approximation
+                    lbError = max(lbError, error)
+                    profiler.count('lb-approximations')
+                    if params.verbosity > 2:
+                        print('\t--> approximated:', points, 'error:', error)
+                    rights = [ p[0] for p in points[1:-1] ] + \
+                        [ c2[0] if len(C) > 0 else self.right ]
+                    for p1, p2, right in zip(points[:-1], points[1:], rights):
+                        s = segment.Segment(p1, p2, right, self.top,
+                                            metaData.get(p1, metaData[c3]),
+                                            metaData.get(p2, metaData[c3]))
+                        if s.shouldBeConsidered():
+                            E.append(s)
+                    continue
                 # otherwise: two new segments must be processed
                 # when stacking them in this order E is automatically sorted
                 # from left to right
@@ -136,14 +363,67 @@ class Node:
                 C.append((c1, c3))
                 if params.verbosity > 2:
                     print('\t--> new point:', c3)
-                metaData[c3] = lowerboundset.LBMetaData(self.lp)
-        return lowerboundset.LowerBoundSet(E)
+        if params.lexminMethod == 'lex':
+            leftSlope, rightSlope = float('inf'), 0
+        else:
+            leftSlope, rightSlope = 1 / self.lp.wsEpsilon, self.lp.wsEpsilon
+        self.vertices = lowerboundset.LBVertices(metaData, certified,
+                                                 leftSlope, rightSlope,
+                                                 pathLength(self.path))
+        lb = lowerboundset.LowerBoundSet(E)
+        lb.error = lbError
+        return lb
+
+    # make the model reflect the branching decisions of this node
+    # only the decisions that differ between the path of this node and the
+    # path currently applied to the model are cancelled or applied
+    def switchBranchingDecisions(self):
+        self.switchPath(self.path)
+
+    # make the model reflect the given DecisionPath
+    @profiler.timed('decisions')
+    def switchPath(self, path):
+        # paths are shared between nodes, so the paths only need to be walked
+        # up to their first common element
+        cancelled, added = [], []
+        applied = self.lp.appliedPath
+        a, b = applied, path
+        while pathLength(a) > pathLength(b):
+            cancelled.append(a.decision)
+            a = a.parent
+        while pathLength(b) > pathLength(a):
+            added.append(b.decision)
+            b = b.parent
+        while a is not b:
+            cancelled.append(a.decision)
+            added.append(b.decision)
+            a, b = a.parent, b.parent
+        cancelled.reverse()
+        added.reverse()
+        # paths received from another process are copies: equal decisions
+        # at the top of both paths are kept
+        # this is only the case for bound decisions, which do not need to be
+        # the same objects to be cancelled later
+        common = 0
+        while common < len(cancelled) and common < len(added) and \
+              cancelled[common] == added[common]:
+            common += 1
+        changes = basiclp.ModelChanges(self.lp)
+        for decision in reversed(cancelled[common:]):
+            decision.cancel(self, changes)
+        for decision in added[common:]:
+            decision.apply(self, changes)
+        changes.commit()
+        self.lp.appliedPath = path
+
+    # cancel every branching decision currently applied to the model
+    def cancelAppliedDecisions(self):
+        self.switchPath(None)
 
     def applyBranchingDecisions(self):
         for decision in self.branchingDecisions:
             decision.apply(self)
 
     def cancelBranchingDecisions(self):
-        for i in range(len(self.branchingDecisions)):
-            self.branchingDecisions[len(self.branchingDecisions) - 1 - i].\
-                cancel(self)
+        for decision in reversed(self.branchingDecisions):
+            decision.cancel(self)
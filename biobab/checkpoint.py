@@ -0,0 +1,109 @@
+import hashlib
+import os
+import pickle
+import signal
+import sys
+import time
+
+import params
+import profiler
+import util
+
+# Checkpoints of the search, so that it can be resumed later (--resume)
+# A checkpoint stores the UB set, the number of LPs solved so far and the
+# state of the algorithm, as returned by its getState method (open nodes,
+# rectangles or current epsilon bounds); the state is None once the search is
+# over
+# Checkpoints are written every checkpointInterval seconds, when the time
+# limit is reached, on SIGUSR1, and on SIGTERM after which the process stops
+# They are only written between two nodes (or rectangles, or epsilon-
+# constraint iterations), so a signal is handled once the current one is done
+
+# wall-clock time of the last checkpoint
+lastSave = time.time()
+# set by signal handlers
+requested = False
+stopRequested = False
+
+def onSignal(signalNumber, frame):
+    global requested, stopRequested
+    requested = True
+    if signalNumber == signal.SIGTERM:
+        stopRequested = True
+
+def installHandlers():
+    signal.signal(signal.SIGUSR1, onSignal)
+    signal.signal(signal.SIGTERM, onSignal)
+
+# worker processes leave signals to the coordinator, which stops them cleanly
+def ignoreSignals():
+    signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+
+def enabled():
+    return params.checkpointFile is not None
+
+# fingerprint of the instance and of the algorithm
+def instanceKey():
+    h = hashlib.sha1()
+    h.update(repr( (params.problemType, params.algorithm) ).encode())
+    with open(params.inputFile, 'rb') as f:
+        h.update(f.read())
+    return h.hexdigest()
+
+# the file is replaced atomically: a crash while writing it leaves the
+# previous checkpoint intact
+@profiler.timed('checkpoint')
+def save(ub, state):
+    global lastSave, requested
+    if not enabled():
+        return
+    data = { 'instance': instanceKey(),
+             'solutions': ub.solutions,
+             'nLPs': params.modelClass.nLPs,
+             'state': state }
+    tmpName = params.checkpointFile + '.tmp'
+    with open(tmpName, 'wb') as f:
+        pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(tmpName, params.checkpointFile)
+    lastSave = time.time()
+    requested = False
+    if params.verbosity > 0:
+        print(util.TS() + '\tcheckpoint written to', params.checkpointFile)
+
+# called between two steps of an algorithm; getState is only called if a
+# checkpoint is written
+def saveIfDue(ub, getState):
+    if not enabled():
+        return
+    if requested or time.time() - lastSave >= params.checkpointInterval:
+        stop = stopRequested
+        save(ub, getState())
+        if stop:
+            print(util.TS() + '\tstopping, resume with --resume')
+            sys.exit(0)
+
+# read the checkpoint, restore the UB set and the LP count, and return the
+# state of the algorithm
+# a missing, truncated or corrupt checkpoint is not an error: a new search is
+# started (params.resume is then reset)
+def load(ub):
+    try:
+        with open(params.checkpointFile, 'rb') as f:
+            data = pickle.load(f)
+        instance = data['instance']
+    except (IOError, EOFError, pickle.UnpicklingError, AttributeError,
+            ImportError, IndexError, KeyError, TypeError, ValueError):
+        print('Warning: cannot read checkpoint', params.checkpointFile + ',',
+              'starting a new search')
+        params.resume = False
+        return None
+    if instance != instanceKey():
+        print('Error: checkpoint', params.checkpointFile, end=' ')
+        print('was written for another instance or algorithm')
+        sys.exit(10)
+    ub.merge(data['solutions'])
+    params.modelClass.nLPs += data['nLPs']
+    print(util.TS() + '\tresuming from', params.checkpointFile, end=' ')
+    print('(|UB| =', str(len(ub.solutions)) + ',', data['nLPs'], 'LPs)')
+    return data['state']
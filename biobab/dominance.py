@@ -0,0 +1,41 @@
+import numpy
+
+# Batch versions of point-wise tests on sets of solutions
+# Dominance follows IntegerSolution.dominates: u dominates v iff
+# u.improvedZ1 <= v.z1 and u.improvedZ2 <= v.z2
+
+# objective values of the solutions in an UB set, as numpy arrays
+# (improved objective values if improved is True)
+# values are copied: an array.array cannot be resized while a numpy array
+# uses its buffer
+def objectiveArrays(ubSet, improved=False):
+    if len(ubSet) == 0:
+        return numpy.empty(0), numpy.empty(0)
+    if improved:
+        z1, minusZ2 = ubSet.improvedZ1Values, ubSet.minusImprovedZ2Values
+    else:
+        z1, minusZ2 = ubSet.z1Values, ubSet.minusZ2Values
+    return numpy.array(z1), - numpy.array(minusZ2)
+
+# mask[i] is True iff point (z1[i], z2[i]) is dominated by at least one of the
+# points with improved objective values (improvedZ1[j], improvedZ2[j])
+# for each point, the dominating candidates are the ones with improvedZ1 <= z1
+# and among those only the smallest improvedZ2 matters: prefix minima over
+# candidates sorted by improvedZ1 give the answer with one binary search
+def dominatedMask(z1, z2, improvedZ1, improvedZ2):
+    mask = numpy.zeros(len(z1), dtype=bool)
+    if len(z1) == 0 or len(improvedZ1) == 0:
+        return mask
+    order = numpy.argsort(improvedZ1, kind='stable')
+    sortedZ1 = improvedZ1[order]
+    prefixMinZ2 = numpy.minimum.accumulate(improvedZ2[order])
+    nCandidates = numpy.searchsorted(sortedZ1, z1, side='right')
+    hasCandidate = nCandidates > 0
+    mask[hasCandidate] = \
+        prefixMinZ2[nCandidates[hasCandidate] - 1] <= z2[hasCandidate]
+    return mask
+
+# mask[i] is True iff point (z1[i], z2[i]) lies in the (closed) rectangle
+# [left, right] x [bottom, top]
+def inRectangleMask(z1, z2, left, right, bottom, top):
+    return (z1 >= left) & (z1 <= right) & (z2 >= bottom) & (z2 <= top)
@@ -1,19 +1,50 @@
 import sys
 
+import checkpoint
 import params
 import util
+import workerpool
 from weightedsumsolver import WeightedSumNode, WeightedSumSolver, LexminSolver
 
+# find the non-dominated points whose constrained objective (z2 if singleObj
+# is 1, z1 otherwise) is in (lo, top] (resp. (lo, right]), one after the
+# other as in EpsilonConstraintFramework.solve
+# called by worker processes (see workerpool), returns the new UB solutions
+def solveStrip(lp, ub, payload):
+    relaxed, singleObj, right, top, lo = payload
+    known = set( id(u) for u in ub.solutions )
+    framework = EpsilonConstraintFramework(relaxed)
+    while True:
+        point = framework.lexmin(lp, singleObj, right, top, ub)
+        if not point or point[2 - singleObj] <= lo:
+            break
+        if singleObj == 1:
+            top = point[1] - params.inputData.z2Epsilon
+        else:
+            right = point[0] - params.inputData.z1Epsilon
+    return [ u for u in ub.solutions if not id(u) in known ]
+
 class EpsilonConstraintFramework:
-    def __init__(self, relaxed):
+    def __init__(self, relaxed, nJobs=1):
         self.relaxed = relaxed
+        # number of worker processes solving strips in parallel
+        self.nJobs = nJobs
         if relaxed:
             self.solver = LexminSolver()
-        
-    def solve(self, lp, ub, singleObj):
+
+    def lexmin(self, lp, objective, right, top, ub):
+        if self.relaxed:
+            return self.solver.solve(lp, objective, right, top, ub)
+        else:
+            return lp.lexmin(objective, right, top, ub)
+
+    # if state is given (see checkpoint), the search is resumed from there
+    def solve(self, lp, ub, singleObj, state=None):
         # initialisations...
         right = lp.validBoundRight or params.inputData.boundRight()
         top = lp.validBoundTop or params.inputData.boundTop()
+        if state is not None and 'right' in state:
+            right, top = state['right'], state['top']
         print(util.TS(), '\tStarting epsilon-constraint', end=' ')
         print('with boundRight =', right, 'and boundTop =', top)
         if singleObj == 1:
@@ -23,19 +54,21 @@ class EpsilonConstraintFramework:
         else:
             print('Error: invalid objective:', singleObj)
             sys.exit(22)
+        if self.nJobs > 1 or (state is not None and 'strips' in state):
+            return self.solveInParallel(lp, ub, singleObj, right, top, state)
         try:
             while True:
+                checkpoint.saveIfDue(ub, lambda: { 'right': right,
+                                                   'top': top })
                 z1, z2 = None, None
-                if self.relaxed:
-                    point = self.solver.solve(lp, singleObj, right, top, ub)
-                else:
-                    point = lp.lexmin(singleObj, right, top, ub)
+                point = self.lexmin(lp, singleObj, right, top, ub)
                 if point:
                     z1, z2 = point
                 #
                 if z1 is None:
                     print(util.TS() + '\tepsilon-constraint', end=' ')
                     print('framework is over')
+                    checkpoint.save(ub, None)
                     return
                 else:
                     if params.verbosity > 0:
@@ -47,11 +80,71 @@ class EpsilonConstraintFramework:
                         right = z1 - params.inputData.z1Epsilon
         except util.TimeLimitReachedException as e:
             print(e)
+            checkpoint.save(ub, { 'right': right, 'top': top })
         print(util.TS() + '\tepsilon-constraint framework is over')        
 
+    # same as solve, but the range of the constrained objective between the
+    # two extreme points is split into strips that are solved by a pool of
+    # worker processes, each with its own copy of the model
+    # UB solutions found in a strip are shared with the workers that solve
+    # the next strips, which helps cutting off MIPs
+    def solveInParallel(self, lp, ub, singleObj, right, top, state):
+        print(util.TS() + '\tsolving strips with', self.nJobs, 'workers')
+        if state is None:
+            first = self.lexmin(lp, singleObj, right, top, ub)
+            last = self.lexmin(lp, 3 - singleObj, right, top, ub)
+            strips = self.strips(singleObj, right, top, first, last) \
+                if first and last else []
+        else:
+            strips = state['strips']
+        pool = workerpool.WorkerPool(self.nJobs)
+        pool.share(ub.solutions)
+        # strip currently solved by each worker
+        running = {}
+        getState = lambda: { 'strips': list(running.values()) + strips }
+        try:
+            while len(strips) > 0 or pool.busy():
+                checkpoint.saveIfDue(ub, getState)
+                while pool.hasIdleWorker() and len(strips) > 0:
+                    strip = strips.pop(0)
+                    workerId = pool.submit(solveStrip,
+                                           (self.relaxed, singleObj) + strip)
+                    running[workerId] = strip
+                workerId, newSolutions = pool.result()
+                del running[workerId]
+                ub.merge(newSolutions)
+                pool.share(newSolutions)
+            checkpoint.save(ub, None)
+        except util.TimeLimitReachedException as e:
+            print(e)
+            ub.merge(pool.interruptedSolutions())
+            checkpoint.save(ub, getState())
+        finally:
+            pool.close()
+        print(util.TS() + '\tepsilon-constraint framework is over')
+
+    # (right, top, lo) for each strip, from the first extreme point (found
+    # first by the sequential version) to the last one
+    # first is known, and last is found again by the last strip
+    def strips(self, singleObj, right, top, first, last):
+        i = 2 - singleObj
+        if singleObj == 1:
+            hi = first[1] - params.inputData.z2Epsilon
+        else:
+            hi = first[0] - params.inputData.z1Epsilon
+        lo = last[i]
+        if hi <= lo:
+            return []
+        n = params.epsilonStripsPerJob * self.nJobs
+        bounds = [ hi - (hi - lo) * k / float(n) for k in range(n) ] + [ lo ]
+        if singleObj == 1:
+            return [ (right, b, a) for b, a in zip(bounds[:-1], bounds[1:]) ]
+        else:
+            return [ (b, top, a) for b, a in zip(bounds[:-1], bounds[1:]) ]
+
 # Bi-directional epsilon constraint framework
 class BDEpsilonConstraintFramework(EpsilonConstraintFramework):
-    def solve(self, lp, ub, firstObj):
+    def solve(self, lp, ub, firstObj, state=None):
         # initialisations...
         right = lp.validBoundRight or params.inputData.boundRight()
         top = lp.validBoundTop or params.inputData.boundTop()
@@ -60,19 +153,24 @@ class BDEpsilonConstraintFramework(EpsilonConstraintFramework):
         print('with boundRight =', right, 'and boundTop =', top)
         currentObj = firstObj
         lastFound = None
+        if state is not None:
+            localRight, localTop, currentObj, lastFound = \
+                state['localRight'], state['localTop'], \
+                state['currentObj'], state['lastFound']
+        getState = lambda: { 'localRight': localRight, 'localTop': localTop,
+                             'currentObj': currentObj, 'lastFound': lastFound }
         try:
             while True:
+                checkpoint.saveIfDue(ub, getState)
                 z1, z2 = None, None
                 r, t = (right, localTop) if currentObj == 1 else (localRight, top)
-                if self.relaxed:
-                    point = self.solver.solve(lp, currentObj, r, t, ub)
-                else:
-                    point = lp.lexmin(currentObj, r, t, ub)
+                point = self.lexmin(lp, currentObj, r, t, ub)
                 if point:
                     z1, z2 = point
                 if lastFound and util.closeEnough(point, lastFound):
                     print(util.TS() + '\tepsilon-constraint', end=' ')
                     print('framework is over')
+                    checkpoint.save(ub, None)
                     return
                 else:
                     lastFound = point
@@ -87,4 +185,5 @@ class BDEpsilonConstraintFramework(EpsilonConstraintFramework):
                         currentObj = 1
         except util.TimeLimitReachedException as e:
             print(e)
+            checkpoint.save(ub, getState())
         print(util.TS() + '\tepsilon-constraint framework is over')        
@@ -1,18 +1,30 @@
 import collections
 import heapq
+import itertools
+import pickle
+import tempfile
+
+import nodepriority
+import params
+import util
 
 # this is where we store our nodes during tree search
+# in best-first mode, items with the smallest key are processed first (see
+# nodepriority); ties are broken in favour of the item queued first
 class Queue:
-    def __init__(self, mode):
+    def __init__(self, mode, key=None):
         if mode == 'best':
             self.queue = []
         else:
             self.queue = collections.deque()
         self.mode = mode
+        self.key = key if key is not None else nodepriority.ScoreKey()
+        self.counter = itertools.count()
 
     def push(self, item):
         if self.mode == 'best':
-            heapq.heappush(self.queue, (item.score, item) )
+            heapq.heappush(self.queue, (self.key(item), next(self.counter),
+                                        self.key.version(), item) )
         else:
             self.queue.append(item)
 
@@ -22,7 +34,16 @@ class Queue:
         elif self.mode == 'fifo':
             return self.queue.popleft()
         elif self.mode == 'best':
-            return heapq.heappop(self.queue)[1]
+            # keys computed with an older version are updated lazily
+            while True:
+                key, count, version, item = heapq.heappop(self.queue)
+                if version == self.key.version() or len(self.queue) == 0:
+                    return item
+                key = self.key(item)
+                if key <= self.queue[0][0]:
+                    return item
+                heapq.heappush(self.queue, (key, count, self.key.version(),
+                                            item) )
         else:
             print('unknown processing mode:', self.mode)
 
@@ -32,3 +53,281 @@ class Queue:
     def empty(self):
         return len(self.queue) == 0
 
+    # True if items are ordered by key
+    def isBestFirst(self):
+        return self.mode == 'best'
+
+    # queued items, in an order such that pushing them into an empty queue
+    # gives the same queue (used for checkpoints)
+    def items(self):
+        if self.mode == 'best':
+            return [ entry[3]
+                     for entry in sorted(self.queue, key=lambda e: e[1]) ]
+        else:
+            return list(self.queue)
+
+# returns a queue for the given mode, that spills nodes to disk if required
+def newQueue(mode):
+    if params.queueMemory:
+        return SpillingQueue(mode, params.queueMemory, params.queueDirectory)
+    else:
+        return Queue(mode)
+
+# chunks of items stored in an append-only temporary file
+# space used by chunks that were read back is reclaimed when the file is
+# mostly made of them
+class ChunkFile:
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.file = tempfile.TemporaryFile(dir=directory)
+        # (offset, length) of each chunk that has not been read yet
+        self.chunks = {}
+        self.ids = itertools.count()
+        # total length of these chunks
+        self.size = 0
+
+    # returns an id for the chunk
+    def write(self, items):
+        data = pickle.dumps(items, pickle.HIGHEST_PROTOCOL)
+        self.file.seek(0, 2)
+        chunk = next(self.ids)
+        self.chunks[chunk] = (self.file.tell(), len(data))
+        self.size += len(data)
+        self.file.write(data)
+        return chunk
+
+    def read(self, chunk):
+        items = self.peek(chunk)
+        offset, length = self.chunks.pop(chunk)
+        self.size -= length
+        self.reclaim()
+        return items
+
+    # same as read, but the chunk stays in the file
+    def peek(self, chunk):
+        offset, length = self.chunks[chunk]
+        self.file.seek(offset)
+        return pickle.loads(self.file.read(length))
+
+    def reclaim(self):
+        end = max([ o + l for o, l in self.chunks.values() ] + [ 0 ])
+        self.file.truncate(end)
+        if end > 2 * self.size + 2 ** 20:
+            # copy the remaining chunks to a new file, in the same order
+            newFile = tempfile.TemporaryFile(dir=self.directory)
+            for chunk in sorted(self.chunks, key=lambda c: self.chunks[c]):
+                offset, length = self.chunks[chunk]
+                self.file.seek(offset)
+                self.chunks[chunk] = (newFile.tell(), length)
+                newFile.write(self.file.read(length))
+            self.file.close()
+            self.file = newFile
+
+# same as Queue, but at most maxInMemory items are kept in memory; the
+# others are written to disk in chunks of maxInMemory / 2 items, in such a
+# way that the items that will be processed last are on disk
+# fifo: items in the middle of the queue are on disk
+# lifo: items at the bottom of the stack are on disk
+# best: items with the largest keys are on disk; a chunk is read back as soon
+# as it may contain the item with the smallest key
+class SpillingQueue:
+    def __init__(self, mode, maxInMemory, directory=None):
+        self.mode = mode
+        self.maxInMemory = max(2, int(maxInMemory))
+        self.chunkSize = self.maxInMemory // 2
+        self.file = ChunkFile(directory)
+        # chunks on disk and number of items in each of them
+        # for best-first, chunks are stored with the smallest key they contain
+        self.chunks = collections.deque()
+        self.nSpilled = 0
+        # in best-first mode, head is a heap of (key, count, version, item)
+        # entries, and tail is not used
+        self.head = [] if mode == 'best' else collections.deque()
+        self.tail = collections.deque()
+        self.key = nodepriority.ScoreKey()
+        self.counter = itertools.count()
+
+    def spill(self, items, smallestKey=None):
+        self.chunks.append( (self.file.write(items), len(items), smallestKey) )
+        self.nSpilled += len(items)
+
+    def unspill(self, i):
+        chunk, n, smallestKey = self.chunks[i]
+        del self.chunks[i]
+        self.nSpilled -= n
+        return self.file.read(chunk)
+
+    def push(self, item):
+        if self.mode == 'best':
+            heapq.heappush(self.head, (self.key(item), next(self.counter),
+                                       self.key.version(), item) )
+            if len(self.head) > self.maxInMemory:
+                entries = sorted(self.head)
+                self.head = entries[:-self.chunkSize]
+                spilled = entries[-self.chunkSize:]
+                self.spill(spilled, spilled[0][0])
+        else:
+            self.tail.append(item)
+            if len(self.head) + len(self.tail) > self.maxInMemory and \
+               len(self.tail) >= self.chunkSize:
+                if self.mode == 'fifo':
+                    # the tail is processed after the chunks on disk
+                    self.spill(list(self.tail))
+                    self.tail.clear()
+                else:
+                    # the bottom of the stack is processed last
+                    items = self.head + self.tail
+                    self.spill([ items.popleft()
+                                 for i in range(self.chunkSize) ])
+                    self.head, self.tail = items, collections.deque()
+
+    def pop(self):
+        if self.mode == 'fifo':
+            if len(self.head) == 0:
+                if len(self.chunks) > 0:
+                    self.head = collections.deque(self.unspill(0))
+                else:
+                    self.head, self.tail = self.tail, collections.deque()
+            return self.head.popleft()
+        elif self.mode == 'lifo':
+            if len(self.tail) > 0:
+                return self.tail.pop()
+            if len(self.head) == 0:
+                self.head = collections.deque(self.unspill(-1))
+            return self.head.pop()
+        elif self.mode == 'best':
+            # keys computed with an older version are updated lazily
+            while True:
+                self.reload()
+                key, count, version, item = heapq.heappop(self.head)
+                if version == self.key.version() or self.empty():
+                    return item
+                key = self.key(item)
+                if key <= self.smallestKey():
+                    return item
+                heapq.heappush(self.head, (key, count, self.key.version(),
+                                           item) )
+        else:
+            print('unknown processing mode:', self.mode)
+
+    # smallest key in memory or on disk
+    def smallestKey(self):
+        return min([ c[2] for c in self.chunks ] +
+                   [ self.head[0][0] if len(self.head) > 0 else float('inf') ])
+
+    # read back chunks that may contain the item with the smallest key
+    def reload(self):
+        while len(self.chunks) > 0:
+            i = min(range(len(self.chunks)), key=lambda i: self.chunks[i][2])
+            if len(self.head) > 0 and self.chunks[i][2] > self.head[0][0]:
+                break
+            self.head += self.unspill(i)
+            heapq.heapify(self.head)
+
+    def __len__(self):
+        return len(self.head) + len(self.tail) + self.nSpilled
+
+    def empty(self):
+        return len(self) == 0
+
+    def isBestFirst(self):
+        return self.mode == 'best'
+
+    # see Queue.items
+    def items(self):
+        spilled = [ self.file.peek(c[0]) for c in self.chunks ]
+        if self.mode == 'best':
+            entries = list(self.head) + [ e for chunk in spilled for e in chunk ]
+            return [ e[3] for e in sorted(entries, key=lambda e: e[1]) ]
+        spilled = [ item for chunk in spilled for item in chunk ]
+        if self.mode == 'fifo':
+            return list(self.head) + spilled + list(self.tail)
+        else:
+            return spilled + list(self.head) + list(self.tail)
+
+# best-first queue that switches to depth-first when too many nodes are
+# queued or too much memory is used: children are then stacked, and the
+# stack is emptied before the best node is taken from the heap (i.e. we dive
+# from the best node)
+# best-first is resumed when resources are available again
+class AdaptiveQueue:
+    def __init__(self):
+        self.best = newQueue('best')
+        self.stack = newQueue('lifo')
+        self.mode = 'best'
+        self.maxSize = params.adaptiveQueueSize
+        # memory is compared with the quantity its threshold refers to: RSS
+        # for adaptiveMemory, address space size for memoryLimit
+        if params.adaptiveMemory is not None:
+            self.maxMemory = params.adaptiveMemory * 1024 ** 2
+            self.measureMemory = util.residentMemory
+        elif params.memoryLimit is not None:
+            self.maxMemory = .8 * util.humanToBytes(params.memoryLimit)
+            self.measureMemory = util.virtualMemory
+        else:
+            self.maxMemory = None
+        # memory is only measured every params.adaptiveMemoryInterval pops
+        self.nPops = 0
+        self.memory = None
+
+    @property
+    def key(self):
+        return self.best.key
+
+    @key.setter
+    def key(self, key):
+        self.best.key = key
+
+    # check resources, returns True if they are running low
+    # if high is False, returns True if they are not back to normal yet
+    def lowResources(self, high):
+        ratio = 1 if high else params.adaptiveResumeRatio
+        if len(self) >= ratio * self.maxSize:
+            return True
+        if self.maxMemory is not None:
+            if self.nPops % params.adaptiveMemoryInterval == 0:
+                self.memory = self.measureMemory()
+            if self.memory is not None and \
+               self.memory >= ratio * self.maxMemory:
+                return True
+        return False
+
+    def updateMode(self):
+        if self.mode == 'best' and self.lowResources(True):
+            self.mode = 'dive'
+        elif self.mode == 'dive' and not self.lowResources(False):
+            self.mode = 'best'
+            while not self.stack.empty():
+                self.best.push(self.stack.pop())
+        else:
+            return
+        if params.verbosity > 0:
+            print(util.TS() + '\tadaptive search: switching to', self.mode,
+                  '(' + str(len(self)) + ' nodes)')
+
+    def push(self, item):
+        if self.mode == 'best':
+            self.best.push(item)
+        else:
+            self.stack.push(item)
+
+    def pop(self):
+        self.updateMode()
+        self.nPops += 1
+        if not self.stack.empty():
+            return self.stack.pop()
+        else:
+            return self.best.pop()
+
+    def __len__(self):
+        return len(self.best) + len(self.stack)
+
+    def empty(self):
+        return self.best.empty() and self.stack.empty()
+
+    def isBestFirst(self):
+        return True
+
+    # stacked items are queued again in best-first order
+    def items(self):
+        return self.best.items() + self.stack.items()
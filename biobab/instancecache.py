@@ -0,0 +1,56 @@
+import hashlib
+import os
+
+import numpy
+
+import params
+
+# Binary cache of parsed instance files
+# Instance classes describe their data with NumPy arrays (and numbers or
+# strings, stored as 0-d arrays); parsing the text file is only done once:
+# the arrays are then stored in params.instanceCacheDir as an uncompressed
+# .npz file, and loaded from there on later runs
+# Cache files are keyed by a fingerprint of the content of the instance file
+# and of the format, a string that names the instance class and should be
+# changed whenever the arrays it produces change
+
+# fingerprint of an instance file read with the given format
+def fileKey(fileName, format):
+    h = hashlib.sha1(format.encode())
+    with open(fileName, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def cacheFileName(fileName, format):
+    return os.path.join(params.instanceCacheDir,
+                        os.path.basename(fileName) + '-' + \
+                        fileKey(fileName, format)[:16] + '.npz')
+
+# arrays of the instance file, from the cache if possible, otherwise returned
+# by parse(fileName) and then cached
+def load(fileName, format, parse):
+    if params.instanceCacheDir is None:
+        return parse(fileName)
+    cacheFile = cacheFileName(fileName, format)
+    try:
+        with numpy.load(cacheFile, allow_pickle=False) as f:
+            return { key: f[key] for key in f.files }
+    except (OSError, ValueError):
+        # missing or unreadable cache file
+        pass
+    arrays = parse(fileName)
+    store(cacheFile, arrays)
+    return arrays
+
+# the file is replaced atomically, so that processes reading the same
+# instance at the same time never see a partial file
+def store(cacheFile, arrays):
+    try:
+        os.makedirs(params.instanceCacheDir, exist_ok=True)
+        tmpName = cacheFile + '.' + str(os.getpid()) + '.tmp'
+        with open(tmpName, 'wb') as f:
+            numpy.savez(f, **arrays)
+        os.replace(tmpName, cacheFile)
+    except OSError as e:
+        print('Warning: cannot write instance cache file', cacheFile + ':', e)
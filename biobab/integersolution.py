@@ -1,5 +1,3 @@
-from gurobipy import *
-
 import params
 
 zero = 1e-5
@@ -35,6 +33,21 @@ class IntegerSolution:
             return False
         return True
     
+    # solver variables cannot be pickled (e.g. when sending solutions to
+    # worker processes): they are replaced with their index in the model, then
+    # restored using the model of the receiving process
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self.vars is not None:
+            state['vars'] = { x.index: v for x, v in self.vars.items() }
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.vars is not None:
+            self.vars = { params.model.variable(i): v
+                          for i, v in self.vars.items() }
+
     def __repr__(self):
         return 'integer solution: (' + str(self.z1) + ',' + str(self.z2) + ')'
 
@@ -45,10 +58,9 @@ class IntegerSolution:
             self.__class__.nSavedSolutions = 1
         fName += '-' + '%03d' % self.__class__.nSavedSolutions + '.raw'
         file = open(fName, 'w')
-        for x in self.vars:
-            if self.vars[x] > zero:
-                file.write(x.getAttr(GRB.Attr.VarName) + '\t=\t' + \
-                           str(self.vars[x]) + '\n')
+        variables = [ x for x in self.vars if self.vars[x] > zero ]
+        for x, name in zip(variables, params.model.variableNames(variables)):
+            file.write(name + '\t=\t' + str(self.vars[x]) + '\n')
         file.close()
         if verbose:
             print('stored solution to', fName)
@@ -1,8 +1,20 @@
+import bisect
+
+import numpy
+
 import params
+import profiler
 import segment
 from functools import reduce
 
 class LowerBoundSet:
+    # worst-case distance between this LB set and the exact one, along the
+    # diagonal (0 unless the LB set is approximate, see params.biobabLbRatio)
+    error = 0
+    # True if the node has no feasible solution at all, as opposed to an LB
+    # set left empty by dominance
+    infeasible = False
+
     def __init__(self, segments):
         self.segments = segments
 
@@ -21,9 +33,40 @@ class LowerBoundSet:
         self.metaData = lambda: iter(self.metaDataForPoint.values())
     
     # filter this LB set with an UB set
+    # this is equivalent to calling filterPoint with every UB solution in
+    # turn, but each segment is only filtered with the UB solutions inside its
+    # box, which are found by binary search since the UB set is sorted
+    @profiler.timed('filter')
     def filter(self, ubSet):
-        for u in ubSet.solutions:
-            self.filterPoint(u)
+        solutions = ubSet.solutions
+        if len(solutions) == 0:
+            return
+        improved = params.integerDominance
+        newSegments = []
+        for s in self.segments:
+            first, last = ubSet.boxRange(s.right, s.top, improved)
+            # Segment.filter discards segments that should not be considered,
+            # even with a solution that does not affect them
+            if first > 0 or first == last:
+                if not s.shouldBeConsidered():
+                    continue
+            pieces = [ s ]
+            for i in range(first, last):
+                u = solutions[i]
+                z1, z2 = (u.improvedZ1, u.improvedZ2) if improved \
+                         else (u.z1, u.z2)
+                newPieces = []
+                for p in pieces:
+                    # pieces returned by Segment.filter are always
+                    # considered, so solutions outside their box leave them
+                    # unchanged
+                    if z1 > p.right or z2 > p.top:
+                        newPieces.append(p)
+                    else:
+                        newPieces += p.filter(u)
+                pieces = newPieces
+            newSegments += pieces
+        self.segments = newSegments
 
     # filter this LB set with an UB point
     def filterPoint(self, solution):
@@ -33,6 +76,11 @@ class LowerBoundSet:
             newSegments += tmp
         self.segments = newSegments
 
+    # metadata caches are rebuilt on demand and cannot be pickled
+    def __getstate__(self):
+        return { 'segments': self.segments, 'error': self.error,
+                 'infeasible': self.infeasible }
+
     def __repr__(self):
         if self.segments == []:
             return ''
@@ -77,29 +125,43 @@ class LowerBoundSet:
         regions.append( (self.segments[-1].right, top) )
         return regions
 
-    # produce metadata, i.e. various values taken by each variable for this
-    # LB set (useful for branching)
-    def getVarValues(self):
+    # values taken by the integer variables at each point of this LB set, as
+    # a matrix with one row per point and one column per integer variable
+    # (useful for branching)
+    # returns the LP these variables belong to, and the matrix
+    def getVarMatrix(self):
         try:
             self.metaData
         except AttributeError:
             self.computeMetaData()
         try:
-            self.varValues
+            self.varMatrix
         except AttributeError:
-            self.varValues = {}
-            for s in self.metaData():
-                for x, v in s.data:
-                    if x in self.varValues:
-                        self.varValues[x].append(v)
-                    else:
-                        self.varValues[x] = [ v ]
+            metaData = list(self.metaData())
+            self.varLP = metaData[0].lp
+            self.varMatrix = numpy.array([ m.values for m in metaData ])
             if params.verbosity > 4:
-                for x in self.varValues:
-                    print(x, self.varValues[x])
+                for x, values in zip(self.varLP.integerVars,
+                                     self.varMatrix.T.tolist()):
+                    print(x, values)
                 print()
+        return self.varLP, self.varMatrix
+
+    # produce metadata, i.e. various values taken by each variable for this
+    # LB set
+    def getVarValues(self):
+        try:
+            self.varValues
+        except AttributeError:
+            lp, matrix = self.getVarMatrix()
+            self.varValues = dict(zip(lp.integerVars, matrix.T.tolist()))
         return self.varValues
     
+    # end points of the segments, from left to right
+    def points(self):
+        return sorted(set([ s.p1 for s in self.segments ] +
+                          [ s.p2 for s in self.segments ]))
+
     def isLeaf(self):
         return len(self.segments) == 0 or \
         (len(self.segments) == 1 and \
@@ -108,6 +170,7 @@ class LowerBoundSet:
 
     # split the LB set into disjoint LB sets
     # missing lexicographic points are recalculated using provided Node object
+    @profiler.timed('split')
     def split(self, node, ubSet):
         epsilon = 1e-8
         regions = self.discontinuousRegions()
@@ -134,15 +197,92 @@ class LowerBoundSet:
                              for p1, p2 in zip(points[:-1], points[1:]) ]
                 segments[-1].right = r[0]
                 lb = LowerBoundSet(segments)
+                lb.error = self.error
                 lb.metaDataForPoint = metaDataForPoint
                 lb.metaData = lambda: iter(metaDataForPoint.values())
                 result.append(lb)
             return result
+
+# empty LB set of a node without feasible solutions
+def infeasibleLB():
+    lb = LowerBoundSet([])
+    lb.infeasible = True
+    return lb
                 
+# points computed while calculating the LB set of a node, from left to right,
+# with their metadata; used to avoid solving the same weighted sums again in
+# the children of this node
+# certified[i] is True iff the segment between points i and i + 1 was proven
+# to be part of the convex hull, i.e. both points optimise the weighted sum
+# defined by this segment; the leftmost and rightmost points are the lexmin
+# points, which optimise weighted sums with a slope of at least leftSlope and
+# at most rightSlope respectively
+class LBVertices:
+    def __init__(self, metaDataForPoint, certifiedSegments, leftSlope,
+                 rightSlope, nDecisions):
+        self.points = sorted(metaDataForPoint)
+        self.metaData = [ metaDataForPoint[p] for p in self.points ]
+        self.leftSlope = leftSlope
+        self.rightSlope = rightSlope
+        # number of branching decisions satisfied by every point
+        self.nDecisions = nDecisions
+        # slope of the weighted sum defined by each segment, negated so that
+        # it is sorted in increasing order
+        self.negatedSlopes = []
+        self.certified = []
+        for p1, p2 in zip(self.points[:-1], self.points[1:]):
+            if p2[0] > p1[0]:
+                self.negatedSlopes.append( - (p1[1] - p2[1]) / (p2[0] - p1[0]) )
+            else:
+                self.negatedSlopes.append( - float('inf') )
+            self.certified.append( (p1, p2) in certifiedSegments )
+
+    # index of a point known to optimise the weighted sum
+    # beta * z1 + alpha * z2, None if there is no such point
+    # point i optimises all weighted sums with slopes between those of the
+    # segments left and right of it, provided these segments are certified
+    def supportingPoint(self, beta, alpha):
+        if alpha <= 0 or len(self.points) == 0:
+            return None
+        slope = beta / alpha
+        i = bisect.bisect_left(self.negatedSlopes, - slope)
+        if i == 0:
+            if slope > self.leftSlope:
+                return None
+        elif not self.certified[i - 1]:
+            return None
+        if i == len(self.certified):
+            if slope < self.rightSlope:
+                return None
+        elif not self.certified[i]:
+            return None
+        return i
+
 class LBMetaData:
+    @profiler.timed('metadata')
     def __init__(self, lp):
-        self.data = lp.getDataOnIntegers()
+        self.lp = lp
+        # values of the integer variables, in the order of lp.integerVars
+        self.values = lp.solutionValues()[lp.integerIndices()]
         self.isInteger = lp.integerSolution()
 
+    # (variable, value) pairs for all integer variables
+    @property
+    def data(self):
+        return list(zip(self.lp.integerVars, self.values.tolist()))
+
+    # see IntegerSolution.__getstate__
+    def __getstate__(self):
+        return { 'values': self.values, 'isInteger': self.isInteger }
+
+    def __setstate__(self, state):
+        self.lp = params.model
+        self.values = state['values']
+        self.isInteger = state['isInteger']
+
+    # value of an integer variable in this solution, given its index
+    def value(self, lp, varIndex):
+        return self.values[lp.integerPosition(varIndex)]
+
     def __repr__(self):
         return str(self.data)
@@ -0,0 +1,560 @@
+import sys
+
+import numpy
+
+import grbvalues
+import params
+
+# solver libraries are optional: only the one of the selected backend is
+# required
+try:
+    import gurobipy
+except ImportError:
+    gurobipy = None
+try:
+    import highspy
+except ImportError:
+    highspy = None
+
+# Solver backends
+# A backend holds the solver model of a BasicLP, and is the only place where
+# the solver library is called. Models are built with addVar, quicksum,
+# linExpr and addConstr; variables and linear expressions are those of the
+# solver library, they support the usual arithmetic and comparison operators
+# and variables have an index attribute (their position in the model)
+# Large models are better built in bulk with addVars and addRows, where rows
+# are given as arrays of variable positions and coefficients
+# Conventions are those of Gurobi: bounds are named LB and UB, and objectives
+# are minimised
+
+infinity = float('inf')
+# variable types
+CONTINUOUS = 'C'
+BINARY = 'B'
+# bound types
+LB = 'LB'
+UB = 'UB'
+# solve status (names of the Gurobi status, see grbvalues)
+OPTIMAL = 'OPTIMAL'
+INFEASIBLE = 'INFEASIBLE'
+INF_OR_UNBD = 'INF_OR_UNBD'
+CUTOFF = 'CUTOFF'
+TIME_LIMIT = 'TIME_LIMIT'
+OTHER = 'OTHER'
+# where values of Gurobi callbacks (see grbvalues)
+MIPSOL = 4
+MIPNODE = 5
+
+class GurobiBackend:
+    # names of the solver parameters set by setParams
+    parameterNames = { 'threads': 'Threads',
+                       'optimalityTol': 'OptimalityTol',
+                       'feasibilityTol': 'FeasibilityTol',
+                       'intFeasTol': 'IntFeasTol',
+                       'mipGap': 'MIPGap',
+                       'numericFocus': 'NumericFocus',
+                       'outputFlag': 'Outputflag' }
+
+    statuses = set([ OPTIMAL, INFEASIBLE, INF_OR_UNBD, CUTOFF, TIME_LIMIT ])
+
+    def __init__(self, name, parent):
+        self.model = gurobipy.Model(name)
+        # used by basiclp.callbackWrapper
+        self.model._parent = parent
+
+    # building the model
+
+    def addVar(self, lb=0.0, ub=infinity, vtype=CONTINUOUS, name=''):
+        return self.model.addVar(lb=lb, ub=ub, vtype=vtype, name=name)
+
+    # add count variables, returned as a list; lb and ub are numbers or
+    # sequences of count numbers, names are optional
+    def addVars(self, count, lb=0.0, ub=infinity, vtype=CONTINUOUS,
+                names=None):
+        lb, ub = [ numpy.broadcast_to(numpy.asarray(b, dtype=float),
+                                      (count,)).tolist()
+                   for b in (lb, ub) ]
+        return list(self.model.addVars(count, lb=lb, ub=ub, vtype=vtype,
+                                       name=names or '').values())
+
+    # add one constraint per row r of columns and coefficients (arrays of the
+    # same shape): the sum of coefficients[r, t] * variables[columns[r, t]]
+    # compared to rhs[r] according to sense ('<', '>' or '='); rhs is a
+    # number or a sequence, names are optional
+    # the matrix API of gurobipy requires scipy, so rows are added one by
+    # one from coefficient lists
+    def addRows(self, variables, columns, coefficients, sense, rhs,
+                names=None):
+        columns = numpy.asarray(columns)
+        rowVariables = numpy.fromiter(variables, dtype=object,
+                                      count=len(variables))[columns].tolist()
+        coefficients = numpy.broadcast_to(numpy.asarray(coefficients,
+                                                        dtype=float),
+                                          columns.shape).tolist()
+        rhs = numpy.broadcast_to(numpy.asarray(rhs, dtype=float),
+                                 (len(columns),)).tolist()
+        names = names or [ '' ] * len(columns)
+        linExpr, addLConstr = gurobipy.LinExpr, self.model.addLConstr
+        return [ addLConstr(linExpr(c, v), sense, r, name)
+                 for v, c, r, name in zip(rowVariables, coefficients, rhs,
+                                          names) ]
+
+    def update(self):
+        self.model.update()
+
+    def quicksum(self, terms):
+        return gurobipy.quicksum(terms)
+
+    def linExpr(self, coefficients, variables):
+        return gurobipy.LinExpr(coefficients, variables)
+
+    def addConstr(self, constraint, name=''):
+        return self.model.addConstr(constraint, name=name)
+
+    def removeConstr(self, constraint):
+        self.model.remove(constraint)
+
+    # raises an exception if the constraint is not in the model any more
+    def setRHS(self, constraint, value):
+        constraint.setAttr('RHS', value)
+
+    def setParams(self, **values):
+        for key, value in values.items():
+            self.model.setParam(self.parameterNames[key], value)
+
+    def setBranchPriority(self, var, priority):
+        var.setAttr('BranchPriority', priority)
+
+    # querying and modifying the model
+
+    def variables(self):
+        return self.model.getVars()
+
+    def variableNames(self, variables):
+        return self.model.getAttr('VarName', variables)
+
+    def getBounds(self, boundType, variables):
+        return self.model.getAttr(boundType, variables)
+
+    def setBounds(self, boundType, variables, values):
+        self.model.setAttr(boundType, variables, values)
+
+    def isMIP(self):
+        return self.model.getAttr('IsMIP') != 0
+
+    def branchPriorities(self, variables):
+        return self.model.getAttr('BranchPriority', variables)
+
+    # indices, coefficients and constant of a linear expression
+    def linearCoefficients(self, expr):
+        indices = numpy.array([ expr.getVar(i).index
+                                for i in range(expr.size()) ], dtype=int)
+        coefficients = numpy.array([ expr.getCoeff(i)
+                                     for i in range(expr.size()) ])
+        return indices, coefficients, expr.getConstant()
+
+    # solving
+
+    def setObjective(self, expr):
+        self.model.setObjective(expr, gurobipy.GRB.MINIMIZE)
+
+    # None removes the cutoff
+    def setCutoff(self, value):
+        self.model.params.Cutoff = gurobipy.GRB.INFINITY if value is None \
+            else value
+
+    # time limit of the next solves, in seconds (None: no limit)
+    def setTimeLimit(self, seconds):
+        self.model.params.TimeLimit = gurobipy.GRB.INFINITY \
+            if seconds is None else seconds
+
+    def optimize(self, callback=None):
+        if callback is None:
+            self.model.optimize()
+        else:
+            self.model.optimize(callback)
+
+    def status(self):
+        name = self.statusName()
+        return name if name in self.statuses else OTHER
+
+    def statusName(self):
+        return grbvalues.status[self.model.getAttr('status')]
+
+    # results of the last solve
+
+    def values(self, variables):
+        return numpy.array(self.model.getAttr('X', variables))
+
+    # value of a linear expression in the current solution
+    def value(self, expr):
+        return expr.getValue()
+
+    def objectiveValue(self):
+        return self.model.getObjective().getValue()
+
+    # branch-and-bound nodes explored, not counting the root node
+    def nodeCount(self):
+        return int(self.model.getAttr('NodeCount'))
+
+    def solutionCount(self):
+        return self.model.getAttr('SolCount')
+
+    # values of the variables in each solution of the solution pool
+    def poolValues(self, variables):
+        result = []
+        for n in range(self.solutionCount()):
+            self.model.params.solutionNumber = n
+            result.append(numpy.array(self.model.getAttr('Xn', variables)))
+        self.model.params.solutionNumber = 0
+        return result
+
+    # range of objective coefficients for which the current basis stays
+    # optimal, as a pair of arrays (lower, upper)
+    def objectiveRanging(self, variables):
+        return ( numpy.array(self.model.getAttr('SAObjLow', variables)),
+                 numpy.array(self.model.getAttr('SAObjUp', variables)) )
+
+    def write(self, fileName):
+        self.model.write(fileName)
+
+# constraint of a HiGHS model: rows are renumbered when one of them is
+# removed, so constraints keep track of their current row
+class HighsConstraint:
+    __slots__ = ('index', 'sense', 'name')
+
+    def __init__(self, index, sense, name):
+        self.index = index
+        self.sense = sense
+        self.name = name
+
+# HiGHS only keeps what it needs to solve the model: bounds, branching
+# priorities and row senses are mirrored here so that they can be queried
+# HiGHS has no solution pool (the pool only holds the final solution), and
+# ignores branching priorities and cutoffs; time limits are passed as solver
+# options
+class HighsBackend:
+    # names of the solver options set by setParams (HiGHS has no equivalent
+    # of NumericFocus)
+    parameterNames = { 'threads': 'threads',
+                       'optimalityTol': 'dual_feasibility_tolerance',
+                       'feasibilityTol': 'primal_feasibility_tolerance',
+                       'intFeasTol': 'mip_feasibility_tolerance',
+                       'mipGap': 'mip_rel_gap',
+                       'outputFlag': 'output_flag' }
+
+    def __init__(self, name, parent):
+        self.model = highspy.Highs()
+        self.model.silent()
+        self.parent = parent
+        self.vars = []
+        # bounds of the variables, by index
+        self.lowerBounds = numpy.empty(0)
+        self.upperBounds = numpy.empty(0)
+        # values of the variables in the last solve, None if the model has
+        # changed since (see invalidate)
+        self.solution = None
+        # last list returned by variables, with its indices
+        self.allVars = []
+        self.allIndices = numpy.empty(0, dtype=numpy.int32)
+        self.integer = False
+        self.priorities = {}
+        self.rows = []
+        self.harvesting = False
+        statuses = highspy.HighsModelStatus
+        self.statuses = { statuses.kOptimal: OPTIMAL,
+                          statuses.kInfeasible: INFEASIBLE,
+                          statuses.kUnboundedOrInfeasible: INF_OR_UNBD,
+                          statuses.kTimeLimit: TIME_LIMIT }
+
+    # building the model
+
+    def addVar(self, lb=0.0, ub=infinity, vtype=CONTINUOUS, name=''):
+        if vtype == BINARY:
+            lb, ub = max(lb, 0), min(ub, 1)
+            self.integer = True
+            varType = highspy.HighsVarType.kInteger
+        else:
+            varType = highspy.HighsVarType.kContinuous
+        var = self.model.addVariable(lb=lb, ub=ub, type=varType,
+                                     name=name or None)
+        self.vars.append(var)
+        self.lowerBounds = numpy.append(self.lowerBounds, lb)
+        self.upperBounds = numpy.append(self.upperBounds, ub)
+        self.invalidate()
+        return var
+
+    # add count variables, returned as a list; lb and ub are numbers or
+    # sequences of count numbers, names are optional
+    def addVars(self, count, lb=0.0, ub=infinity, vtype=CONTINUOUS,
+                names=None):
+        lb, ub = [ numpy.broadcast_to(numpy.asarray(b, dtype=float),
+                                      (count,))
+                   for b in (lb, ub) ]
+        if vtype == BINARY:
+            lb, ub = numpy.maximum(lb, 0), numpy.minimum(ub, 1)
+            self.integer = True
+        first = len(self.vars)
+        indices = numpy.arange(first, first + count, dtype=numpy.int32)
+        self.model.addCols(count, numpy.zeros(count), lb, ub, 0,
+                           numpy.empty(0, dtype=numpy.int32),
+                           numpy.empty(0, dtype=numpy.int32),
+                           numpy.empty(0))
+        if vtype == BINARY:
+            self.model.changeColsIntegrality(
+                count, indices,
+                numpy.full(count, highspy.HighsVarType.kInteger.value,
+                           dtype=numpy.uint8))
+        if names is not None:
+            for index, name in zip(indices.tolist(), names):
+                self.model.passColName(index, name)
+        variables = [ highspy.highs_var(index, self.model)
+                      for index in indices.tolist() ]
+        self.vars += variables
+        self.lowerBounds = numpy.concatenate((self.lowerBounds, lb))
+        self.upperBounds = numpy.concatenate((self.upperBounds, ub))
+        self.invalidate()
+        return variables
+
+    # add one constraint per row r of columns and coefficients (arrays of the
+    # same shape): the sum of coefficients[r, t] * variables[columns[r, t]]
+    # compared to rhs[r] according to sense ('<', '>' or '='); rhs is a
+    # number or a sequence, names are optional
+    def addRows(self, variables, columns, coefficients, sense, rhs,
+                names=None):
+        columns = numpy.asarray(columns)
+        nRows, width = columns.shape
+        indices = numpy.array([ var.index for var in variables ],
+                              dtype=numpy.int32)[columns]
+        coefficients = numpy.broadcast_to(numpy.asarray(coefficients,
+                                                        dtype=float),
+                                          columns.shape)
+        rhs = numpy.broadcast_to(numpy.asarray(rhs, dtype=float), (nRows,))
+        lower = rhs if sense in '>=' else numpy.full(nRows, - infinity)
+        upper = rhs if sense in '<=' else numpy.full(nRows, infinity)
+        first = len(self.rows)
+        self.model.addRows(nRows, lower, upper, nRows * width,
+                           numpy.arange(0, nRows * width, width,
+                                        dtype=numpy.int32),
+                           indices.ravel(), coefficients.ravel())
+        names = names or [ '' ] * nRows
+        rows = [ HighsConstraint(first + r, sense, name)
+                 for r, name in enumerate(names) ]
+        for row in rows:
+            if row.name:
+                self.model.passRowName(row.index, row.name)
+        self.rows += rows
+        self.invalidate()
+        return rows
+
+    # changes are made immediately
+    def update(self):
+        pass
+
+    def quicksum(self, terms):
+        return self.model.qsum(terms)
+
+    def linExpr(self, coefficients, variables):
+        expr = highspy.highs_linear_expression()
+        expr.idxs = [ var.index for var in variables ]
+        expr.vals = [ float(c) for c in coefficients ]
+        return expr
+
+    # the constant of the expression is folded into the bounds of the row
+    def addConstr(self, constraint, name=''):
+        lower, upper = constraint.bounds
+        indices, coefficients = constraint.unique_elements()
+        self.model.addRow(lower, upper, len(indices), indices, coefficients)
+        if lower == upper:
+            sense = '='
+        elif lower == - infinity:
+            sense = '<'
+        else:
+            sense = '>'
+        row = HighsConstraint(len(self.rows), sense, name)
+        if name:
+            self.model.passRowName(row.index, name)
+        self.rows.append(row)
+        self.invalidate()
+        return row
+
+    def removeConstr(self, row):
+        if row.index < 0:
+            raise ValueError('constraint is not in the model')
+        self.model.deleteRows(1, numpy.array([ row.index ], dtype=numpy.int32))
+        del self.rows[row.index]
+        for other in self.rows[row.index:]:
+            other.index -= 1
+        row.index = -1
+        self.invalidate()
+
+    # raises an exception if the constraint is not in the model any more
+    def setRHS(self, row, value):
+        if row.index < 0:
+            raise ValueError('constraint is not in the model')
+        lower = value if row.sense in '>=' else - infinity
+        upper = value if row.sense in '<=' else infinity
+        self.model.changeRowBounds(row.index, lower, upper)
+        self.invalidate()
+
+    def setParams(self, **values):
+        for key, value in values.items():
+            if key == 'outputFlag':
+                value = bool(value)
+            if key in self.parameterNames:
+                self.model.setOptionValue(self.parameterNames[key], value)
+
+    def setBranchPriority(self, var, priority):
+        self.priorities[var.index] = priority
+
+    # querying and modifying the model
+
+    # the list is kept: its indices are not recomputed when it is passed back
+    # (BasicLP reads the values of all variables after each solve)
+    def variables(self):
+        self.allVars = list(self.vars)
+        self.allIndices = numpy.arange(len(self.allVars), dtype=numpy.int32)
+        return self.allVars
+
+    def variableNames(self, variables):
+        return [ var.name for var in variables ]
+
+    def getBounds(self, boundType, variables):
+        bounds = self.lowerBounds if boundType == LB else self.upperBounds
+        return bounds[self.indices(variables)].tolist()
+
+    # only the bounds of the given variables are passed to HiGHS
+    def setBounds(self, boundType, variables, values):
+        bounds = self.lowerBounds if boundType == LB else self.upperBounds
+        indices = self.indices(variables)
+        bounds[indices] = values
+        self.model.changeColsBounds(len(indices), indices,
+                                    self.lowerBounds[indices],
+                                    self.upperBounds[indices])
+        self.invalidate()
+
+    def indices(self, variables):
+        if variables is self.allVars:
+            return self.allIndices
+        return numpy.fromiter(( var.index for var in variables ),
+                              dtype=numpy.int32, count=len(variables))
+
+    def isMIP(self):
+        return self.integer
+
+    def branchPriorities(self, variables):
+        return [ self.priorities.get(var.index, 0) for var in variables ]
+
+    # indices, coefficients and constant of a linear expression
+    def linearCoefficients(self, expr):
+        indices, coefficients = expr.unique_elements()
+        return indices.astype(int), coefficients, expr.constant or 0.0
+
+    # solving
+
+    def setObjective(self, expr):
+        indices, coefficients, constant = self.linearCoefficients(expr)
+        costs = numpy.zeros(len(self.vars))
+        costs[indices] = coefficients
+        self.model.changeColsCost(len(costs),
+                                  numpy.arange(len(costs), dtype=numpy.int32),
+                                  costs)
+        self.model.changeObjectiveOffset(constant)
+        self.invalidate()
+
+    # the objective_bound option of HiGHS does not make MIPs stop at the
+    # cutoff (worse solutions are still reported as optimal), so cutoffs are
+    # ignored: they only speed up the solve
+    def setCutoff(self, value):
+        pass
+
+    # for LPs, the time_limit option applies to the total time of all solves
+    # so far, for MIPs to the current solve only
+    def setTimeLimit(self, seconds):
+        if seconds is not None and not self.integer:
+            seconds += self.model.getRunTime()
+        self.model.setOptionValue('time_limit',
+                                  infinity if seconds is None else seconds)
+
+    # incumbents are passed to the newIncumbent method of the parent BasicLP
+    # when a callback is given (see basiclp.callbackWrapper for Gurobi)
+    def optimize(self, callback=None):
+        if callback is not None and self.integer and not self.harvesting:
+            self.model.cbMipImprovingSolution.subscribe(self.onIncumbent)
+            self.harvesting = True
+        self.model.run()
+        self.solution = numpy.array(self.model.getSolution().col_value)
+
+    def onIncumbent(self, event):
+        self.parent.newIncumbent(numpy.array(event.data_out.mip_solution))
+
+    def status(self):
+        return self.statuses.get(self.model.getModelStatus(), OTHER)
+
+    def statusName(self):
+        return self.model.modelStatusToString(self.model.getModelStatus())
+
+    # results of the last solve
+
+    # the solution of the last solve does not describe the model any more
+    def invalidate(self):
+        self.solution = None
+
+    # values of the last solve; raises an exception if the model has
+    # changed since
+    def solutionValues(self):
+        if self.solution is None:
+            raise ValueError('no solution for the current model')
+        return self.solution
+
+    def values(self, variables):
+        return self.solutionValues()[self.indices(variables)]
+
+    # value of a linear expression in the current solution
+    def value(self, expr):
+        indices, coefficients, constant = self.linearCoefficients(expr)
+        return float(numpy.dot(self.solutionValues()[indices],
+                               coefficients)) + constant
+
+    def objectiveValue(self):
+        return self.model.getInfo().objective_function_value
+
+    # branch-and-bound nodes explored, not counting the root node
+    def nodeCount(self):
+        return max(0, self.model.getInfo().mip_node_count - 1)
+
+    def solutionCount(self):
+        feasible = highspy.SolutionStatus.kSolutionStatusFeasible
+        return 1 if self.model.getInfo().primal_solution_status == feasible \
+            else 0
+
+    # values of the variables in each solution of the solution pool
+    def poolValues(self, variables):
+        return [ self.values(variables) ] if self.solutionCount() > 0 else []
+
+    # range of objective coefficients for which the current basis stays
+    # optimal, as a pair of arrays (lower, upper)
+    def objectiveRanging(self, variables):
+        status, ranging = self.model.getRanging()
+        indices = [ var.index for var in variables ]
+        return ( numpy.array(ranging.col_cost_dn.value_)[indices],
+                 numpy.array(ranging.col_cost_up.value_)[indices] )
+
+    def write(self, fileName):
+        self.model.writeModel(fileName)
+
+backends = { 'gurobi': (GurobiBackend, gurobipy),
+             'highs': (HighsBackend, highspy) }
+
+# backend for a new model, as selected in params.solverBackend
+def newBackend(name, parent):
+    try:
+        backendClass, library = backends[params.solverBackend]
+    except KeyError:
+        print('Error: unknown solver backend:', params.solverBackend)
+        sys.exit(23)
+    if library is None:
+        print('Error: solver backend', params.solverBackend,
+              'is not available (its Python package is not installed)')
+        sys.exit(23)
+    return backendClass(name, parent)
@@ -0,0 +1,185 @@
+import atexit
+import collections
+import hashlib
+import shelve
+
+import params
+
+# Memoization of weighted-sum solves
+# An entry is keyed by a fingerprint of the instance, the settings that change
+# the result (see settings), the branching decisions applied to the model, the
+# weights and the objective space bounds; it stores what
+# BasicLP.solveWeightedSum needs to replay the solve without calling the
+# solver: the returned point (None for infeasible LPs), the non-zero values of
+# the optimal solution, the integer solutions found with it and the solution
+# pool of MIPs (None for LPs, whose pool is the optimal solution)
+# Worker processes only read the file kept between runs: the entries they
+# add are sent to the coordinator with their results (see workerpool), which
+# stores them once the workers are done, since some dbm modules do not let a
+# process read a file that another one has open for writing
+
+# rough size estimate of an entry, in bytes
+def entrySize(entry):
+    point, indices, values, solutions, pool = entry
+    size = 256 + indices.nbytes + values.nbytes
+    for u in solutions + (pool or []):
+        size += 128 + 96 * len(u.vars)
+    return size
+
+# version of the entry format: entries kept in a file by older versions are
+# not used
+entryVersion = 2
+
+# parameters that change what is stored for a given LP: the solutions found
+# with it and their improved objective values
+def settings():
+    return ( entryVersion, params.solverBackend, params.integerDominance,
+             params.harvestIncumbents, params.harvestSolutionPool,
+             params.solutionClass.__name__, params.solutionClass.digits )
+
+class LPCache:
+    def __init__(self, maxSize, fileName=None, readOnly=False):
+        # memory budget in bytes
+        self.maxSize = maxSize
+        self.size = 0
+        # least recently used entries come first
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.instanceKey = None
+        self.fileName = fileName
+        self.readOnly = readOnly
+        # entries added by a worker process, to be sent to the coordinator
+        self.newEntries = []
+        # entries to store once the file is open again (see suspend)
+        self.pending = []
+        self.suspended = False
+        self.store = None
+        if fileName:
+            self.open()
+            atexit.register(self.close)
+
+    def open(self):
+        if not self.readOnly:
+            self.store = shelve.open(self.fileName)
+            return
+        try:
+            self.store = shelve.open(self.fileName, flag='r')
+        except Exception:
+            # e.g. no file yet: entries are still sent to the coordinator
+            self.store = None
+
+    # fingerprint of the instance and of the model built from it
+    def instance(self, lp):
+        if self.instanceKey is None:
+            h = hashlib.sha1()
+            h.update(repr( (params.problemType,
+                            lp.__class__.__name__) ).encode())
+            try:
+                with open(params.inputFile, 'rb') as f:
+                    h.update(f.read())
+            except Exception:
+                # without input file, only the current process can use the
+                # cache: do not mix up its entries with those of another one
+                h.update(repr(id(params.inputData)).encode())
+            self.instanceKey = h.hexdigest()
+        return self.instanceKey
+
+    # key of a weighted-sum solve on the current model, None if it cannot be
+    # cached because some applied decision has an unknown effect on the LP
+    def key(self, lp, w1, w2, right, top):
+        decisions = []
+        path = lp.appliedPath
+        while path is not None:
+            k = path.decision.lpKey()
+            if k is None:
+                return None
+            elif k != ():
+                decisions.append(k)
+            path = path.parent
+        decisions.sort()
+        fingerprint = repr( (self.instance(lp), settings(),
+                             int(lp.backend.isMIP()),
+                             decisions, w1, w2, right, top) )
+        return hashlib.sha1(fingerprint.encode()).hexdigest()
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        elif self.store is not None and key in self.store:
+            entry = self.store[key]
+            self.insert(key, entry)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        self.insert(key, entry)
+        if self.readOnly:
+            self.newEntries.append( (key, entry) )
+        else:
+            self.keep([ (key, entry) ])
+
+    # store entries in the file, e.g. those sent by worker processes
+    def keep(self, entries):
+        if self.suspended:
+            self.pending += entries
+        elif self.store is not None:
+            for key, entry in entries:
+                self.store[key] = entry
+
+    # entries added since the last call (worker processes)
+    def takeNewEntries(self):
+        entries, self.newEntries = self.newEntries, []
+        return entries
+
+    # the file is closed while worker processes read it, and opened again
+    # afterwards to store the entries kept in the meantime
+    def suspend(self):
+        if self.store is not None and not self.suspended:
+            self.store.close()
+            self.store = None
+            self.suspended = True
+
+    def resume(self):
+        if self.suspended:
+            self.suspended = False
+            self.open()
+            self.keep(self.pending)
+            self.pending = []
+
+    # add to memory, evicting least recently used entries
+    def insert(self, key, entry):
+        if key in self.entries:
+            return
+        self.entries[key] = entry
+        self.size += entrySize(entry)
+        while self.size > self.maxSize and len(self.entries) > 0:
+            oldKey, oldEntry = self.entries.popitem(last=False)
+            self.size -= entrySize(oldEntry)
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+# cache of the current process, created on first use
+cache = None
+# set in worker processes, which do not write to the file
+readOnly = False
+
+# returns None if caching is deactivated
+# a cache file is used even without memory budget
+def getCache():
+    global cache
+    if cache is None and (params.lpCacheSize > 0 or params.lpCacheFile):
+        cache = LPCache(params.lpCacheSize * 1024 * 1024, params.lpCacheFile,
+                        readOnly)
+    return cache
+
+# (hits, misses) of the cache of the current process
+def counters():
+    return (cache.hits, cache.misses) if cache is not None else (0, 0)
@@ -0,0 +1,143 @@
+import bisect
+
+import params
+
+# Node selection for best-first tree search
+# nodes with the smallest key are processed first; a key is computed when a
+# node is queued
+# some keys depend on the UB set: they are computed again when the node
+# reaches the top of the queue if the UB set has changed in the meantime
+# since these keys can only increase when the UB set improves, a node whose
+# updated key is still the smallest one is the right node to process
+
+# legacy ordering: item.score (area of the box for nodes)
+class ScoreKey:
+    def __init__(self, ub=None):
+        self.ub = ub
+
+    # keys computed with different versions may differ
+    def version(self):
+        return 0
+
+    def __call__(self, node):
+        return node.score
+
+# nodes with the largest gap between the LB set of their parent and the UB
+# set are processed first
+# the root node has no parent LB set, it comes first
+class GapKey(ScoreKey):
+    def version(self):
+        return self.ub.version
+
+    def __call__(self, node):
+        if node.lbPoints is None:
+            return - float('inf')
+        return - self.gap(node.lbPoints, node.right, node.top) * \
+            self.depthFactor(node)
+
+    def depthFactor(self, node):
+        return 1
+
+    # abstract version: must be overloaded in subclasses
+    def gap(self, points, right, top):
+        return 0
+
+# area of the part of the box of the node that is above the LB set and not
+# dominated by the UB set
+class HypervolumeKey(GapKey):
+    def gap(self, points, right, top):
+        ub = self.ub
+        z1Values, minusZ2Values = ub.z1Values, ub.minusZ2Values
+        left = points[0][0]
+        if left >= right:
+            return 0
+        # staircase: the non-dominated part of the box is below it
+        i = bisect.bisect_right(z1Values, left)
+        staircase = min(top, - minusZ2Values[i - 1]) if i > 0 else top
+        # z1 values where the LB set or the staircase change
+        end = bisect.bisect_left(z1Values, right, i)
+        breakpoints = sorted(set([ p[0] for p in points if p[0] < right ] +
+                                 z1Values[i:end].tolist() + [ right ]))
+        area = 0
+        j = 0
+        a = left
+        for b in breakpoints[1:]:
+            # LB value at a and b
+            while j + 1 < len(points) and points[j + 1][0] <= a:
+                j += 1
+            la = lbValue(points, j, a)
+            lb = lbValue(points, j, b)
+            area += areaBelow(a, b, la, lb, staircase)
+            # the staircase goes down when b is a UB point
+            while i < len(z1Values) and z1Values[i] <= b:
+                staircase = min(staircase, - minusZ2Values[i])
+                i += 1
+            a = b
+        return area
+
+# largest Chebyshev distance between a local nadir point of the UB set in the
+# box of the node and the LB set
+class NadirKey(GapKey):
+    def gap(self, points, right, top):
+        first, last = self.ub.boxRange(right, top)
+        solutions = self.ub.solutions[first:last]
+        if len(solutions) == 0:
+            nadirs = [ (right, top) ]
+        else:
+            nadirs = [ (solutions[0].z1, top) ] + \
+                [ (v.z1, u.z2)
+                  for u, v in zip(solutions[:-1], solutions[1:]) ] + \
+                [ (right, solutions[-1].z2) ]
+        return max(max(0, chebyshevDistance(n, points)) for n in nadirs)
+
+class DepthWeightedHypervolumeKey(HypervolumeKey):
+    def depthFactor(self, node):
+        return 1 + params.nodePriorityDepthWeight * node.depth
+
+class DepthWeightedNadirKey(NadirKey):
+    def depthFactor(self, node):
+        return 1 + params.nodePriorityDepthWeight * node.depth
+
+# value of the LB set at z, assuming points[j][0] <= z <= points[j + 1][0]
+# right of the last point, the LB set is horizontal
+def lbValue(points, j, z):
+    if j + 1 >= len(points):
+        return points[-1][1]
+    (x1, y1), (x2, y2) = points[j], points[j + 1]
+    if x2 <= x1:
+        return min(y1, y2)
+    return y1 + (y2 - y1) * (z - x1) / (x2 - x1)
+
+# area between the horizontal line at height h and the segment from (a, la) to
+# (b, lb), counted only where the segment is below the line
+def areaBelow(a, b, la, lb, h):
+    da, db = h - la, h - lb
+    if da <= 0 and db <= 0:
+        return 0
+    elif da >= 0 and db >= 0:
+        return (b - a) * (da + db) / 2
+    else:
+        positive = max(da, db)
+        return (b - a) * positive / (da - db if da > db else db - da) * \
+            positive / 2
+
+# largest t such that (n1 - t, n2 - t) is above the LB set defined by points
+# (negative if n itself is below the LB set)
+def chebyshevDistance(n, points):
+    n1, n2 = n
+    t = min(n1 - points[0][0], n2 - points[-1][1])
+    for (x1, y1), (x2, y2) in zip(points[:-1], points[1:]):
+        if x2 > x1:
+            a = (y2 - y1) / (x2 - x1)
+            b = y1 - a * x1
+            t = min(t, (n2 - a * n1 - b) / (1 - a))
+    return t
+
+keys = { 'area': ScoreKey,
+         'hypervolume': HypervolumeKey,
+         'nadir': NadirKey,
+         'hypervolume-depth': DepthWeightedHypervolumeKey,
+         'nadir-depth': DepthWeightedNadirKey }
+
+def nodeKey(name, ub):
+    return keys[name](ub)
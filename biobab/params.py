@@ -1,7 +1,19 @@
 # time limit for biobab or epsilon-constraint, in seconds
 timeLimit = None
+# the time limit (and timestamps) are in wall-clock time instead of CPU time
+wallClock = False
+# reserve kept before the time limit: a lexmin or the LB set of a node is only
+# started if more time is left, so that it can usually finish
+# 'none': no reserve, 'fixed': timeReserve seconds, 'longest': longest time
+# taken so far by a lexmin or an LB set
+timeReservePolicy = 'none'
+timeReserve = 1.0
 # self explanatory
 debug = False
+# variables and constraints are named in the solver, e.g. for the model files
+# written in debug mode (which turns this on); otherwise variable names are
+# only computed when they are needed, e.g. in solution files
+modelNames = False
 # how much verbosity we want during execution
 verbosity = 1
 
@@ -28,14 +40,74 @@ objectiveSpaceBranching = True
 # if a new point c is found between a and b, (a,c) and (c,b) are further
 # processed in LB calculation iff the area of (a,b,c) is at least a certain
 # ratio of the area of (a,b,z)
+# otherwise (a,b) is replaced with a weaker LB segment through c: LB sets are
+# approximate, with fewer LPs per node (0: exact LB sets)
 biobabLbRatio = 0#0.1
+# reuse the points of the parent LB set when computing the LB set of a node
+lbWarmStart = True
+# number of bounded nodes whose LB points are kept for their
+# children (queued nodes do not keep them, see TreeSearch.keepWarmStart)
+warmStartNodes = 64
+# RAM limit of the process (e.g. 8G), None if there is no limit
+memoryLimit = None
+# adaptive search is best-first, but dives depth-first while the process uses
+# more than adaptiveMemory MB of RSS (default: 80% of memoryLimit, compared
+# with the size of its address space) or more than adaptiveQueueSize nodes are
+# queued; best-first is resumed once both are back under adaptiveResumeRatio
+# times these values
+adaptiveMemory = None
+adaptiveQueueSize = 100000
+adaptiveResumeRatio = .5
+# memory is measured every adaptiveMemoryInterval nodes
+adaptiveMemoryInterval = 100
+# maximum number of queued nodes kept in memory during tree search, the others
+# are written to temporary files in queueDirectory (None: keep all of them)
+queueMemory = None
+queueDirectory = None
+# node selection for best-first search: area, hypervolume, nadir,
+# hypervolume-depth or nadir-depth (see nodepriority.py)
+nodePriority = 'hypervolume'
+# how much deeper nodes are favoured by depth-weighted node priorities
+nodePriorityDepthWeight = .1
+# number of worker processes used to bound nodes (BIOBAB), to solve strips
+# (epsilon-constraint) or to explore rectangles (balanced box) in parallel
+nJobs = 1
+# in parallel epsilon-constraint, the objective range is split into
+# epsilonStripsPerJob * nJobs strips
+epsilonStripsPerJob = 4
+# memory budget of the cache of solved weighted-sum LPs, in MB (0: no cache)
+# within a run, the same LP is rarely solved twice, so the cache is off by
+# default
+lpCacheSize = 0
+# file used to keep cached LPs from one run to the next (None: not kept)
+lpCacheFile = None
+# directory where parsed instance files are cached in binary form, so that
+# they are only parsed once (None: no cache, see instancecache.py)
+instanceCacheDir = None
+# file where the search state is saved every checkpointInterval seconds, when
+# the time limit is reached, on SIGUSR1 and on SIGTERM (None: no checkpoints)
+checkpointFile = None
+checkpointInterval = 600
+# resume the search from checkpointFile
+resume = False
+# file where run metrics are written at exit, as JSON: time spent in each
+# phase, pruning reasons, nodes per depth, LPs per node, queue size, memory
+# (None: no profiling, see profiler.py)
+profileFile = None
 # ws or lex
 lexminMethod = 'lex'
+# solver used for LPs and MIPs: gurobi or highs (see lpbackend.py)
+solverBackend = 'gurobi'
 # do we use the linear relaxation when computing LB sets?
 useLinearRelaxation = True
 
 # generic parameter, used among others in singlesolver
 feasibilityTolerance = 1e-6
 
+# add every incumbent found while solving a MIP to the UB set
+harvestIncumbents = True
+# add the solution pool of each MIP to the UB set
+harvestSolutionPool = False
+
 # should we cutoff MIPs using previously found solutions?
 mipCutoff = True
@@ -0,0 +1,179 @@
+import collections
+import functools
+import json
+import os
+import sys
+import time
+
+# not available on every platform
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import params
+import util
+
+# Run metrics, written as JSON to params.profileFile at exit
+# Phases are timed with
+#     with profiler.phase('name'):
+#         ...
+# or, for whole functions, with the @profiler.timed('name') decorator
+# phase times are inclusive: a phase that runs inside another one (e.g.
+# weighted-sum inside lexmin) is counted in both
+# When profiling is off, phase() returns an object that does nothing and the
+# other functions return immediately, so instrumentation can stay in place
+# Worker processes profile the tasks they run and send their metrics back
+# with the results (see workerpool), so the file covers the whole run
+
+enabled = False
+
+# number of calls and total time of each phase, in seconds
+phases = {}
+# events, e.g. pruning reasons
+counts = collections.Counter()
+# number of nodes bounded at each depth
+nodesPerDepth = collections.Counter()
+# number of nodes for which a given number of LPs was solved
+lpsPerNode = collections.Counter()
+# largest queue size, and queue size every queueSampleInterval nodes
+maxQueueSize = 0
+queueSizes = []
+queueSampleInterval = 100
+# at most this many queue size samples are kept: every other sample is
+# dropped, and the interval doubled, when there are more
+maxQueueSamples = 1000
+
+wallStart = time.time()
+cpuStart = time.process_time()
+
+class Phase:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, excType, excValue, traceback):
+        elapsed = time.perf_counter() - self.start
+        entry = phases.get(self.name)
+        if entry is None:
+            phases[self.name] = [ 1, elapsed ]
+        else:
+            entry[0] += 1
+            entry[1] += elapsed
+        return False
+
+class NoPhase:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, excType, excValue, traceback):
+        return False
+
+noPhase = NoPhase()
+
+def phase(name):
+    return Phase(name) if enabled else noPhase
+
+# decorator timing each call of a function as a phase
+def timed(name):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            with Phase(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count(name, n=1):
+    if enabled:
+        counts[name] += n
+
+# a node was bounded with nLPs LPs
+def nodeBounded(depth, nLPs):
+    if enabled:
+        nodesPerDepth[depth] += 1
+        lpsPerNode[nLPs] += 1
+
+# size of the queue when the nNodes-th node is processed
+def queueSize(size, nNodes):
+    global maxQueueSize, queueSampleInterval, queueSizes
+    if enabled:
+        maxQueueSize = max(maxQueueSize, size)
+        if nNodes % queueSampleInterval == 0:
+            queueSizes.append( (nNodes, size) )
+            if len(queueSizes) > maxQueueSamples:
+                queueSizes = queueSizes[1::2]
+                queueSampleInterval *= 2
+
+def start():
+    global enabled, wallStart, cpuStart
+    enabled = True
+    wallStart = time.time()
+    cpuStart = time.process_time()
+
+# metrics collected in this process since the last call to reset
+def collect():
+    return { 'phases': { name: list(entry)
+                         for name, entry in phases.items() },
+             'counts': dict(counts),
+             'nodesPerDepth': dict(nodesPerDepth),
+             'lpsPerNode': dict(lpsPerNode) }
+
+def reset():
+    phases.clear()
+    counts.clear()
+    nodesPerDepth.clear()
+    lpsPerNode.clear()
+
+# add metrics collected by another process
+def merge(metrics):
+    for name, (calls, seconds) in metrics['phases'].items():
+        entry = phases.setdefault(name, [ 0, 0.0 ])
+        entry[0] += calls
+        entry[1] += seconds
+    counts.update(metrics['counts'])
+    nodesPerDepth.update(metrics['nodesPerDepth'])
+    lpsPerNode.update(metrics['lpsPerNode'])
+
+# peak resident set size of this process and of its largest worker, in bytes
+# (None if it cannot be known)
+def peakMemory():
+    if resource is None:
+        return None, None
+    # ru_maxrss is in bytes on macOS, in KB elsewhere
+    unit = 1 if sys.platform == 'darwin' else 1024
+    return ( resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit,
+             resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit )
+
+# write all metrics to fileName, along with the given run summary
+def write(fileName, summary):
+    peakRSS, peakWorkerRSS = peakMemory()
+    data = { 'algorithm': params.algorithm,
+             'problemType': params.problemType,
+             'inputFile': params.inputFile,
+             'wallTime': time.time() - wallStart,
+             'cpuTime': time.process_time() - cpuStart,
+             'summary': summary,
+             'phases': { name: { 'calls': calls, 'seconds': seconds }
+                         for name, (calls, seconds) in sorted(phases.items()) },
+             'counts': dict(sorted(counts.items())),
+             'nodesPerDepth': { str(d): n
+                                for d, n in sorted(nodesPerDepth.items()) },
+             'lpsPerNode': { str(k): n for k, n in sorted(lpsPerNode.items()) },
+             'queue': { 'max': maxQueueSize,
+                        'samples': queueSizes },
+             'memory': { 'peakRSS': peakRSS,
+                         'peakWorkerRSS': peakWorkerRSS } }
+    tmpName = fileName + '.tmp'
+    with open(tmpName, 'w') as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmpName, fileName)
+    print(util.TS() + '\tStored run metrics to', fileName)
@@ -1,12 +1,20 @@
 import sys
+import collections
 import math
+import pickle
 
+import numpy
+
+import checkpoint
 import flexiblequeue
+import nodepriority
+import profiler
 import util
+import workerpool
 import params
 import biobabnode
-
-from gurobipy import *
+import basiclp
+import lpbackend
 
 zero = 1e-6
 
@@ -18,7 +26,11 @@ class Bounder:
         pass
 
     def bound(self, node, ub):
+        nLPs = params.modelClass.nLPs
         lb =  node.lowerBound(ub)
+        profiler.nodeBounded(node.depth, params.modelClass.nLPs - nLPs)
+        if lb.infeasible:
+            profiler.count('pruned-infeasible')
         if params.debug:
             Bounder.nSaved += 1
             fName = 'bounds-' + '%05d' % Bounder.nSaved + '.py'
@@ -29,6 +41,10 @@ class Bounder:
         if params.verbosity > 2:
             print('LB before:', lb)
         lb.filter(ub)
+        # segments without integer points in the node box are dropped as
+        # well, before or during filtering
+        if len(lb.segments) == 0 and not lb.infeasible:
+            profiler.count('pruned-dominated')
         if params.verbosity > 2:
             print('LB after:', lb)
         if params.debug:
@@ -48,83 +64,73 @@ class BinaryPriorityBrancher(Brancher):
     # generate two branches
     def genBranches(self, lb):
         # branch on lp variable
-        bestVar = self.bestCandidate(lb.getVarValues())
+        bestVar = self.bestCandidate(lb)
         if bestVar is None:
             return []
         else:
-            return [ GurobiBinaryBoundBranching( bestVar, GRB.Attr.UB, 0 ),
-                     GurobiBinaryBoundBranching( bestVar, GRB.Attr.LB, 1 ) ]
+            return [ BinaryBoundBranching( bestVar, lpbackend.UB, 0 ),
+                     BinaryBoundBranching( bestVar, lpbackend.LB, 1 ) ]
         
     # branch on the binary variable with the highest score
-    def bestCandidate(self, varValues):
-        bestVar, bestScore = None, 0
-        for var in varValues:
-            if bestVar and \
-               bestVar.getAttr('BranchPriority') > \
-               var.getAttr('BranchPriority'):
-                continue
-            else:
-                avg = util.listAvg(varValues[var])
-                if avg <= zero or avg >= 1 - zero:
-                    continue
-                else:
-                    score = self.score(var, varValues)
-                    if score > bestScore or \
-                       ( bestScore > 0 and score > 0 and \
-                         var.getAttr('BranchPriority') > \
-                         bestVar.getAttr('BranchPriority') ):
-                        bestVar, bestScore = var, score
-        return bestVar
+    # only variables that are fractional on average and have a positive score
+    # are considered; among those, only the ones with the highest branching
+    # priority, and ties are broken in favour of the first variable
+    def bestCandidate(self, lb):
+        lp, values = lb.getVarMatrix()
+        avg = values.sum(axis=0) / len(values)
+        scores = self.scores(lp, values)
+        candidates = (avg > zero) & (avg < 1 - zero) & (scores > 0)
+        if not candidates.any():
+            return None
+        priorities = lp.branchPriorities()
+        candidates &= priorities == priorities[candidates].max()
+        best = numpy.argmax(numpy.where(candidates, scores, - numpy.inf))
+        return lp.integerVars[int(best)]
 
     # abstract version: must be overloaded in subclasses
-    # returns the score of a variable
+    # returns the score of each integer variable, given the matrix of values
+    # they take at each point of the LB set (one column per variable)
     # the higher the score, the more likely it will be selected for branching
-    def score(self, var, varValues):
-        return 0
+    def scores(self, lp, values):
+        return numpy.zeros(values.shape[1])
 
 class ClosestToOneBinaryPriorityBrancher(BinaryPriorityBrancher):
-    def score(self, var, varValues):
-        best = 0
-        for value in varValues[var]:
-            # fractional, we look at it
-            if value < 1 - zero and value > best:
-                best = value
-        return best
+    # highest fractional value
+    def scores(self, lp, values):
+        return numpy.where(values < 1 - zero, values, 0).max(axis=0)
 
 class FurthestToOneBinaryPriorityBrancher(BinaryPriorityBrancher):
-    def score(self, var, varValues):
-        best = 0
-        for value in varValues[var]:
+    def scores(self, lp, values):
+        best = numpy.zeros(values.shape[1])
+        for row in values:
             # fractional, we look at it
-            if value < 1 - zero and (best == 0 or value < best):
-                best = 1 - value
+            update = (row < 1 - zero) & ((best == 0) | (row < best))
+            best = numpy.where(update, 1 - row, best)
         return best
                     
 class OftenFractionalBinaryPriorityBrancher(BinaryPriorityBrancher):
-    def score(self, var, varValues):
-        nTimesFractional = 0
-        for value in varValues[var]:
-            if util.isFractional(value):
-                nTimesFractional += 1
-        return nTimesFractional
+    def scores(self, lp, values):
+        fractional = (values > numpy.floor(values) + util.epsilon) & \
+                     (values < numpy.ceil(values) - util.epsilon)
+        return fractional.sum(axis=0)
 
 class FractionalOnAverageBinaryPriorityBrancher(BinaryPriorityBrancher):
-    def score(self, var, varValues):
-        avgDistanceToHalf = util.listAvg( [ math.fabs(x - .5)
-                                            for x in varValues[var] ] )
+    def scores(self, lp, values):
+        avgDistanceToHalf = numpy.fabs(values - .5).sum(axis=0) / len(values)
         # we relate small values to high score
-        return 1.0 / max(avgDistanceToHalf, zero)
+        return 1.0 / numpy.maximum(avgDistanceToHalf, zero)
     
 class FractionalAverageBinaryPriorityBrancher(BinaryPriorityBrancher):
-    def score(self, var, varValues):
-        avg = float(sum(varValues[var])) / len (varValues[var])
-        distanceToHalf = math.fabs(avg - .5)
+    def scores(self, lp, values):
+        avg = values.sum(axis=0) / len(values)
+        distanceToHalf = numpy.fabs(avg - .5)
         # we relate small values to high score
-        return 1.0 / max(distanceToHalf, zero)
+        return 1.0 / numpy.maximum(distanceToHalf, zero)
 
 class SABinaryPriorityBrancher(BinaryPriorityBrancher):
-    def score(self, var, varValues):
-        return var.getAttr('SAObjUp') - var.getAttr('SAObjLow')
+    def scores(self, lp, values):
+        low, up = lp.backend.objectiveRanging(lp.integerVars)
+        return up - low
     
 class ObjectiveSpaceBrancher(Brancher):
     message = 'Objective space'
@@ -182,87 +188,245 @@ class SimpleLocalBrancher(Brancher):
             return [ LocalBranching( sum(fixedVars) <= len(fixedVars) - 1 ),
                      LocalBranching( sum(fixedVars) >= len(fixedVars) ) ]
 
+# branching decisions are applied to (and cancelled from) the model of a
+# node; if changes (a basiclp.ModelChanges) is provided, bound changes are
+# recorded there instead of being made immediately
 class BranchingDecision:
+    # decisions are shared by all nodes below the one they were created for,
+    # and there may be millions of those in the queue: keep them small
+    __slots__ = ()
+
     def __init__(self):
         pass
 
-    def apply(self, node):
+    def apply(self, node, changes=None):
         pass
 
-    def cancel(self, node):
+    def cancel(self, node, changes=None):
         pass
 
+    # identifies the effect of this decision on the LP, used as part of the
+    # key of cached LP solves (see lpcache); () if the LP is not modified,
+    # None if the effect is unknown, in which case the LP is not cached
+    def lpKey(self):
+        return None
+
+    # True if the LP solution described by metaData (a
+    # lowerboundset.LBMetaData) is known to satisfy this decision
+    def admits(self, lp, metaData):
+        return False
+
     def __repr__(self):
         return self.description
     
 class ObjectiveSpaceBranching(BranchingDecision):
+    __slots__ = ('bounds',)
+
     def __init__(self, bounds):
         self.bounds = bounds
-        self.description = 'f1 <= ' + str(bounds[0]) + \
-            ', f2 <= ' + str(bounds[1])
 
-    def apply(self, node):
+    @property
+    def description(self):
+        return 'f1 <= ' + str(self.bounds[0]) + ', f2 <= ' + \
+            str(self.bounds[1])
+
+    def apply(self, node, changes=None):
         right, top = self.bounds
         node.right, node.top = min(right, node.right), min(top, node.top)
 
-    def cancel(self, node):
+    def cancel(self, node, changes=None):
         # these branching decisions have no impact on the LP
         pass
+
+    def lpKey(self):
+        return ()
+
+    # objective space bounds are checked by the node itself
+    def admits(self, lp, metaData):
+        return True
+
+    def __eq__(self, other):
+        return isinstance(other, ObjectiveSpaceBranching) and \
+            self.bounds == other.bounds
+
+    def __hash__(self):
+        return hash(self.bounds)
     
 class LPBranching(BranchingDecision):
+    __slots__ = ('branch', 'description', 'constraint')
+
     def __init__(self, branch):
         self.branch = branch
         tokens = str(branch).split()
         self.description = tokens[2][:-1] + ' ' + tokens[3] + ' ' + \
             tokens[4][:-1]
         
-    def apply(self, node):
+    # constraints are only added to the model at the next model update, so
+    # there is nothing to batch here
+    def apply(self, node, changes=None):
         self.constraint = node.lp.addConstraint(self.branch)
         
-    def cancel(self, node):
+    def cancel(self, node, changes=None):
         node.lp.removeConstraint(self.constraint)
 
-class GurobiBinaryBoundBranching(BranchingDecision):
+    # solver constraints cannot be sent to another process
+    def __getstate__(self):
+        raise pickle.PicklingError(self.__class__.__name__ + \
+                                   ' cannot be used with parallel search')
+
+# only the index of the variable is stored: decisions can be sent to other
+# processes as they are, and the variable is found in the model of the node
+class BinaryBoundBranching(BranchingDecision):
+    __slots__ = ('varIndex', 'boundType', 'boundValue')
+
     def __init__(self, var, boundType, boundValue):
-        self.var = var
+        self.varIndex = var.index
         self.boundType = boundType
         self.boundValue = boundValue
-        self.description = str(var.getAttr(GRB.Attr.VarName)) + \
-                           (' >= ' if boundType == GRB.Attr.LB else ' <= ') + \
-                           str(boundValue)
-        
-    def apply(self, node):
-        self.previousValue = 1.0 if self.boundType == GRB.Attr.UB else 0.0
-        self.var.setAttr(self.boundType, self.boundValue)
+
+    @property
+    def description(self):
+        var = params.model.variable(self.varIndex)
+        return str(params.model.variableNames([ var ])[0]) + \
+            (' >= ' if self.boundType == lpbackend.LB else ' <= ') + \
+            str(self.boundValue)
+
+    # bound of the variable before this decision was applied
+    def previousValue(self):
+        return 1.0 if self.boundType == lpbackend.UB else 0.0
         
-    def cancel(self, node):
-        self.var.setAttr(self.boundType, self.previousValue)
+    def apply(self, node, changes=None):
+        var = node.lp.variable(self.varIndex)
+        if changes is None:
+            node.lp.setBound(var, self.boundType, self.boundValue)
+        else:
+            changes.setBound(var, self.boundType, self.boundValue)
         
+    def cancel(self, node, changes=None):
+        var = node.lp.variable(self.varIndex)
+        if changes is None:
+            node.lp.setBound(var, self.boundType, self.previousValue())
+        else:
+            changes.setBound(var, self.boundType, self.previousValue())
+
+    def lpKey(self):
+        return (self.varIndex, self.boundType, self.boundValue)
+
+    def admits(self, lp, metaData):
+        value = metaData.value(lp, self.varIndex)
+        if self.boundType == lpbackend.LB:
+            return value >= self.boundValue - basiclp.integralityEpsilon
+        else:
+            return value <= self.boundValue + basiclp.integralityEpsilon
+
+    # decisions received from another process are copies, so they are
+    # compared by value when switching from one node to the next
+    def __eq__(self, other):
+        return isinstance(other, BinaryBoundBranching) and \
+            self.varIndex == other.varIndex and \
+            self.boundType == other.boundType and \
+            self.boundValue == other.boundValue
+
+    def __hash__(self):
+        return hash( (self.varIndex, self.boundType, self.boundValue) )
+
+# former name, still found in checkpoints
+GurobiBinaryBoundBranching = BinaryBoundBranching
 
 class LocalBranching(LPBranching):
+    __slots__ = ()
+
     def __init__(self, branch):
         self.branch = branch
         tokens = str(branch).split()
         self.description = 'sum(...) ' + tokens[-2] + ' ' + tokens[-1][:-1]
         
+# bound a node in a worker process (see TreeSearch.searchInParallel)
+# returns the filtered LB set, the UB solutions found while bounding and the
+# objective space bounds and LB vertices of the node after bounding it
+def boundNode(lp, ub, payload):
+    right, top, branchingDecisions, depth, parentVertices, nodeClass, \
+        bounder = payload
+    node = nodeClass(lp, right, top,
+                     biobabnode.pathFromList(branchingDecisions), depth,
+                     parentVertices)
+    known = set( id(u) for u in ub.solutions )
+    node.switchBranchingDecisions()
+    lb = bounder.bound(node, ub)
+    newSolutions = [ u for u in ub.solutions if not id(u) in known ]
+    return lb, newSolutions, node.right, node.top, node.vertices
+
 class TreeSearch:
 
     nNodes = 0
+    # largest worst-case error of an approximate LB set
+    maxLbError = 0
     
-    def __init__(self, strategy='breadth', nodeClass=biobabnode.Node):
+    def __init__(self, strategy='breadth', nodeClass=biobabnode.Node,
+                 nJobs=1):
         self.strategy = strategy
         self.nodeClass = nodeClass
+        # number of worker processes used to bound nodes
+        self.nJobs = nJobs
         if strategy == 'breadth':
-            self.queue = flexiblequeue.Queue('fifo')
+            self.queue = flexiblequeue.newQueue('fifo')
         elif strategy == 'depth':
-            self.queue = flexiblequeue.Queue('lifo')
+            self.queue = flexiblequeue.newQueue('lifo')
         elif strategy == 'best':
-            self.queue = flexiblequeue.Queue('best')
+            self.queue = flexiblequeue.newQueue('best')
+        elif strategy == 'adaptive':
+            self.queue = flexiblequeue.AdaptiveQueue()
         else:
             print('Unknown queue type:', strategy)
             sys.exit(8)
+        # LB vertices of the most recently bounded nodes, keyed by their
+        # DecisionPath (see warmStart)
+        self.warmStarts = collections.OrderedDict()
+
+    # queued nodes may stay in the queue for a long time, so they do not hold
+    # the warm start data of their parent: only the params.warmStartNodes
+    # most recently bounded nodes keep theirs, which their children get when
+    # they are about to be bounded
+    def keepWarmStart(self, node):
+        if params.lbWarmStart and params.warmStartNodes > 0 and \
+           node.vertices is not None:
+            self.warmStarts[node.path] = node.vertices
+            self.warmStarts.move_to_end(node.path)
+            while len(self.warmStarts) > params.warmStartNodes:
+                self.warmStarts.popitem(last=False)
+        node.vertices = None
+
+    def warmStart(self, node):
+        # the root node has no parent
+        if node.path is None:
+            return
+        entry = self.warmStarts.get(node.path.parent)
+        if entry is not None:
+            self.warmStarts.move_to_end(node.path.parent)
+            node.setParentData(entry)
+
+    # node priorities of best-first search depend on the UB set
+    def useUpperBound(self, ub):
+        if self.queue.isBestFirst():
+            self.queue.key = nodepriority.nodeKey(params.nodePriority, ub)
+
+    # search state saved in checkpoints: open nodes, including the ones that
+    # are being bounded, and node count
+    def getState(self, running=[]):
+        return { 'nodes': self.queue.items() + list(running),
+                 'nNodes': TreeSearch.nNodes }
+
+    # queue the root node, or the open nodes of the search state to resume
+    def start(self, node, state):
+        if state is None:
+            self.queue.push(node)
+        else:
+            for n in state['nodes']:
+                self.queue.push(n)
+            TreeSearch.nNodes = state['nNodes']
 
     # perform a tree search!
+    # if state is given (see getState), the search is resumed from there
     def search(self, node, ub,
                branchers=[
                    ClosestToOneBinaryPriorityBrancher(),
@@ -271,67 +435,167 @@ class TreeSearch:
                    FractionalAverageBinaryPriorityBrancher(),
                ],
                bounder=Bounder(),
-               wrapped=False ):
-        #
-        def updateStatusIfNeeded():
-            if self.__class__.nNodes % 50 == 0:
-                print(util.TS(), '\tBIOBAB:\t', len(self.queue), end=' ')
-                print('nodes \t|UB|:',len(ub.solutions))
-        #
+               wrapped=False,
+               state=None ):
+        if self.nJobs > 1:
+            return self.searchInParallel(node, ub, branchers, bounder, wrapped,
+                                         state)
         osbStats = []
         if not wrapped:
             print(util.TS() + '\tstarting bi-objective branch-and-bound (' + \
                 self.strategy + ')')
-        self.queue.push(node)
+        self.useUpperBound(ub)
+        self.start(node, state)
         while not self.queue.empty():
-            node = self.queue.pop()
+            if not wrapped:
+                checkpoint.saveIfDue(ub, self.getState)
+            with profiler.phase('queue'):
+                node = self.queue.pop()
             self.__class__.nNodes += 1
-            if params.verbosity == 1 and not wrapped:
-                updateStatusIfNeeded()
-            elif params.verbosity > 1:
-                prefix = len(node.branchingDecisions) * '+-'
-                print(util.TS() + '\t', prefix, end=' ')
-                print('[f1 <=', str(node.right), '| f2 <=', str(node.top) + ']', end=' ')
-                print(node.branchingDecisions, \
-                    '(' + str(len(self.queue)) + ' nodes, |UB| =', \
-                    str(len(ub.solutions)) + ')')
-            node.applyBranchingDecisions()
+            if not wrapped:
+                profiler.queueSize(len(self.queue), self.__class__.nNodes)
+            self.showStatus(node, ub, wrapped)
+            self.warmStart(node)
+            # only decisions that differ from the previous node are applied
+            node.switchBranchingDecisions()
             try:
                 lb = bounder.bound(node, ub)
             except util.TimeLimitReachedException as e:
+                node.cancelAppliedDecisions()
                 if not wrapped:
                     print(e)
+                    checkpoint.save(ub, self.getState([ node ]))
                     return
                 else:
                     raise e
-            node.cancelBranchingDecisions()
-            #
-            if params.verbosity > 2:
-                print()
-                print('LB:', lb)
-                print()
-            #
-            if not lb.isLeaf():
-                if not params.objectiveSpaceBranching:
-                    subLBs = [ lb ]
-                else:
-                    subLBs = lb.split(node, ub)
-                    if len(subLBs) > 1:
-                        osbStats.append((node.depth, len(subLBs)))
-                for slb in subLBs:
-                    for brancher in branchers:
-                        branches = brancher.branch(slb)
-                        if len(branches) > 0: 
-                            for branch in branches:
-                                self.queue.push(\
-                                    self.nodeClass(node.lp,
-                                                   min(node.right, slb.right()),
-                                                   min(node.top, slb.top()),
-                                                   node.branchingDecisions + \
-                                                   [ branch ],
-                                                   node.depth + 1 ) )
-                            break
+            self.expand(node, lb, ub, branchers, osbStats, wrapped)
+            self.keepWarmStart(node)
+        node.cancelAppliedDecisions()
+        if not wrapped:
+            print(util.TS() + '\tbi-objective branch-and-bound is over')
+            checkpoint.save(ub, None)
+        if params.verbosity > 0 and not wrapped:
+            print('stats on OSB:', osbStats)
+
+    # same as search, but nodes are bounded by a pool of worker processes,
+    # each with its own copy of the model
+    # the UB set of this process remains the reference: new UB solutions found
+    # by a worker are merged into it and shared with the other workers
+    def searchInParallel(self, node, ub, branchers, bounder, wrapped, state):
+        osbStats = []
+        if not wrapped:
+            print(util.TS() + '\tstarting bi-objective branch-and-bound (' + \
+                self.strategy + ', ' + str(self.nJobs) + ' workers)')
+        pool = workerpool.WorkerPool(self.nJobs)
+        pool.share(ub.solutions)
+        # node currently bounded by each worker
+        running = {}
+        self.useUpperBound(ub)
+        self.start(node, state)
+        try:
+            while not self.queue.empty() or pool.busy():
+                if not wrapped:
+                    checkpoint.saveIfDue(ub, lambda: self.getState(
+                        running.values()))
+                while pool.hasIdleWorker() and not self.queue.empty():
+                    with profiler.phase('queue'):
+                        node = self.queue.pop()
+                    self.__class__.nNodes += 1
+                    if not wrapped:
+                        profiler.queueSize(len(self.queue),
+                                           self.__class__.nNodes)
+                    self.showStatus(node, ub, wrapped)
+                    self.warmStart(node)
+                    workerId = pool.submit(boundNode,
+                                           (node.right, node.top,
+                                            node.branchingDecisions,
+                                            node.depth, node.parentVertices,
+                                            self.nodeClass, bounder))
+                    running[workerId] = node
+                workerId, (lb, newSolutions, right, top, vertices) = \
+                    pool.result()
+                node = running.pop(workerId)
+                node.right, node.top = right, top
+                node.vertices = vertices
+                ub.merge(newSolutions)
+                pool.share(newSolutions)
+                # the worker may not have known about every UB solution
+                nSegments = len(lb.segments)
+                lb.filter(ub)
+                if nSegments > 0 and len(lb.segments) == 0 and not wrapped:
+                    profiler.count('pruned-dominated')
+                self.expand(node, lb, ub, branchers, osbStats, wrapped)
+                self.keepWarmStart(node)
+        except util.TimeLimitReachedException as e:
+            ub.merge(pool.interruptedSolutions())
+            if wrapped:
+                raise e
+            print(e)
+            checkpoint.save(ub, self.getState(running.values()))
+            return
+        finally:
+            pool.close()
         if not wrapped:
             print(util.TS() + '\tbi-objective branch-and-bound is over')
+            checkpoint.save(ub, None)
         if params.verbosity > 0 and not wrapped:
             print('stats on OSB:', osbStats)
+
+    # print information on the node that is about to be processed
+    def showStatus(self, node, ub, wrapped):
+        if params.verbosity == 1 and not wrapped:
+            if self.__class__.nNodes % 50 == 0:
+                print(util.TS(), '\tBIOBAB:\t', len(self.queue), end=' ')
+                print('nodes \t|UB|:',len(ub.solutions))
+        elif params.verbosity > 1:
+            prefix = biobabnode.pathLength(node.path) * '+-'
+            print(util.TS() + '\t', prefix, end=' ')
+            print('[f1 <=', str(node.right), '| f2 <=', str(node.top) + ']', end=' ')
+            print(node.branchingDecisions, \
+                '(' + str(len(self.queue)) + ' nodes, |UB| =', \
+                str(len(ub.solutions)) + ')')
+
+    # branch on a node that was bounded with lb: children are pushed into the
+    # queue
+    # nodes of nested (wrapped) searches are left out of the run metrics
+    def expand(self, node, lb, ub, branchers, osbStats, wrapped=False):
+        if params.verbosity > 2:
+            print()
+            print('LB:', lb)
+            print()
+        if lb.error > 0:
+            TreeSearch.maxLbError = max(TreeSearch.maxLbError, lb.error)
+            if params.verbosity > 1:
+                print(util.TS() + '\t approximate LB set, worst-case error:',
+                      lb.error)
+        #
+        if lb.isLeaf():
+            if len(lb.segments) > 0 and not wrapped:
+                profiler.count('pruned-integer')
+        else:
+            if not params.objectiveSpaceBranching:
+                subLBs = [ lb ]
+            else:
+                subLBs = lb.split(node, ub)
+                if len(subLBs) > 1:
+                    osbStats.append((node.depth, len(subLBs)))
+                    if not wrapped:
+                        profiler.count('osb-splits')
+            for slb in subLBs:
+                for brancher in branchers:
+                    with profiler.phase('branching'):
+                        branches = brancher.branch(slb)
+                    if len(branches) > 0: 
+                        lbPoints = slb.points() \
+                            if self.queue.isBestFirst() else None
+                        for branch in branches:
+                            child = self.nodeClass(node.lp,
+                                                   min(node.right, slb.right()),
+                                                   min(node.top, slb.top()),
+                                                   biobabnode.DecisionPath(
+                                                       node.path, branch),
+                                                   node.depth + 1)
+                            child.lbPoints = lbPoints
+                            with profiler.phase('queue'):
+                                self.queue.push(child)
+                        break
@@ -1,60 +1,113 @@
+import array
+import bisect
+import heapq
+
+import numpy
+
+import dominance
 import util
 
 class UpperBoundSet:
     def __init__(self):
+        # incremented every time the set changes
+        self.version = 0
         # keep solutions sorted according to first then second objective
         # every element in this list should have z1 and z2 as attributes
         self.solutions = []
 
+    # solutions are stored along with parallel arrays of their objective
+    # values, used for binary search; z2 values are stored negated so that
+    # all arrays are sorted in increasing order
+    @property
+    def solutions(self):
+        return self.sortedSolutions
+
+    @solutions.setter
+    def solutions(self, solutions):
+        self.sortedSolutions = list(solutions)
+        self.version += 1
+        self.z1Values = array.array('d', [ u.z1 for u in solutions ])
+        self.minusZ2Values = array.array('d', [ -u.z2 for u in solutions ])
+        self.improvedZ1Values = array.array('d', [ u.improvedZ1
+                                                   for u in solutions ])
+        self.minusImprovedZ2Values = array.array('d', [ -u.improvedZ2
+                                                        for u in solutions ])
+
+    def __len__(self):
+        return len(self.sortedSolutions)
+
+    # replace solutions[first:last] with the given solutions
+    def replaceRange(self, first, last, solutions):
+        self.sortedSolutions[first:last] = solutions
+        self.version += 1
+        self.z1Values[first:last] = array.array('d', [ u.z1
+                                                       for u in solutions ])
+        self.minusZ2Values[first:last] = \
+            array.array('d', [ -u.z2 for u in solutions ])
+        self.improvedZ1Values[first:last] = \
+            array.array('d', [ u.improvedZ1 for u in solutions ])
+        self.minusImprovedZ2Values[first:last] = \
+            array.array('d', [ -u.improvedZ2 for u in solutions ])
+
     # update self.solutions with solution, checking for dominance and keeping it
     # a non-dominated set
+    # returns True if solution was added to the set
     def updateWithSolution(self, solution):
-        # special case: existing ub set is empty
-        if len(self.solutions) == 0:
-            self.solutions = [ solution ]
-        # other special case: only one solution in the list
-        elif len(self.solutions) == 1:
-            if self.solutions[0].dominates(solution):
-                pass
-            elif solution.dominates(self.solutions[0]):
-                self.solutions = [ solution ]
-            else:
-                self.solutions.append(solution)
-                self.solutions.sort(key=lambda x: x.z1)
-        # general case
+        solutions = self.sortedSolutions
+        # solutions[right] is the first solution with z1 >= solution.z1
+        right = bisect.bisect_left(self.z1Values, solution.z1)
+        left = right - 1
+        # now check for dominance
+        if (left >= 0 and solutions[left].dominates(solution)) or \
+           (right < len(solutions) and solutions[right].dominates(solution)):
+            return False
+        nDom = 0
+        while right+nDom < len(solutions) and \
+                solution.dominates(solutions[right+nDom]):
+            nDom += 1
+        self.replaceRange(right, right + nDom, [ solution ])
+        return True
+
+    # add several solutions at once
+    # few solutions are inserted one by one, otherwise they are merged with
+    # the existing (sorted) solutions in a single pass
+    def merge(self, solutions):
+        solutions = list(solutions)
+        if 4 * len(solutions) < len(self.sortedSolutions):
+            for u in solutions:
+                self.updateWithSolution(u)
+            return
+        key = lambda u: (u.z1, u.z2)
+        result = []
+        # existing solutions come first in case of equal objective values
+        for u in heapq.merge(self.sortedSolutions, sorted(solutions, key=key),
+                             key=key):
+            if len(result) > 0 and result[-1].dominates(u):
+                continue
+            while len(result) > 0 and u.dominates(result[-1]):
+                result.pop()
+            result.append(u)
+        self.solutions = result
+
+    # return (first, last) such that solutions[first:last] are exactly the
+    # solutions with z1 <= right and z2 <= top
+    # solutions are sorted by increasing z1, hence by decreasing z2
+    # if improved is True, improved objective values are used instead; they
+    # are assumed to follow the same order
+    def boxRange(self, right, top, improved=False):
+        if improved:
+            z1Values, minusZ2Values = self.improvedZ1Values, \
+                self.minusImprovedZ2Values
         else:
-            # step 1: binary search on first objective value
-            # special subcases
-            if solution.z1 <= self.solutions[0].z1:
-                left, right = -1, 0
-            elif solution.z1 == self.solutions[-1].z1:
-                left, right = len(self.solutions) - 2, len(self.solutions) - 1
-            elif solution.z1 > self.solutions[-1].z1:
-                left, right = len(self.solutions) - 1, len(self.solutions)
-            else:
-                # do binary search here
-                left, right = 0, len(self.solutions) - 1
-                while right - left > 1:
-                    middle = (left + right) // 2
-                    if self.solutions[middle].z1 == solution.z1:
-                        left, right = middle - 1, middle
-                    elif self.solutions[middle].z1 < solution.z1:
-                        left = middle
-                    else:
-                        right = middle
-            # now check for dominance
-            if self.solutions[left].dominates(solution) or \
-                    (right < len(self.solutions) and \
-                         self.solutions[right].dominates(solution) ):
-                pass
-            else:
-                nDom = 0
-                while right+nDom < len(self.solutions) and \
-                        solution.dominates(self.solutions[right+nDom]):
-                    nDom += 1
-                self.solutions = self.solutions[:left+1] + \
-                    [ solution ] + self.solutions[right+nDom:]
-        
+            z1Values, minusZ2Values = self.z1Values, self.minusZ2Values
+        first = bisect.bisect_left(minusZ2Values, -top)
+        last = bisect.bisect_right(z1Values, right)
+        return first, max(first, last)
+
+    # solutions with z1 <= right and z2 <= top
+    def inBox(self, right, top):
+        first, last = self.boxRange(right, top)
+        return self.sortedSolutions[first:last]
 
     def storePoints(self, fName):
         with open(fName, 'w') as f:
@@ -74,16 +127,11 @@ class UpperBoundSet:
 
     # remove from this set the solutions dominated by solutions from ubSet
     def filterWith(self, ubSet):
-        newSols = []
-        for sol in self.solutions:
-            good = True
-            for s2 in ubSet.solutions:
-                if s2.dominates(sol):
-                    good = False
-                    break
-            if good:
-                newSols.append(sol)
-        self.solutions = newSols
+        z1, z2 = dominance.objectiveArrays(self)
+        improvedZ1, improvedZ2 = dominance.objectiveArrays(ubSet, True)
+        dominated = dominance.dominatedMask(z1, z2, improvedZ1, improvedZ2)
+        self.solutions = [ self.solutions[i]
+                           for i in numpy.flatnonzero(~ dominated) ]
     
     # special output for visualisation in another script
     def vizOut(self, colour='ubColour'):
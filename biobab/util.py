@@ -1,7 +1,9 @@
 import random
 import time
 import fractions
+import functools
 import math
+import os
 import sys
 import types
 
@@ -9,9 +11,20 @@ import params
 import grbvalues
 from functools import reduce
 
+# clock used for timestamps and for the time limit: CPU time of this process,
+# or wall-clock time if params.wallClock is set
+def clock():
+    if params.wallClock:
+        return time.time()
+    else:
+        return time.process_time()
+
+# wall-clock time is counted from the start of the program
+wallClockStart = time.time()
+
 # timestamp function
 def TS():
-    t = time.process_time()
+    t = clock() - wallClockStart if params.wallClock else clock()
     hours = int( t / 3600 )
     t -= hours * 3600
     minutes = int( t / 60 )
@@ -65,11 +78,15 @@ def vizOutPoint(point, colour):
 class TimeLimitReachedException(Exception):
     pass
 
-def isTimeUp(grbModel=None, raiseException=True):
-    if time.process_time() > ticksAtStart + params.timeLimit:
+def timeLimitReached():
+    return TimeLimitReachedException( \
+        '/!\\ Time limit reached: ' + str(params.timeLimit) + 's' )
+
+# true if less than reserve seconds are left before the time limit
+def isTimeUp(grbModel=None, raiseException=True, reserve=0):
+    if clock() > ticksAtStart + params.timeLimit - reserve:
         if raiseException:
-            raise TimeLimitReachedException( \
-                    '/!\\ Time limit reached: ' + str(params.timeLimit) + 's' )
+            raise timeLimitReached()
         else:
             return True
     else:
@@ -77,7 +94,66 @@ def isTimeUp(grbModel=None, raiseException=True):
 
 def remainingTime():
     isTimeUp()
-    return ticksAtStart + params.timeLimit - time.process_time()
+    return ticksAtStart + params.timeLimit - clock()
+
+# start counting time for the time limit: CPU time counts from now on,
+# wall-clock time from the start of the program, like a batch scheduler does
+def startClock():
+    global ticksAtStart
+    ticksAtStart = wallClockStart if params.wallClock else clock()
+
+# time budget handed to a worker process: wall-clock time is shared with it,
+# whereas it gets what is left of the CPU time budget for its own CPU time
+def timeBudget():
+    if params.wallClock:
+        return ticksAtStart, params.timeLimit
+    else:
+        return None, remainingTime()
+
+# called by the worker process once it is set up
+def startTimeBudget(budget):
+    global ticksAtStart
+    start, params.timeLimit = budget
+    ticksAtStart = clock() if start is None else start
+
+# Reserve policies
+# a lexmin, or the LB set of a node, is only started when more than a reserve
+# is left before the time limit, so that work in progress can finish before
+# the limit instead of being interrupted and lost (see
+# params.timeReservePolicy); work nested in another one (e.g. the lexmins of
+# an LB set) is not checked
+
+# longest time taken so far by each kind of work
+longestWork = {}
+workInProgress = False
+
+def timeReserve(kind):
+    if params.timeReservePolicy == 'fixed':
+        return params.timeReserve
+    elif params.timeReservePolicy == 'longest':
+        return longestWork.get(kind, 0)
+    else:
+        return 0
+
+# decorator for functions doing a given kind of work
+def reserved(kind):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            global workInProgress
+            if not params.timeLimit or workInProgress:
+                return function(*args, **kwargs)
+            isTimeUp(reserve=timeReserve(kind))
+            start = clock()
+            workInProgress = True
+            try:
+                result = function(*args, **kwargs)
+            finally:
+                workInProgress = False
+            longestWork[kind] = max(longestWork.get(kind, 0), clock() - start)
+            return result
+        return wrapper
+    return decorator
 
 def dumpParams():
     print('------------------------------------------------------------------')
@@ -89,6 +165,36 @@ def dumpParams():
             print()
     print('------------------------------------------------------------------')
 
+# field of /proc/self/statm, in bytes (None if it cannot be known)
+def statm(field):
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[field]) * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        return None
+
+# resident set size of this process, in bytes (None if it cannot be known)
+def residentMemory():
+    return statm(1)
+
+# size of the address space of this process, which params.memoryLimit limits,
+# in bytes (None if it cannot be known)
+def virtualMemory():
+    return statm(0)
+
+# convert memory size in human format to bytes
+# size is given as a string
+def humanToBytes(size):
+    units = { 'K': 1024,
+              'M': 1024 ** 2,
+              'G': 1024 ** 3,
+              'T': 1024 ** 4,
+    }
+    if size[-1].isdigit():
+        return int(size)
+    else:
+        return int(size[:-1]) * units[size[-1].upper()]
+
 # high enough value
 infinity = sys.maxsize#float('inf')#sys.maxint
 
@@ -15,6 +15,7 @@ import basiclp
 # w1 and w2 are the weights used to produce a weighted-sum objective
 # if one of them is zero, then both are considered in a lexicographic fashion
 class WeightedSumNode(biobabnode.Node):
+    __slots__ = ()
 
     # weight for each objective
     # they are set externally
@@ -109,8 +110,8 @@ class WeightedSumSolver:
                     best = u
                 elif u.z1 * w1 + u.z2 * w2 < best.z1 * w1 + best.z2 * w2:
                     best = u
-            # add newly found solutions to existing ub set
-            ub.updateWithSolution(u)
+        # add newly found solutions to existing ub set
+        ub.merge(thisUb.solutions)
         #
         if params.verbosity > 2 and best:
             print('\tobjective values:', best.z1, best.z2)
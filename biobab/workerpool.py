@@ -0,0 +1,256 @@
+import contextlib
+import io
+import multiprocessing
+import multiprocessing.connection
+import pickle
+
+import checkpoint
+import params
+import profiler
+import util
+import upperboundset
+import lpcache
+
+# these parameters are not sent to workers: each worker rebuilds its own
+# instance and model from the input file
+localParams = [ 'inputData', 'model',
+                'instanceClass', 'modelClass', 'solutionClass' ]
+
+# picklable copy of the parameters of the current process
+def paramsSnapshot():
+    snapshot = {}
+    for p in [ x for x in dir(params) if not x.startswith('__') ]:
+        if p in localParams:
+            continue
+        value = getattr(params, p)
+        try:
+            pickle.dumps(value)
+        except Exception:
+            continue
+        snapshot[p] = value
+    return snapshot
+
+# raised by the coordinator when a worker process has exited while it still
+# had work to do (e.g. killed by the OOM killer)
+class WorkerExitedException(Exception):
+    pass
+
+# send a message through a connection; messages that cannot be pickled are
+# replaced with the error they raise
+def sendMessage(outbox, workerId, message):
+    try:
+        data = pickle.dumps(message)
+    except Exception as e:
+        data = pickle.dumps( (workerId, None, (0, 0, 0), None, [],
+                              RuntimeError('cannot send the result of a ' +
+                                           'task: ' + repr(e))) )
+    outbox.send_bytes(data)
+
+# main function of a worker process
+# each worker holds its own model clone and its own copy of the UB set; the
+# coordinator sends pickled tasks of the form (handler, ubDelta, payload)
+# where handler is a module-level function called as
+# handler(lp, ub, payload), and ubDelta contains the UB solutions the worker
+# does not know about yet
+# tasks are only unpickled once the model is known, since UB solutions need
+# it (see IntegerSolution.__setstate__)
+def workerMain(workerId, snapshot, timeBudget, inbox, outbox):
+    for key, value in snapshot.items():
+        setattr(params, key, value)
+    # only the coordinator writes to the persistent LP cache and checkpoints:
+    # the LP cache entries of a task are sent with its result
+    lpcache.readOnly = True
+    if params.checkpointFile is not None:
+        checkpoint.ignoreSignals()
+        params.checkpointFile = None
+    # loading the data and building the model is rather verbose
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            util.loadProblemClasses(params.problemType)
+            params.inputData = params.instanceClass(params.inputFile)
+            if params.timeLimit:
+                util.startTimeBudget(timeBudget)
+            params.model = params.modelClass(params.inputData,
+                                             relaxed=params.useLinearRelaxation)
+        setupError = None
+    except Exception as e:
+        # reported to the coordinator as the result of every task
+        setupError = e
+    if params.profileFile is not None:
+        profiler.start()
+    ub = upperboundset.UpperBoundSet()
+    while True:
+        task = inbox.get()
+        if task is None:
+            break
+        if setupError is not None:
+            sendMessage(outbox, workerId,
+                        (workerId, None, (0, 0, 0), None, [], setupError))
+            continue
+        try:
+            handler, ubDelta, payload = pickle.loads(task)
+        except Exception as e:
+            sendMessage(outbox, workerId,
+                        (workerId, None, (0, 0, 0), None, [], e))
+            continue
+        ub.merge(ubDelta)
+        nLPs = params.modelClass.nLPs
+        hits, misses = lpcache.counters()
+        profiler.reset()
+        known = set( id(u) for u in ub.solutions )
+        try:
+            result = handler(params.model, ub, payload)
+            error = None
+        except util.TimeLimitReachedException as e:
+            # UB solutions found before the time limit are not lost (see
+            # WorkerPool.interruptedSolutions)
+            e.solutions = [ u for u in ub.solutions if not id(u) in known ]
+            result, error = None, e
+        except Exception as e:
+            result, error = None, e
+        newHits, newMisses = lpcache.counters()
+        counts = (params.modelClass.nLPs - nLPs, newHits - hits,
+                  newMisses - misses)
+        metrics = profiler.collect() if profiler.enabled else None
+        cache = lpcache.getCache()
+        entries = cache.takeNewEntries() if cache is not None else []
+        sendMessage(outbox, workerId,
+                    (workerId, result, counts, metrics, entries, error))
+
+# pool of worker processes, each with its own task queue so that the
+# coordinator always knows which UB solutions a given worker has already seen
+# results come back through one pipe per worker, so that the coordinator can
+# wait for them and notice workers that exit at the same time
+class WorkerPool:
+    def __init__(self, nWorkers):
+        # workers build their own solver environment: do not fork this one
+        context = multiprocessing.get_context('spawn')
+        timeBudget = util.timeBudget() if params.timeLimit else None
+        snapshot = paramsSnapshot()
+        # workers read the LP cache file while the pool is open
+        cache = lpcache.getCache()
+        if cache is not None:
+            cache.suspend()
+        self.inboxes = [ context.Queue() for i in range(nWorkers) ]
+        pipes = [ context.Pipe(duplex=False) for i in range(nWorkers) ]
+        self.outboxes = [ reader for reader, writer in pipes ]
+        self.workers = [ context.Process(target=workerMain,
+                                         args=(i, snapshot, timeBudget,
+                                               self.inboxes[i], pipes[i][1]))
+                         for i in range(nWorkers) ]
+        for w in self.workers:
+            w.daemon = True
+            w.start()
+        for reader, writer in pipes:
+            writer.close()
+        # set once a worker has exited: the others are then terminated
+        self.broken = False
+        # solutions shared with workers, and how many of them each worker knows
+        self.shared = []
+        self.synced = [ 0 ] * nWorkers
+        self.idle = list(range(nWorkers))
+        # UB solutions found by tasks interrupted by the time limit
+        self.interrupted = []
+
+    def __len__(self):
+        return len(self.workers)
+
+    # make these UB solutions known to every worker with its next task
+    def share(self, solutions):
+        self.shared += solutions
+
+    def hasIdleWorker(self):
+        return len(self.idle) > 0
+
+    def busy(self):
+        return len(self.idle) < len(self.workers)
+
+    # send a task to an idle worker, return the id of this worker
+    def submit(self, handler, payload):
+        workerId = self.idle.pop()
+        ubDelta = self.shared[self.synced[workerId]:]
+        self.synced[workerId] = len(self.shared)
+        self.inboxes[workerId].put(pickle.dumps( (handler, ubDelta,
+                                                  payload) ))
+        return workerId
+
+    # wait for the next result, returns (workerId, result)
+    # LPs solved by the worker are added to the global LP count, and its LP
+    # cache hits and misses to those of the coordinator, whose cache file
+    # keeps its new LP cache entries, as well as its run metrics when
+    # profiling; exceptions raised by the handler are raised
+    # again here
+    def result(self):
+        workerId, result, error = self.receive()
+        if error is not None:
+            raise error
+        return workerId, result
+
+    # wait until a busy worker sends a result or exits
+    def receive(self):
+        busy = [ i for i in range(len(self.workers)) if not i in self.idle ]
+        ready = multiprocessing.connection.wait(
+            [ self.outboxes[i] for i in busy ] +
+            [ self.workers[i].sentinel for i in busy ])
+        # results sent just before exiting are still read
+        for i in busy:
+            if self.outboxes[i] in ready:
+                try:
+                    message = pickle.loads(self.outboxes[i].recv_bytes())
+                except EOFError:
+                    break
+                return self.handleMessage(message)
+        for i in busy:
+            if self.workers[i].sentinel in ready or self.outboxes[i] in ready:
+                self.workers[i].join()
+                self.broken = True
+                raise WorkerExitedException(
+                    'worker process ' + str(i) + ' exited with code ' +
+                    str(self.workers[i].exitcode))
+
+    def handleMessage(self, message):
+        workerId, result, counts, metrics, entries, error = message
+        self.idle.append(workerId)
+        if metrics is not None:
+            profiler.merge(metrics)
+        nLPs, hits, misses = counts
+        params.modelClass.nLPs += nLPs
+        cache = lpcache.getCache()
+        if cache is not None:
+            cache.hits += hits
+            cache.misses += misses
+            cache.keep(entries)
+        if isinstance(error, util.TimeLimitReachedException):
+            self.interrupted += error.solutions
+        return workerId, result, error
+
+    # once the time limit is reached: wait for the tasks still running, which
+    # stop at the time limit too, and return the UB solutions found by all
+    # interrupted tasks, so that the UB set is complete when it is stored
+    def interruptedSolutions(self):
+        while self.busy():
+            self.receive()
+        return self.interrupted
+
+    # stop all workers; results of unfinished tasks are discarded
+    # if a worker has exited, the others are terminated instead
+    def close(self):
+        try:
+            while self.busy() and not self.broken:
+                self.receive()
+        except WorkerExitedException:
+            pass
+        for inbox in self.inboxes:
+            inbox.put(None)
+            # tasks are not read by terminated workers
+            if self.broken:
+                inbox.cancel_join_thread()
+        for w in self.workers:
+            if self.broken:
+                w.terminate()
+            w.join()
+        for outbox in self.outboxes:
+            outbox.close()
+        cache = lpcache.getCache()
+        if cache is not None:
+            cache.resume()
@@ -1,6 +1,7 @@
 import argparse
 
 import params
+import util
 
 def parse():
     parser = argparse.ArgumentParser()
@@ -16,7 +17,20 @@ def parse():
                         default='')
     parser.add_argument('-tl', '--time-limit',
                         dest='timeLimit',
-                        help='CPU time limit', type=float, default=None)
+                        help='time limit (CPU time unless -wc)',
+                        type=float, default=None)
+    parser.add_argument('-wc', '--wall-clock',
+                        dest='wallClock',
+                        help='time limit and timestamps in wall-clock time',
+                        action='store_true')
+    parser.add_argument('-trp', '--time-reserve-policy',
+                        dest='timeReservePolicy',
+                        help='time kept before the time limit so that work in progress can finish',
+                        choices=['none', 'fixed', 'longest'])
+    parser.add_argument('-tr', '--time-reserve',
+                        dest='timeReserve',
+                        help='time reserve in seconds (-trp fixed)',
+                        type=float)
     parser.add_argument('-ml', '--memory-limit',
                         dest='memoryLimit',
                         help='RAM limit', type=str, default=None)
@@ -29,6 +43,10 @@ def parse():
                         help='lexmin calculation method (BIOBAB & epsilon-constraint)',
                         dest='lexminMethod',
                         choices=['lex', 'ws'], default='lex' )
+    parser.add_argument('-sb', '--solver-backend',
+                        help='LP/MIP solver',
+                        dest='solverBackend',
+                        choices=['gurobi', 'highs'] )
     parser.add_argument('-pt', '--problem-type',
                         help='problem type',
                         dest='problemType',
@@ -39,7 +57,36 @@ def parse():
                         type=int, choices=[1, 2], default=1)
     parser.add_argument('-s', '--strategy',
                         help='tree exploration strategy (BIOBAB & balanced box)',
-                        choices=['depth', 'breadth', 'best'], default='breadth')
+                        choices=['depth', 'breadth', 'best', 'adaptive'],
+                        default='breadth')
+    parser.add_argument('-am', '--adaptive-memory',
+                        dest='adaptiveMemory',
+                        help='RSS in MB above which adaptive search dives',
+                        type=float)
+    parser.add_argument('-aqs', '--adaptive-queue-size',
+                        dest='adaptiveQueueSize',
+                        help='queue size above which adaptive search dives',
+                        type=int)
+    parser.add_argument('-qm', '--queue-memory',
+                        dest='queueMemory',
+                        help='queued nodes kept in memory, others go to disk',
+                        type=int)
+    parser.add_argument('-qd', '--queue-directory',
+                        dest='queueDirectory',
+                        help='directory for nodes written to disk')
+    parser.add_argument('-np', '--node-priority',
+                        dest='nodePriority',
+                        help='node selection for best-first search (BIOBAB)',
+                        choices=['area', 'hypervolume', 'nadir',
+                                 'hypervolume-depth', 'nadir-depth'])
+    parser.add_argument('-npdw', '--node-priority-depth-weight',
+                        dest='nodePriorityDepthWeight',
+                        help='weight of depth in depth-weighted priorities',
+                        type=float)
+    parser.add_argument('-j', '--jobs',
+                        dest='nJobs',
+                        help='number of worker processes (parallel algorithms)',
+                        type=int, default=1)
     parser.add_argument('-bbb', '--balancedbox-beta',
                         dest='balancedBoxBeta',
                         help='beta ratio for solution harvesting (balanced box)',
@@ -76,6 +123,10 @@ def parse():
                         dest='lbLifting',
                         help='deactivate LB set lifting (BIOBAB)',
                         action='store_false')
+    parser.add_argument('-lbr', '--lb-ratio',
+                        dest='biobabLbRatio',
+                        help='approximate LB sets: area ratio (BIOBAB, 0: exact)',
+                        type=float)
     parser.add_argument('-osb', '--objective-space-branching',
                         dest='objectiveSpaceBranching',
                         help='activate objective space branching (BIOBAB)',
@@ -84,6 +135,39 @@ def parse():
                         dest='objectiveSpaceBranching',
                         help='deactivate objective space branching (BIOBAB)',
                         action='store_false')
+    parser.add_argument('-lws', '--lb-warm-start',
+                        dest='lbWarmStart',
+                        help='reuse parent LB points in child nodes (BIOBAB)',
+                        action='store_true')
+    parser.add_argument('-nlws', '--no-lb-warm-start',
+                        dest='lbWarmStart',
+                        help='compute LB sets of child nodes from scratch',
+                        action='store_false')
+    parser.add_argument('-lcs', '--lp-cache-size',
+                        dest='lpCacheSize',
+                        help='memory budget of the LP cache in MB (0: no ' +
+                        'cache, unless a cache file is given)',
+                        type=float)
+    parser.add_argument('-lcf', '--lp-cache-file',
+                        dest='lpCacheFile',
+                        help='file used to keep cached LPs between runs')
+    parser.add_argument('-icd', '--instance-cache-dir',
+                        dest='instanceCacheDir',
+                        help='directory where parsed instances are cached')
+    parser.add_argument('-cf', '--checkpoint-file',
+                        dest='checkpointFile',
+                        help='file where the search state is saved')
+    parser.add_argument('-ci', '--checkpoint-interval',
+                        dest='checkpointInterval',
+                        help='seconds between two checkpoints',
+                        type=float)
+    parser.add_argument('--resume',
+                        dest='resume',
+                        help='resume the search saved in the checkpoint file',
+                        action='store_true')
+    parser.add_argument('-pf', '--profile-file',
+                        dest='profileFile',
+                        help='file where run metrics are written (JSON)')
     parser.add_argument('-br', '--bound-right',
                         help='initial bound: right (BIOBAB)',
                         dest='boundRight',
@@ -94,6 +178,26 @@ def parse():
                         type=float, default=None)
     parser.add_argument('-d', '--debug', help='activate debug mode',
                         action='store_true')
+    parser.add_argument('-mn', '--model-names',
+                        dest='modelNames',
+                        help='name variables and constraints in the solver',
+                        action='store_true')
+    parser.add_argument('-mi', '--mip-incumbents',
+                        dest='harvestIncumbents',
+                        help='add MIP incumbents to the UB set',
+                        action='store_true')
+    parser.add_argument('-nmi', '--no-mip-incumbents',
+                        dest='harvestIncumbents',
+                        help='only add optimal MIP solutions to the UB set',
+                        action='store_false')
+    parser.add_argument('-sp', '--solution-pool',
+                        dest='harvestSolutionPool',
+                        help='add MIP solution pools to the UB set',
+                        action='store_true')
+    parser.add_argument('-nsp', '--no-solution-pool',
+                        dest='harvestSolutionPool',
+                        help='do not harvest MIP solution pools',
+                        action='store_false')
     parser.add_argument('-mc', '--mip-cutoff',
                         dest='mipCutoff',
                         help='activate MIP cutoff with found integer solutions',
@@ -126,21 +230,12 @@ def setParams(args):
              # it should not be changed anyway
              pass
             #print 'Error while setting parameter', key, ':', e
+    # models written to files need names
+    if params.debug:
+        params.modelNames = True
     # if a memory limit is requested, set it
     if not params.memoryLimit is None:
         import resource
-        limit = humanToBytes(params.memoryLimit)
+        limit = util.humanToBytes(params.memoryLimit)
         resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
             
-# convert memory size in human format to bytes
-# size is given as a string
-def humanToBytes(size):
-    units = { 'K': 1024,
-              'M': 1024 ** 2,
-              'G': 1024 ** 3,
-              'T': 1024 ** 4,
-    }
-    if size[-1].isdigit():
-        return int(size)
-    else:
-        return int(size[:-1]) * units[size[-1].upper()]
@@ -2,7 +2,6 @@
 
 import sys
 import string
-import time
 import os
 
 sys.path.append(os.path.join(os.getcwd(), 'biobab'))
@@ -11,9 +10,24 @@ import biobabnode, upperboundset, treesearch
 import epsilonconstraintframework
 import balancedboxmethod
 import util, params
+import lpcache
+import checkpoint
+import profiler
 
 import cliparser
 
+# totals reported at the end of the run
+def runSummary(ub):
+    summary = { 'nLPs': params.modelClass.nLPs,
+                'nNodes': treesearch.TreeSearch.nNodes,
+                'ubSize': len(ub.solutions) }
+    if params.biobabLbRatio > 0:
+        summary['maxLbError'] = treesearch.TreeSearch.maxLbError
+    if lpcache.cache is not None:
+        summary['lpCacheHits'] = lpcache.cache.hits
+        summary['lpCacheMisses'] = lpcache.cache.misses
+    return summary
+
 def main():
     args = cliparser.parse()
     cliparser.setParams(args)
@@ -31,7 +45,7 @@ def main():
         sys.exit(0)
     params.inputData = d
     print(util.TS() + '\t' + 'read data')
-    util.ticksAtStart = time.process_time()
+    util.startClock()
     # construct model
     relaxed = params.useLinearRelaxation
     m = params.modelClass(d, relaxed=relaxed)
@@ -47,30 +61,49 @@ def main():
     import atexit
     atexit.register(ub.storePoints, params.outputFilePrefix + '-ub.txt')
     atexit.register(ub.storeSolutions, params.outputFilePrefix)
+    if params.profileFile is not None:
+        profiler.start()
+        atexit.register(lambda: profiler.write(params.profileFile,
+                                               runSummary(ub)))
     #
     util.dumpParams()
+    # search state saved by a previous run, None for a new search
+    state = None
+    if params.checkpointFile is not None:
+        checkpoint.installHandlers()
+        if params.resume:
+            state = checkpoint.load(ub)
+    elif params.resume:
+        print('Error: --resume requires a checkpoint file')
+        sys.exit(1)
     print(util.TS() + '\tstarting optimisation')
     # algorithm-dependent section
-    if params.algorithm == 'biobab':
+    if params.resume and state is None:
+        print(util.TS() + '\tthe search saved in', params.checkpointFile,
+              'is over')
+    elif params.algorithm == 'biobab':
         # construct and run biobab
         rootNode = nodeClass(m, right=boundRight, top=boundTop)
-        ts = treesearch.TreeSearch(params.strategy, nodeClass=nodeClass)
-        ts.search(rootNode, ub)
+        ts = treesearch.TreeSearch(params.strategy, nodeClass=nodeClass,
+                                   nJobs=params.nJobs)
+        ts.search(rootNode, ub, state=state)
     elif params.algorithm == 'epsilon':
         params.integerDominance = False
         params.objectiveSpaceBranching = False
-        e = epsilonconstraintframework.EpsilonConstraintFramework(relaxed)
-        e.solve(m, ub, params.epsilonFirstObjective)
+        e = epsilonconstraintframework.EpsilonConstraintFramework(
+            relaxed, params.nJobs)
+        e.solve(m, ub, params.epsilonFirstObjective, state)
     elif params.algorithm == 'bdepsilon':
         params.integerDominance = False
         params.objectiveSpaceBranching = False
         e = epsilonconstraintframework.BDEpsilonConstraintFramework(relaxed)
-        e.solve(m, ub, params.epsilonFirstObjective)
+        e.solve(m, ub, params.epsilonFirstObjective, state)
     elif params.algorithm == 'balancedbox':
         params.integerDominance = False
         params.objectiveSpaceBranching = False
-        b = balancedboxmethod.BalancedBoxMethod(relaxed, params.strategy)
-        b.search(m, ub)
+        b = balancedboxmethod.BalancedBoxMethod(relaxed, params.strategy,
+                                                nJobs=params.nJobs)
+        b.search(m, ub, state)
     elif params.algorithm == 'root':
         rootNode = nodeClass(m, right=boundRight, top=boundTop)
         lb = rootNode.lowerBound(ub)
@@ -81,7 +114,13 @@ def main():
         sys.exit(1)
 
     print('Solved', params.modelClass.nLPs, 'LPs in total')
+    if lpcache.cache is not None:
+        print('LP cache:', lpcache.cache.hits, 'hits,', lpcache.cache.misses,
+              'misses')
     print('Solved', treesearch.TreeSearch.nNodes, 'nodes in total')
+    if params.algorithm == 'biobab' and params.biobabLbRatio > 0:
+        print('Largest worst-case error of approximate LB sets:',
+              treesearch.TreeSearch.maxLbError)
     
 if __name__ == '__main__':
     main()
@@ -3,12 +3,12 @@ import math
 import random
 import itertools
 
-from gurobipy import *
+import numpy
 
-import basicdata, basiclp, integersolution, grbvalues, util
-from functools import reduce
+import basicdata, basiclp, instancecache, integersolution, lpbackend, util
+import params
 
-# used later to set Gurobi parameters
+# used later to set solver parameters
 GurobiOptimalityTolerance = 1e-8
 GurobiFeasibilityTolerance = 1e-8
 GurobiIntFeasTol = GurobiFeasibilityTolerance
@@ -18,36 +18,34 @@ GurobiNumericFocus = 0
 class SSCFLPInstance(basicdata.BasicData):
     def __init__(self, fName=None):
         self.loadFromFile(fName)
-        self.z1Epsilon = util.listGCD( reduce(lambda x, y: x + y, self.c) )
-        self.z2Epsilon = util.listGCD(self.f)
+        self.z1Epsilon = util.listGCD( self.c.ravel().tolist() )
+        self.z2Epsilon = util.listGCD( self.f.tolist() )
         print('z1Epsilon =', self.z1Epsilon)
         print('z2Epsilon =', self.z2Epsilon)
 
     def loadFromFile(self, fName):
-        stage = 1
+        arrays = instancecache.load(fName, 'sscflp-1', self.parse)
+        self.n, self.m = int(arrays['n']), int(arrays['m'])
+        # capacity and opening cost of each facility
+        self.s, self.f = arrays['s'], arrays['f']
+        # demand of each customer
+        self.d = arrays['d']
+        # cost of assigning customer j to facility i: c[i, j]
+        self.c = arrays['c']
+
+    # arrays describing the instance file (see instancecache)
+    def parse(self, fName):
         with open(fName) as f:
-            for line in f:
-                tokens = line.split()
-                if len(tokens) == 0:
-                    continue
-                else:
-                    if stage == 1:
-                        self.n, self.m = int(tokens[0]), int(tokens[1])
-                        self.s, self.f = [], []
-                        self.c = []
-                        stage = 2
-                    elif stage == 2:
-                        self.s.append(int(tokens[0]))
-                        self.f.append(int(tokens[1]))
-                        if len(self.s) == self.n:
-                            stage = 3
-                    elif stage == 3:
-                        self.d = [ int(x) for x in tokens ]
-                        stage = 4
-                    elif stage == 4:
-                        row =  [ int(x) for x in tokens ]
-                        self.c.append(row)
-                    
+            lines = [ tokens for tokens in (line.split() for line in f)
+                      if len(tokens) > 0 ]
+        n, m = int(lines[0][0]), int(lines[0][1])
+        facilities = numpy.array([ tokens[:2] for tokens in lines[1:n + 1] ],
+                                 dtype=numpy.int64)
+        return { 'n': n, 'm': m,
+                 's': facilities[:, 0], 'f': facilities[:, 1],
+                 'd': numpy.array(lines[n + 1], dtype=numpy.int64),
+                 'c': numpy.array(lines[n + 2:], dtype=numpy.int64) }
+
     def __repr__(self):
         return 'SSCFLP instance with ' + str(self.n) + \
             ' facilities and ' + str(self.m) + ' customers'
@@ -62,64 +60,83 @@ class SSCFLPInstance(basicdata.BasicData):
 
 class SSUFLPModel(basiclp.BasicLP):
     def __init__(self, data, relaxed=False):
-        self.model = Model('Single-source uncapacitated facility location problem')
-        self.model._parent = self
+        self.createModel('Single-source uncapacitated facility location problem')
+        backend = self.backend
         self.data = data
         # decision variables
         # fraction of the population at i assigned to j
         print(util.TS() + '\tcreating x variables')
-        self.x = {}
-        vtype = GRB.CONTINUOUS if relaxed else GRB.BINARY
-        for i, j in itertools.product(range(data.n), range(data.m)):
-            self.x[i, j] = self.model.addVar( vtype=vtype,
-                                              name='x_' + str(i) + '_' + \
-                                              str(j), 
-                                              ub=1 )
-        self.y = {}
-        for i in range(data.n):
-            self.y[i] = self.model.addVar( vtype=vtype,
-                                           name='y_' + str(i), 
-                                           ub=1 )
-        self.model.update()
-        self.integerVars = list(self.y.values()) + list(self.x.values())
+        vtype = lpbackend.CONTINUOUS if relaxed else lpbackend.BINARY
+        # x[i, j] is at position i * m + j
+        pairs = list(itertools.product(range(data.n), range(data.m)))
+        names = params.modelNames
+        xVars = backend.addVars( len(pairs), ub=1, vtype=vtype,
+                                 names=[ self.variableName(i)
+                                         for i in range(len(pairs)) ]
+                                 if names else None )
+        self.x = dict(zip(pairs, xVars))
+        yVars = backend.addVars( data.n, ub=1, vtype=vtype,
+                                 names=[ self.variableName(len(pairs) + i)
+                                         for i in range(data.n) ]
+                                 if names else None )
+        self.y = dict(enumerate(yVars))
+        backend.update()
+        self.integerVars = yVars + xVars
         for i in range(data.n):
-            self.y[i].setAttr(GRB.Attr.BranchPriority, 10)
+            backend.setBranchPriority(self.y[i], 10)
         # Objective functions
         print(util.TS() + '\tcreating objective expressions')
         # These attributes must be defined in order to benefit from methods
         # inherited from BasicLP
-        self.z1Expr = quicksum( data.c[i][j] * self.x[i, j]
-                                for i, j in \
-                                itertools.product(range(data.n),
-                                                  range(data.m)) )
-        self.z2Expr = quicksum( data.f[i] * self.y[i]
-                                for i in range(data.n) )
+        self.z1Expr = backend.linExpr( data.c.ravel(), xVars )
+        self.z2Expr = backend.linExpr( data.f, yVars )
         # constraints
         print(util.TS() + '\tcreating constraints')
-        for j in range(data.m):
-            self.model.addConstr( quicksum(self.x[i, j]
-                                           for i in range(data.n)) == 1,
-                                  name='coverage_' + str(j) )
-        for i in range(data.n):
-            for j in range(data.m):
-                self.model.addConstr( self.x[i, j] <=  self.y[i],
-                                      name='link_' + str(i) + '_' + str(j) )
+        # columns refer to positions in xVars + yVars
+        facilities = numpy.arange(data.n)
+        customers = numpy.arange(data.m)
+        backend.addRows( xVars + yVars,
+                         facilities[None, :] * data.m + customers[:, None],
+                         1, '=', 1,
+                         names=[ 'coverage_' + str(j)
+                                 for j in range(data.m) ]
+                         if names else None )
+        backend.addRows( xVars + yVars,
+                         numpy.column_stack(
+                             (numpy.arange(data.n * data.m),
+                              len(xVars) + facilities.repeat(data.m))),
+                         [ 1, -1 ], '<', 0,
+                         names=[ 'link_' + str(i) + '_' + str(j)
+                                 for i, j in pairs ]
+                         if names else None )
         # stuff used in the bi-objective LB calculation
         self.wsEpsilon = 1e-4
-        self.model.update()
+        backend.update()
         self.setSolverParameters()
         print(util.TS() + '\tconstruction of the model is done')
 
+    # x[i, j] comes first, at position i * m + j, then y[i]
+    def variableName(self, index):
+        n, m = self.data.n, self.data.m
+        if index < n * m:
+            return 'x_' + str(index // m) + '_' + str(index % m)
+        else:
+            return 'y_' + str(index - n * m)
+
     def setSolverParameters(self):
-        self.model.setParam('Threads', 1)
-        self.model.setParam('OptimalityTol', GurobiOptimalityTolerance)
-        self.model.setParam('FeasibilityTol', GurobiFeasibilityTolerance)
-        self.model.setParam('IntFeasTol', GurobiIntFeasTol)
-        self.model.setParam('NumericFocus', GurobiNumericFocus)
-        self.model.setParam('Outputflag', 0)
+        self.backend.setParams(threads=1,
+                               optimalityTol=GurobiOptimalityTolerance,
+                               feasibilityTol=GurobiFeasibilityTolerance,
+                               intFeasTol=GurobiIntFeasTol,
+                               numericFocus=GurobiNumericFocus,
+                               outputFlag=0)
 
+    # callbacks are only used to harvest MIP incumbents
     def optimize(self):
-        self.model.optimize()        
+        if params.harvestIncumbents and self.backend.isMIP():
+            self.backend.optimize(basiclp.callbackWrapper)
+        else:
+            self.backend.optimize()
 
 class SSUFLPSolution(integersolution.IntegerSolution):
     digits=5
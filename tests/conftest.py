@@ -0,0 +1,61 @@
+import os
+import sys
+
+import numpy
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(root, 'biobab'))
+sys.path.append(root)
+
+import basicdata
+import lpcache
+import params
+
+# tests change parameters through monkeypatch, so that they are restored
+# afterwards; solutions need input data for their improved objective values,
+# and each test starts with an empty LP cache
+@pytest.fixture(autouse=True)
+def inputData(monkeypatch):
+    monkeypatch.setattr(params, 'inputData', basicdata.BasicData(),
+                        raising=False)
+    monkeypatch.setattr(params, 'verbosity', 0)
+    monkeypatch.setattr(lpcache, 'cache', None)
+    return params.inputData
+
+# random SSUFLP instance with n facilities and m customers, built without
+# reading a file
+class SmallInstance(basicdata.BasicData):
+    def __init__(self, n=4, m=8, seed=0):
+        rng = numpy.random.default_rng(seed)
+        self.n, self.m = n, m
+        self.f = rng.integers(100, 400, n)
+        self.c = rng.integers(1, 60, (n, m))
+
+    def boundRight(self):
+        return float('inf')
+
+    def boundTop(self):
+        return float('inf')
+
+# returns a function building SSUFLP models of a small instance with HiGHS,
+# set up like main.py does
+@pytest.fixture
+def ssuflp(monkeypatch):
+    pytest.importorskip('highspy')
+    import ssuflpdata
+    def build(relaxed=True, **instance):
+        data = SmallInstance(**instance)
+        for name, value in [ ('solverBackend', 'highs'),
+                             ('inputFile', None),
+                             ('problemType', 'ssuflp'),
+                             ('instanceClass', SmallInstance),
+                             ('modelClass', ssuflpdata.SSUFLPModel),
+                             ('solutionClass', ssuflpdata.SSUFLPSolution),
+                             ('useLinearRelaxation', relaxed),
+                             ('inputData', data) ]:
+            monkeypatch.setattr(params, name, value, raising=False)
+        model = ssuflpdata.SSUFLPModel(data, relaxed=relaxed)
+        monkeypatch.setattr(params, 'model', model, raising=False)
+        return model
+    return build
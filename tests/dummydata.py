@@ -0,0 +1,34 @@
+import os
+
+import basicdata
+import basiclp
+
+# problem loaded by worker processes in tests (problem type 'dummy'): no
+# solver model is built, and the instance file only needs to exist
+class DummyInstance(basicdata.BasicData):
+    def __init__(self, fName=None):
+        open(fName).close()
+
+class DummyModel(basiclp.BasicLP):
+    def __init__(self, data, relaxed=False):
+        self.data = data
+
+    def variable(self, i):
+        return DummyVariable(i)
+
+class DummyVariable:
+    def __init__(self, index):
+        self.index = index
+
+    def __eq__(self, other):
+        return self.index == other.index
+
+    def __hash__(self):
+        return self.index
+
+# task handlers (see workerpool.workerMain)
+def double(lp, ub, payload):
+    return [ (u.z1, u.z2) for u in ub.solutions ], 2 * payload
+
+def exitWorker(lp, ub, payload):
+    os._exit(payload)
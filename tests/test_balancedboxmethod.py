@@ -0,0 +1,29 @@
+import balancedboxmethod
+import params
+import upperboundset
+
+def testWorkerReusesMethod(ssuflp, monkeypatch):
+    monkeypatch.setattr(balancedboxmethod, 'workerMethod', None)
+    # only set by the command line parser
+    monkeypatch.setattr(params, 'balancedBoxBeta', .15, raising=False)
+    lp = ssuflp(relaxed=False)
+    right, top = float('inf'), float('inf')
+    ub = upperboundset.UpperBoundSet()
+    zT = lp.lexmin(1, right, top, ub)
+    zB = lp.lexmin(2, right, top, ub)
+    area = (zB[0] - zT[0]) * (zT[1] - zB[1])
+    payload = (False, right, top, area,
+               balancedboxmethod.Rectangle(zT, zB))
+    first, new = balancedboxmethod.exploreRectangleInWorker(lp, ub, payload)
+    method = balancedboxmethod.workerMethod
+    assert method is not None
+    assert method.queue.empty()
+    second, _ = balancedboxmethod.exploreRectangleInWorker(lp, ub, payload)
+    assert balancedboxmethod.workerMethod is method
+    assert [ (R.z1, R.z2) for R in second ] == \
+        [ (R.z1, R.z2) for R in first ]
+    # another setting needs another method (the empty rectangle is skipped)
+    empty = balancedboxmethod.Rectangle(zT, zT)
+    balancedboxmethod.exploreRectangleInWorker(lp, ub,
+                                               (True, right, top, area, empty))
+    assert balancedboxmethod.workerMethod is not method
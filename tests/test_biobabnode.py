@@ -0,0 +1,234 @@
+import pickle
+
+import numpy
+import pytest
+
+import biobabnode
+import lpbackend
+import nodepriority
+import params
+import treesearch
+import upperboundset
+
+def decisions():
+    return [ treesearch.ObjectiveSpaceBranching((10, 20)),
+             treesearch.ObjectiveSpaceBranching((5, 30)) ]
+
+def testPathIsSharedWithTheParent():
+    parent = biobabnode.Node(None, path=biobabnode.pathFromList(decisions()))
+    branch = treesearch.ObjectiveSpaceBranching((4, 40))
+    child = biobabnode.Node(None, path=biobabnode.DecisionPath(parent.path,
+                                                               branch),
+                            depth=3)
+    assert child.path.parent is parent.path
+    assert child.branchingDecisions == decisions() + [ branch ]
+    assert biobabnode.pathLength(child.path) == 3
+
+def testDecisionListsAreStillAccepted():
+    for node in [ biobabnode.Node(None, 10, 20, decisions(), 2),
+                  biobabnode.Node(None, 10, 20,
+                                  branchingDecisions=decisions(), depth=2) ]:
+        assert isinstance(node.path, biobabnode.DecisionPath)
+        assert node.branchingDecisions == decisions()
+    assert biobabnode.Node(None, 10, 20, []).path is None
+
+# decision recording when it is applied or cancelled
+class LoggedDecision(treesearch.BranchingDecision):
+    __slots__ = ('name', 'log')
+
+    def __init__(self, name, log):
+        self.name = name
+        self.log = log
+
+    def apply(self, node, changes=None):
+        self.log.append(('apply', self.name))
+
+    def cancel(self, node, changes=None):
+        self.log.append(('cancel', self.name))
+
+class LoggedLP:
+    appliedPath = None
+
+    class backend:
+        def setBounds(boundType, variables, values):
+            pass
+
+        def update():
+            pass
+
+def testSwitchPathOnlyChangesTheDifferingDecisions():
+    log = []
+    a, b, c, d, e = [ LoggedDecision(name, log) for name in 'abcde' ]
+    root = biobabnode.pathFromList([ a, b ])
+    left = biobabnode.DecisionPath(biobabnode.DecisionPath(root, c), d)
+    right = biobabnode.DecisionPath(root, e)
+    node = biobabnode.Node(LoggedLP())
+    node.switchPath(left)
+    assert log == [ ('apply', name) for name in 'abcd' ]
+    del log[:]
+    # the common part of both paths is kept, the rest is cancelled from the
+    # bottom up, then applied from the top down
+    node.switchPath(right)
+    assert log == [ ('cancel', 'd'), ('cancel', 'c'), ('apply', 'e') ]
+    assert node.lp.appliedPath is right
+    del log[:]
+    node.switchPath(right)
+    assert log == []
+    node.cancelAppliedDecisions()
+    assert log == [ ('cancel', name) for name in 'eba' ]
+    assert node.lp.appliedPath is None
+
+def bounds(lp):
+    return lp.backend.lowerBounds.tolist(), lp.backend.upperBounds.tolist()
+
+def testSwitchPathGivesTheBoundsOfTheNewPath(ssuflp):
+    lp = ssuflp(relaxed=True)
+    fresh = ssuflp(relaxed=True)
+    LB, UB = lpbackend.LB, lpbackend.UB
+    def branch(index, boundType, value):
+        return treesearch.BinaryBoundBranching(lp.variable(index), boundType,
+                                               value)
+    paths = [ [ branch(0, UB, 0), branch(1, LB, 1), branch(5, UB, 0) ],
+              [ branch(0, UB, 0), branch(2, UB, 0) ],
+              [ branch(3, LB, 1) ],
+              [] ]
+    node = biobabnode.Node(lp)
+    for decisions in paths + paths[::-1]:
+        node.switchPath(biobabnode.pathFromList(decisions))
+        expected = biobabnode.Node(fresh)
+        expected.switchPath(biobabnode.pathFromList(decisions))
+        assert bounds(lp) == bounds(fresh)
+        expected.cancelAppliedDecisions()
+    # a copy of the applied path, as received from another process, is equal
+    # to it: the bounds do not change
+    node.switchPath(biobabnode.pathFromList(paths[0]))
+    node.switchPath(pickle.loads(pickle.dumps(
+        biobabnode.pathFromList(paths[0]))))
+    expected = biobabnode.Node(fresh)
+    expected.switchPath(biobabnode.pathFromList(paths[0]))
+    assert bounds(lp) == bounds(fresh)
+
+# LB set of a node, and number of LPs solved to compute it
+def boundedNode(lp, path, right, top, parentVertices):
+    node = biobabnode.Node(lp, right, top, path,
+                           parentVertices=parentVertices)
+    node.switchBranchingDecisions()
+    before = lp.__class__.nLPs
+    lb = node.lowerBound(upperboundset.UpperBoundSet())
+    return node, lb, lp.__class__.nLPs - before
+
+# coordinates of the segments of an LB set, as a flat list
+def coordinates(lb):
+    return [ value for s in lb.segments
+             for value in s.p1 + s.p2 + (s.right, s.top) ]
+
+# a child computes the same LB set with the points of its parent as without
+def testParentVerticesGiveTheSameLBSet(ssuflp):
+    lp = ssuflp(relaxed=True, n=6, m=12)
+    # box of the root node
+    size = 1e6
+    root, _, _ = boundedNode(lp, None, size, size, None)
+    points = root.vertices.points
+    assert len(points) > 2
+    middle = points[len(points) // 2]
+    children = [ (treesearch.ObjectiveSpaceBranching(middle), ) + middle ]
+    for var in lp.integerVars[::5]:
+        for boundType, value in [ (lpbackend.UB, 0), (lpbackend.LB, 1) ]:
+            children.append((treesearch.BinaryBoundBranching(var, boundType,
+                                                             value),
+                             size, size))
+    saved = 0
+    for decision, right, top in children:
+        path = biobabnode.DecisionPath(None, decision)
+        _, warmLB, warmLPs = boundedNode(lp, path, right, top, root.vertices)
+        _, coldLB, coldLPs = boundedNode(lp, path, right, top, None)
+        assert warmLB.infeasible == coldLB.infeasible
+        assert coordinates(warmLB) == pytest.approx(coordinates(coldLB))
+        assert warmLPs <= coldLPs
+        saved += coldLPs - warmLPs
+    assert saved > 0
+
+# weights of a weighted sum that c optimises among the other points
+def randomSupport(rng, c, others):
+    while True:
+        w = tuple(rng.uniform(0, 1, 2).tolist())
+        if rng.uniform() < .3:
+            w = (1, 0) if c == others[0] else (0, 1)
+        if all(biobabnode.scalar(c, *w) <= biobabnode.scalar(o, *w) + 1e-9
+               for o in others):
+            return w
+
+def lbAt(points, x):
+    j = max([ j for j, p in enumerate(points) if p[0] <= x ] + [ 0 ])
+    return nodepriority.lbValue(points, j, x)
+
+# every point that optimises none of the weighted sums better than c1, c2 and
+# c3 is above the approximate LB set
+def testApproximateLBIsValid(monkeypatch):
+    monkeypatch.setattr(params, 'biobabLbRatio', .5)
+    rng = numpy.random.default_rng(6)
+    approximated = 0
+    for trial in range(300):
+        c1, c2 = (0.0, 100.0), (100.0, 0.0)
+        # c3 is below (c1, c2), in the triangle (c1, c2, (0, 0))
+        t, depth = rng.uniform(.05, .95), rng.uniform(.01, .4)
+        c3 = (100 * t * (1 - depth), 100 * (1 - t) * (1 - depth))
+        support = { c1: randomSupport(rng, c1, [ c2, c3 ]),
+                    c2: randomSupport(rng, c2, [ c1, c3 ]) }
+        approximation = biobabnode.approximateLB(c1, c2, c3, support)
+        if approximation is None:
+            continue
+        approximated += 1
+        points, error = approximation
+        assert points[0][0] >= c1[0] and points[-1][1] >= c2[1]
+        # monotone and convex
+        for p, q in zip(points[:-1], points[1:]):
+            assert p[0] <= q[0] + 1e-9 and p[1] >= q[1] - 1e-9
+        assert error == pytest.approx(
+            max(biobabnode.diagonalDistance(v, c1, c3, c2) for v in points))
+        weights = [ support[c1], support[c2], (c1[1] - c2[1], c2[0] - c1[0]) ]
+        values = [ biobabnode.scalar(c, *w)
+                   for c, w in zip([ c1, c2, c3 ], weights) ]
+        for y in rng.uniform(0, 100, (200, 2)):
+            if all(biobabnode.scalar(y, *w) >= v - 1e-9
+                   for w, v in zip(weights, values)):
+                assert y[1] >= lbAt(points, y[0]) - 1e-6
+    assert approximated > 50
+
+def lbPolyline(lb):
+    return [ lb.segments[0].p1 ] + [ s.p2 for s in lb.segments ]
+
+# largest t such that p - (t, t) is above the polyline, by bisection
+def diagonalGap(p, polyline):
+    def above(t):
+        x, y = p[0] - t, p[1] - t
+        return x >= polyline[0][0] and y >= lbAt(polyline, x) - 1e-9
+    low, high = -100, 1000
+    for i in range(60):
+        middle = (low + high) / 2
+        low, high = (middle, high) if above(middle) else (low, middle)
+    return low
+
+# approximate LB sets are below the exact ones, within their error, and give
+# the same UB set
+def testApproximateLBSets(ssuflp, monkeypatch):
+    size = 1e6
+    results = {}
+    for ratio in [ 0, .3 ]:
+        monkeypatch.setattr(params, 'biobabLbRatio', ratio)
+        monkeypatch.setattr(treesearch.TreeSearch, 'maxLbError', 0)
+        lp = ssuflp(relaxed=True, n=6, m=12)
+        lb = biobabnode.Node(lp, size, size).lowerBound(
+            upperboundset.UpperBoundSet())
+        ub = upperboundset.UpperBoundSet()
+        treesearch.TreeSearch('best').search(biobabnode.Node(lp, size, size),
+                                             ub)
+        results[ratio] = lb, ub, treesearch.TreeSearch.maxLbError
+    exact, exactUB, _ = results[0]
+    approximate, ub, maxLbError = results[.3]
+    assert approximate.error > 0 and maxLbError >= approximate.error
+    polyline = lbPolyline(approximate)
+    for p in lbPolyline(exact):
+        assert -1e-6 <= diagonalGap(p, polyline) <= approximate.error + 1e-6
+    assert [ (u.z1, u.z2) for u in ub.solutions ] == \
+        [ (u.z1, u.z2) for u in exactUB.solutions ]
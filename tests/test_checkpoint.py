@@ -0,0 +1,133 @@
+import pytest
+
+import biobabnode
+import checkpoint
+import integersolution
+import params
+import treesearch
+import upperboundset
+
+class Model:
+    nLPs = 0
+
+@pytest.fixture
+def checkpointFile(monkeypatch, tmp_path):
+    inputFile = tmp_path / 'instance.txt'
+    inputFile.write_text('1 2\n')
+    fileName = str(tmp_path / 'checkpoint')
+    for name, value in [ ('checkpointFile', fileName),
+                         ('inputFile', str(inputFile)),
+                         ('problemType', 'test'),
+                         ('algorithm', 'biobab'),
+                         ('resume', True),
+                         ('model', None),
+                         ('modelClass', Model) ]:
+        monkeypatch.setattr(params, name, value, raising=False)
+    monkeypatch.setattr(Model, 'nLPs', 0)
+    return fileName
+
+def ubSet(points):
+    ub = upperboundset.UpperBoundSet()
+    ub.merge([ integersolution.IntegerSolution(z1=z1, z2=z2, variables={})
+               for z1, z2 in points ])
+    return ub
+
+def testSearchStateRoundTrip(checkpointFile):
+    search = treesearch.TreeSearch('best')
+    root = biobabnode.Node(None, 100, 200)
+    branch = treesearch.ObjectiveSpaceBranching((50, 150))
+    child = biobabnode.Node(None, 50, 150,
+                            biobabnode.DecisionPath(None, branch), 1)
+    search.queue.push(root)
+    search.queue.push(child)
+    Model.nLPs = 12
+    checkpoint.save(ubSet([ (1, 9), (4, 3) ]), search.getState())
+    Model.nLPs = 0
+    ub = upperboundset.UpperBoundSet()
+    state = checkpoint.load(ub)
+    assert [ (u.z1, u.z2) for u in ub.solutions ] == [ (1, 9), (4, 3) ]
+    assert Model.nLPs == 12
+    nodes = state['nodes']
+    assert [ (n.right, n.top, n.depth) for n in nodes ] == \
+        [ (100, 200, 0), (50, 150, 1) ]
+    assert nodes[1].branchingDecisions == [ branch ]
+    assert params.resume
+
+@pytest.mark.parametrize('content', [ b'', b'garbage', None ])
+def testUnreadableCheckpointStartsANewSearch(checkpointFile, content):
+    if content is None:
+        # truncated checkpoint
+        checkpoint.save(ubSet([ (1, 9) ]), { 'nodes': [], 'nNodes': 3 })
+        with open(checkpointFile, 'rb') as f:
+            content = f.read()[:-10]
+    with open(checkpointFile, 'wb') as f:
+        f.write(content)
+    ub = upperboundset.UpperBoundSet()
+    assert checkpoint.load(ub) is None
+    assert len(ub) == 0
+    assert not params.resume
+
+def testMissingCheckpointStartsANewSearch(checkpointFile):
+    assert checkpoint.load(upperboundset.UpperBoundSet()) is None
+    assert not params.resume
+
+def testCheckpointOfAnotherInstanceIsAnError(checkpointFile, monkeypatch):
+    checkpoint.save(ubSet([ (1, 9) ]), None)
+    monkeypatch.setattr(params, 'algorithm', 'epsilon')
+    with pytest.raises(SystemExit):
+        checkpoint.load(upperboundset.UpperBoundSet())
+
+# bounder asking to stop, as SIGTERM does, once it has bounded a few nodes
+class StoppingBounder(treesearch.Bounder):
+    def __init__(self, nNodes):
+        self.nNodes = nNodes
+
+    def bound(self, node, ub):
+        self.nNodes -= 1
+        if self.nNodes == 0:
+            checkpoint.requested = checkpoint.stopRequested = True
+        return treesearch.Bounder.bound(self, node, ub)
+
+def points(ub):
+    return [ (u.z1, u.z2) for u in ub.solutions ]
+
+# box of the root node
+size = 1e6
+
+@pytest.mark.parametrize('strategy', [ 'depth', 'breadth', 'best' ])
+def testResumedSearchFindsTheSameUBSet(ssuflp, monkeypatch, tmp_path,
+                                       strategy):
+    inputFile = tmp_path / 'instance.txt'
+    inputFile.write_text('1 2\n')
+    def search(ub, bounder=treesearch.Bounder(), state=None):
+        ssuflp(relaxed=True, n=5, m=10)
+        for name, value in [ ('checkpointFile', str(tmp_path / 'checkpoint')),
+                             ('inputFile', str(inputFile)),
+                             ('algorithm', 'biobab') ]:
+            monkeypatch.setattr(params, name, value, raising=False)
+        if state == 'load':
+            state = checkpoint.load(ub)
+            assert len(state['nodes']) > 0
+        treesearch.TreeSearch(strategy).search(
+            biobabnode.Node(params.model, size, size), ub, bounder=bounder,
+            state=state)
+    monkeypatch.setattr(treesearch.TreeSearch, 'nNodes', 0)
+    monkeypatch.setattr(checkpoint, 'requested', False)
+    monkeypatch.setattr(checkpoint, 'stopRequested', False)
+    reference = upperboundset.UpperBoundSet()
+    search(reference)
+    nNodes = treesearch.TreeSearch.nNodes
+    assert nNodes > 4
+    # the search stops after a few nodes
+    treesearch.TreeSearch.nNodes = 0
+    with pytest.raises(SystemExit):
+        search(upperboundset.UpperBoundSet(), StoppingBounder(4))
+    assert treesearch.TreeSearch.nNodes == 4
+    # and is resumed with a new model, as after a restart
+    treesearch.TreeSearch.nNodes = 0
+    ub = upperboundset.UpperBoundSet()
+    search(ub, state='load')
+    assert points(ub) == points(reference)
+    assert treesearch.TreeSearch.nNodes == nNodes
+    # the final checkpoint has no search state left
+    assert checkpoint.load(upperboundset.UpperBoundSet()) is None
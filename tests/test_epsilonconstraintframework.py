@@ -0,0 +1,61 @@
+import pytest
+
+import epsilonconstraintframework
+import params
+import upperboundset
+
+def points(ub):
+    return [ (u.z1, u.z2) for u in ub.solutions ]
+
+@pytest.mark.parametrize('singleObj', [ 1, 2 ])
+def testStripsCoverTheRangeBetweenTheExtremePoints(singleObj, monkeypatch):
+    monkeypatch.setattr(params, 'epsilonStripsPerJob', 3)
+    framework = epsilonconstraintframework.EpsilonConstraintFramework(
+        False, nJobs=2)
+    first, last = ((10, 95), (70, 20)) if singleObj == 1 \
+        else ((70, 20), (10, 95))
+    strips = framework.strips(singleObj, 100, 200, first, last)
+    assert len(strips) == 6
+    # constrained objective bounds: (hi, lo) for each strip
+    if singleObj == 1:
+        assert all(right == 100 for right, top, lo in strips)
+        bounds = [ (top, lo) for right, top, lo in strips ]
+    else:
+        assert all(top == 200 for right, top, lo in strips)
+        bounds = [ (right, lo) for right, top, lo in strips ]
+    # the point after the first one is in the first strip, and the last
+    # point in the last strip
+    assert bounds[0][0] == (94 if singleObj == 1 else 69)
+    assert bounds[-1][1] == (20 if singleObj == 1 else 10)
+    for (hi, lo), (nextHi, nextLo) in zip(bounds[:-1], bounds[1:]):
+        assert hi > lo == nextHi
+    # no strip when the extreme points are next to each other
+    assert framework.strips(singleObj, 100, 200, first, first) == []
+
+@pytest.mark.parametrize('singleObj', [ 1, 2 ])
+def testStripsFindTheSameSolutionsAsTheSequentialVersion(ssuflp, singleObj,
+                                                         monkeypatch):
+    monkeypatch.setattr(params, 'epsilonStripsPerJob', 2)
+    lp = ssuflp(relaxed=False, n=4, m=8)
+    reference = upperboundset.UpperBoundSet()
+    epsilonconstraintframework.EpsilonConstraintFramework(False).solve(
+        lp, reference, singleObj)
+    assert len(reference) > 3
+    # as solveInParallel does, strips are solved one after the other with
+    # the solutions of the previous ones
+    framework = epsilonconstraintframework.EpsilonConstraintFramework(
+        False, nJobs=2)
+    ub = upperboundset.UpperBoundSet()
+    inf = float('inf')
+    first = framework.lexmin(lp, singleObj, inf, inf, ub)
+    last = framework.lexmin(lp, 3 - singleObj, inf, inf, ub)
+    strips = framework.strips(singleObj, inf, inf, first, last)
+    assert len(strips) == 4
+    for strip in strips:
+        known = set(points(ub))
+        newSolutions = epsilonconstraintframework.solveStrip(
+            lp, ub, (False, singleObj) + strip)
+        assert all(not (u.z1, u.z2) in known for u in newSolutions)
+        assert set(points(ub)) - known == \
+            set((u.z1, u.z2) for u in newSolutions)
+    assert points(ub) == points(reference)
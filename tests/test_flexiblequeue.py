@@ -0,0 +1,114 @@
+import numpy
+import pytest
+
+import flexiblequeue
+import params
+import util
+
+class Item:
+    def __init__(self, score):
+        self.score = score
+
+    def __repr__(self):
+        return 'Item(' + str(self.score) + ')'
+
+def popAll(queue):
+    result = []
+    while not queue.empty():
+        result.append(queue.pop().score)
+    return result
+
+def testBestFirstQueue():
+    queue = flexiblequeue.newQueue('best')
+    for score in [ 3, 1, 2, 1 ]:
+        queue.push(Item(score))
+    assert popAll(queue) == [ 1, 1, 2, 3 ]
+
+def testAdaptiveQueueDivesWhenTooManyNodesAreQueued(monkeypatch):
+    monkeypatch.setattr(params, 'adaptiveQueueSize', 4)
+    monkeypatch.setattr(params, 'adaptiveResumeRatio', .5)
+    queue = flexiblequeue.AdaptiveQueue()
+    for score in [ 5, 2, 8, 4 ]:
+        queue.push(Item(score))
+    assert queue.pop().score == 2
+    assert queue.mode == 'dive'
+    # children of the popped node are explored depth-first
+    queue.push(Item(9))
+    queue.push(Item(7))
+    assert queue.pop().score == 7
+    assert queue.pop().score == 9
+    # then the best node is the next one to dive from
+    assert queue.pop().score == 4
+    assert queue.pop().score == 5
+    assert queue.mode == 'dive'
+    # best-first is resumed under half of the queue size limit
+    assert queue.pop().score == 8
+    assert queue.mode == 'best'
+    for score in [ 3, 1 ]:
+        queue.push(Item(score))
+    assert popAll(queue) == [ 1, 3 ]
+
+def testAdaptiveQueueComparesTheMemoryLimitWithTheAddressSpace(monkeypatch):
+    measures = []
+    def virtualMemory():
+        measures.append('virtual')
+        return 900 * 1024 ** 2
+    monkeypatch.setattr(util, 'virtualMemory', virtualMemory)
+    monkeypatch.setattr(util, 'residentMemory', lambda: 100 * 1024 ** 2)
+    monkeypatch.setattr(params, 'memoryLimit', '1G')
+    monkeypatch.setattr(params, 'adaptiveMemory', None)
+    queue = flexiblequeue.AdaptiveQueue()
+    for score in range(10):
+        queue.push(Item(score))
+    queue.pop()
+    assert queue.mode == 'dive'
+    assert measures == [ 'virtual' ]
+
+def testAdaptiveQueueMeasuresMemoryEveryFewPops(monkeypatch):
+    measures = []
+    def residentMemory():
+        measures.append(len(measures))
+        return 0
+    monkeypatch.setattr(util, 'residentMemory', residentMemory)
+    monkeypatch.setattr(params, 'adaptiveMemory', 100)
+    monkeypatch.setattr(params, 'adaptiveMemoryInterval', 10)
+    queue = flexiblequeue.AdaptiveQueue()
+    for score in range(25):
+        queue.push(Item(score))
+    assert popAll(queue) == list(range(25))
+    assert len(measures) == 3
+
+# random pushes and pops, with scores that are often equal
+def operations(rng, n):
+    for i in range(n):
+        if rng.uniform() < .6:
+            yield 'push', int(rng.integers(0, 20))
+        else:
+            yield 'pop', None
+
+@pytest.mark.parametrize('mode', [ 'fifo', 'lifo', 'best' ])
+@pytest.mark.parametrize('maxInMemory', [ 2, 5, 16 ])
+def testSpillingQueueMatchesQueue(mode, maxInMemory, tmp_path):
+    rng = numpy.random.default_rng(maxInMemory)
+    queue = flexiblequeue.Queue(mode)
+    spilling = flexiblequeue.SpillingQueue(mode, maxInMemory, str(tmp_path))
+    spilled = 0
+    for i, (operation, score) in enumerate(operations(rng, 2000)):
+        if operation == 'push':
+            item = Item(score)
+            item.id = i
+            queue.push(item)
+            spilling.push(item)
+        elif not queue.empty():
+            assert spilling.pop().id == queue.pop().id
+        assert len(spilling) == len(queue)
+        spilled = max(spilled, spilling.nSpilled)
+        if i % 100 == 0:
+            assert [ u.id for u in spilling.items() ] == \
+                [ u.id for u in queue.items() ]
+    # chunks were written and read back
+    assert spilled > 0
+    while not queue.empty():
+        assert spilling.pop().id == queue.pop().id
+    assert spilling.empty()
+    assert len(spilling.chunks) == 0 and spilling.nSpilled == 0
@@ -0,0 +1,78 @@
+import math
+
+import numpy
+import pytest
+
+import integersolution
+import lowerboundset
+import params
+import segment
+import upperboundset
+
+def curve(x):
+    return (100 - x) ** 2 / 50
+
+# LB set along a convex curve; segments without integer points are kept, to
+# check that filtering drops them
+def convexLB(rng, right=120, top=250):
+    xs = sorted(set(rng.uniform(0, 100, 8).round(2).tolist()))
+    points = [ (x, curve(x)) for x in xs ]
+    segments = []
+    for i, (p1, p2) in enumerate(zip(points[:-1], points[1:])):
+        segments.append(segment.Segment(
+            p1, p2, p2[0] if i < len(points) - 2 else right, top,
+            None, None))
+    return lowerboundset.LowerBoundSet(segments)
+
+# integer points on or above the curve
+def randomUB(rng, size):
+    ub = upperboundset.UpperBoundSet()
+    ub.merge([ integersolution.IntegerSolution(
+        z1=float(math.ceil(x + dx)), z2=float(math.ceil(curve(x) + dy)),
+        variables={})
+               for x, dx, dy in rng.uniform(0, [ 100, 5, 20 ], (size, 3)) ])
+    return ub
+
+def describe(lb):
+    return [ (s.p1, s.p2, s.right, s.top) for s in lb.segments ]
+
+@pytest.mark.parametrize('integerDominance', [ True, False ])
+@pytest.mark.parametrize('segmentTightening', [ True, False ])
+def testFilterMatchesFilteringPointByPoint(integerDominance,
+                                           segmentTightening, monkeypatch):
+    monkeypatch.setattr(params, 'integerDominance', integerDominance)
+    monkeypatch.setattr(params, 'segmentTightening', segmentTightening)
+    rng = numpy.random.default_rng(3)
+    changed = 0
+    for trial in range(200):
+        lb = convexLB(rng)
+        ub = randomUB(rng, int(rng.integers(0, 30)))
+        expected = lowerboundset.LowerBoundSet(list(lb.segments))
+        for u in ub.solutions:
+            expected.filterPoint(u)
+        before = describe(lb)
+        lb.filter(ub)
+        assert describe(lb) == describe(expected)
+        changed += describe(lb) != before
+    # the UB sets do cut the LB sets
+    assert changed > 50
+
+# points (0, 10), (2, 4), (5, 1), (9, 0): the segments have slopes 3, 1
+# and 1/4, and only the first two are certified
+def testSupportingPointNeedsCertifiedSegments():
+    points = [ (0, 10), (2, 4), (5, 1), (9, 0) ]
+    vertices = lowerboundset.LBVertices(
+        { p: None for p in points }, { (points[0], points[1]),
+                                      (points[1], points[2]) },
+        float('inf'), 0, 0)
+    # weighted sums beta * z1 + alpha * z2 with slope beta / alpha
+    assert vertices.supportingPoint(5, 1) == 0
+    assert vertices.supportingPoint(2, 1) == 1
+    assert vertices.supportingPoint(3, 1) in (0, 1)
+    assert vertices.supportingPoint(1, 2) is None
+    assert vertices.supportingPoint(1, 8) is None
+    assert vertices.supportingPoint(1, 0) is None
+    # the rightmost point optimises slopes down to rightSlope
+    vertices.certified[2] = True
+    assert vertices.supportingPoint(1, 2) == 2
+    assert vertices.supportingPoint(1, 8) == 3
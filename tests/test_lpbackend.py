@@ -0,0 +1,68 @@
+import pytest
+
+import lpbackend
+import params
+import upperboundset
+import util
+
+inf = float('inf')
+
+def testHighsLPTimeLimitIsCumulative(ssuflp):
+    lp = ssuflp(relaxed=True)
+    ub = upperboundset.UpperBoundSet()
+    for w1, w2 in [ (1, 1), (1, 2), (2, 1) ]:
+        lp.solveWeightedSum(w1, w2, inf, inf, ub)
+    runTime = lp.backend.model.getRunTime()
+    assert runTime > 0
+    # HiGHS stops an LP once its total run time reaches time_limit
+    lp.backend.setTimeLimit(5)
+    _, limit = lp.backend.model.getOptionValue('time_limit')
+    assert limit == pytest.approx(5 + runTime)
+    lp.backend.setTimeLimit(None)
+    _, limit = lp.backend.model.getOptionValue('time_limit')
+    assert limit == inf
+
+# the limit is reached either before the solve or by the solver itself
+def testTimeLimitRaises(ssuflp, monkeypatch):
+    lp = ssuflp(relaxed=True, n=20, m=40)
+    monkeypatch.setattr(params, 'wallClock', False)
+    monkeypatch.setattr(params, 'timeLimit', 1e-6)
+    util.startClock()
+    with pytest.raises(util.TimeLimitReachedException):
+        lp.solveWeightedSum(1, 1, inf, inf, upperboundset.UpperBoundSet())
+
+def testHighsSetBoundsOnlyChangesGivenVariables(ssuflp):
+    lp = ssuflp(relaxed=True)
+    variables = lp.variables()
+    lp.backend.setBounds(lpbackend.UB, [ variables[5], variables[2] ],
+                         [ .5, 0 ])
+    lp.backend.setBounds(lpbackend.LB, [ variables[3] ], [ 1 ])
+    assert lp.backend.getBounds(lpbackend.UB, variables[:6]) == \
+        [ 1, 1, 0, 1, 1, .5 ]
+    assert lp.backend.getBounds(lpbackend.LB, variables[:6]) == \
+        [ 0, 0, 0, 1, 0, 0 ]
+    # the bounds in HiGHS are the mirrored ones
+    highsLP = lp.backend.model.getLp()
+    assert list(highsLP.col_upper_) == lp.backend.upperBounds.tolist()
+    assert list(highsLP.col_lower_) == lp.backend.lowerBounds.tolist()
+
+def testHighsValuesNeedACurrentSolution(ssuflp):
+    lp = ssuflp(relaxed=True)
+    ub = upperboundset.UpperBoundSet()
+    with pytest.raises(ValueError):
+        lp.backend.values(lp.variables())
+    lp.solveWeightedSum(1, 1, inf, inf, ub)
+    values = lp.backend.values(lp.variables())
+    assert len(values) == len(lp.variables())
+    assert lp.backend.values(lp.variables()[3:1:-1]).tolist() == \
+        values[3:1:-1].tolist()
+    # changing a bound makes the solution out of date
+    lp.backend.setBounds(lpbackend.UB, [ lp.variable(0) ], [ 0 ])
+    with pytest.raises(ValueError):
+        lp.z1()
+    lp.solveWeightedSum(1, 1, inf, inf, ub)
+    assert lp.backend.values([ lp.variable(0) ]).tolist() == [ 0 ]
+    # so does changing the objective
+    lp.backend.setObjective(lp.z1Expr)
+    with pytest.raises(ValueError):
+        lp.backend.values(lp.variables())
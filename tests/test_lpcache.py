@@ -0,0 +1,107 @@
+import numpy
+
+import lpcache
+import params
+import upperboundset
+
+def points(ub):
+    return [ (u.z1, u.z2) for u in ub.solutions ]
+
+def testKeyDependsOnSettings(ssuflp, monkeypatch):
+    lp = ssuflp()
+    cache = lpcache.LPCache(1024 * 1024)
+    key = cache.key(lp, 1, 1, 1000, 1000)
+    assert cache.key(lp, 1, 1, 1000, 1000) == key
+    assert cache.key(lp, 1, 2, 1000, 1000) != key
+    for name, value in [ ('integerDominance', not params.integerDominance),
+                         ('solverBackend', 'gurobi'),
+                         ('harvestSolutionPool',
+                          not params.harvestSolutionPool) ]:
+        with monkeypatch.context() as m:
+            m.setattr(params, name, value)
+            assert cache.key(lp, 1, 1, 1000, 1000) != key
+
+def testReplayGivesTheSameResult(ssuflp, monkeypatch):
+    lp = ssuflp()
+    monkeypatch.setattr(lpcache, 'cache', lpcache.LPCache(1024 * 1024))
+    solved = upperboundset.UpperBoundSet()
+    point = lp.solveWeightedSum(1, 1, 10000, 10000, solved)
+    values = lp.solutionValues().copy()
+    nLPs = lp.nLPs
+    replayed = upperboundset.UpperBoundSet()
+    assert lp.solveWeightedSum(1, 1, 10000, 10000, replayed) == point
+    assert lp.nLPs == nLPs
+    assert lpcache.cache.hits == 1
+    assert numpy.array_equal(lp.solutionValues(), values)
+    assert points(replayed) == points(solved)
+
+def testReplayRestoresTheSolutionPool(ssuflp, monkeypatch):
+    lp = ssuflp(relaxed=False)
+    monkeypatch.setattr(lpcache, 'cache', lpcache.LPCache(1024 * 1024))
+    ub = upperboundset.UpperBoundSet()
+    lp.solveWeightedSum(1, 1, 10000, 10000, ub)
+    pool = points(lp.getSolutionPoolVectors())
+    assert len(pool) > 0
+    # another solve replaces the pool of the solver
+    lp.solveWeightedSum(1, 0, 10000, 10000, ub)
+    assert points(lp.getSolutionPoolVectors()) != pool
+    lp.solveWeightedSum(1, 1, 10000, 10000, ub)
+    assert lpcache.cache.hits == 1
+    assert points(lp.getSolutionPoolVectors()) == pool
+
+def testReplayedLPPoolIsTheOptimalSolution(ssuflp, monkeypatch):
+    lp = ssuflp()
+    monkeypatch.setattr(lpcache, 'cache', lpcache.LPCache(1024 * 1024))
+    ub = upperboundset.UpperBoundSet()
+    lp.solveWeightedSum(1, 1, 10000, 10000, ub)
+    pool = points(lp.getSolutionPoolVectors())
+    lp.solveWeightedSum(1, 0, 10000, 10000, ub)
+    lp.solveWeightedSum(1, 1, 10000, 10000, ub)
+    assert lpcache.cache.hits == 1
+    assert points(lp.getSolutionPoolVectors()) == pool
+
+def testFileEntriesAreOnlyUsedWithTheSameSettings(ssuflp, monkeypatch,
+                                                  tmp_path):
+    lp = ssuflp()
+    fileName = str(tmp_path / 'lps')
+    cache = lpcache.LPCache(1024 * 1024, fileName)
+    monkeypatch.setattr(lpcache, 'cache', cache)
+    lp.solveWeightedSum(1, 1, 10000, 10000, upperboundset.UpperBoundSet())
+    cache.close()
+    for integerDominance, hits in [ (not params.integerDominance, 0),
+                                    (params.integerDominance, 1) ]:
+        monkeypatch.setattr(params, 'integerDominance', integerDominance)
+        cache = lpcache.LPCache(1024 * 1024, fileName)
+        monkeypatch.setattr(lpcache, 'cache', cache)
+        lp.solveWeightedSum(1, 1, 10000, 10000, upperboundset.UpperBoundSet())
+        cache.close()
+        assert cache.hits == hits
+
+def entry(point):
+    return (point, numpy.array([ 0 ]), numpy.array([ 1.0 ]), [], None)
+
+def testWorkerEntriesAreStoredByTheCoordinator(tmp_path):
+    fileName = str(tmp_path / 'lps')
+    coordinator = lpcache.LPCache(1024 * 1024, fileName)
+    coordinator.put('old', entry((1, 2)))
+    # worker processes read the file while the coordinator does not use it
+    coordinator.suspend()
+    worker = lpcache.LPCache(1024 * 1024, fileName, readOnly=True)
+    assert worker.get('old')[0] == (1, 2)
+    worker.put('new', entry((3, 4)))
+    coordinator.keep(worker.takeNewEntries())
+    assert worker.takeNewEntries() == []
+    worker.close()
+    coordinator.resume()
+    coordinator.close()
+    nextRun = lpcache.LPCache(0, fileName)
+    assert nextRun.get('new')[0] == (3, 4)
+    assert nextRun.hits == 1
+    nextRun.close()
+
+def testWorkerWithoutCacheFile(tmp_path):
+    worker = lpcache.LPCache(1024 * 1024, str(tmp_path / 'none'),
+                             readOnly=True)
+    assert worker.get('old') is None
+    worker.put('new', entry((3, 4)))
+    assert [ k for k, e in worker.takeNewEntries() ] == [ 'new' ]
@@ -0,0 +1,99 @@
+import numpy
+import pytest
+
+import biobabnode
+import flexiblequeue
+import integersolution
+import nodepriority
+import params
+import upperboundset
+
+def ubSet(points):
+    ub = upperboundset.UpperBoundSet()
+    ub.merge([ integersolution.IntegerSolution(z1=z1, z2=z2, variables={})
+               for z1, z2 in points ])
+    return ub
+
+# convex LB points, from left to right
+def lbPoints(rng):
+    xs = sorted(set(rng.uniform(0, 60, 5).round(1).tolist()))
+    return [ (x, (80 - x) ** 2 / 80) for x in xs ]
+
+def lbAt(points, x):
+    j = max([ j for j, p in enumerate(points) if p[0] <= x ] + [ 0 ])
+    return nodepriority.lbValue(points, j, x)
+
+# area above the LB set, in the box, and not dominated by the UB set,
+# by numerical integration over z1
+def hypervolume(points, ub, right, top):
+    xs = numpy.linspace(points[0][0], right, 20001)
+    xs = (xs[:-1] + xs[1:]) / 2
+    # the LB set is horizontal right of its last point
+    lb = numpy.interp(xs, [ p[0] for p in points ], [ p[1] for p in points ])
+    staircase = numpy.full(len(xs), float(top))
+    for u in ub.solutions:
+        staircase[xs >= u.z1] = numpy.minimum(staircase[xs >= u.z1], u.z2)
+    return numpy.maximum(0, staircase - lb).sum() * \
+        (right - points[0][0]) / len(xs)
+
+# largest t such that (n1 - t, n2 - t) is above the LB set, by bisection
+def nadirDistance(n, points):
+    def above(t):
+        x, y = n[0] - t, n[1] - t
+        return x >= points[0][0] and y >= lbAt(points, x)
+    low, high = -1000, 1000
+    for i in range(60):
+        middle = (low + high) / 2
+        low, high = (middle, high) if above(middle) else (low, middle)
+    return low
+
+def testGapsMatchTheirDefinition():
+    rng = numpy.random.default_rng(4)
+    for trial in range(20):
+        points = lbPoints(rng)
+        right, top = 70, 70
+        ub = ubSet([ (x, (80 - x) ** 2 / 80 + d)
+                     for x, d in rng.uniform(0, [ 70, 15 ], (6, 2)) ])
+        hypervolumeKey = nodepriority.HypervolumeKey(ub)
+        assert hypervolumeKey.gap(points, right, top) == \
+            pytest.approx(hypervolume(points, ub, right, top), rel=1e-3,
+                          abs=1e-2)
+        first, last = ub.boxRange(right, top)
+        inBox = ub.solutions[first:last]
+        nadirs = [ (right, top) ] if len(inBox) == 0 else \
+            [ (inBox[0].z1, top) ] + \
+            [ (v.z1, u.z2) for u, v in zip(inBox[:-1], inBox[1:]) ] + \
+            [ (right, inBox[-1].z2) ]
+        nadirKey = nodepriority.NadirKey(ub)
+        assert nadirKey.gap(points, right, top) == pytest.approx(
+            max(max(0, nadirDistance(n, points)) for n in nadirs), abs=1e-6)
+
+# the node popped is always one with the smallest key for the current UB set,
+# although keys are only updated when a node reaches the top of the queue
+@pytest.mark.parametrize('spilling', [ False, True ])
+@pytest.mark.parametrize('keyClass', [ nodepriority.HypervolumeKey,
+                                       nodepriority.NadirKey ])
+def testPopsFollowTheCurrentKeys(keyClass, spilling, monkeypatch):
+    # spilled nodes are read back as copies, identified by their depth
+    monkeypatch.setattr(params, 'model', None, raising=False)
+    rng = numpy.random.default_rng(5)
+    ub = ubSet([ (0, 100), (100, 0) ])
+    queue = flexiblequeue.SpillingQueue('best', 6) if spilling \
+        else flexiblequeue.Queue('best')
+    queue.key = keyClass(ub)
+    queued = {}
+    for i in range(30):
+        x = float(rng.uniform(0, 60))
+        node = biobabnode.Node(None, x + 30, 100 - x, depth=i)
+        node.lbPoints = [ (x, 100 - x - 30), (x + 20, 100 - x - 40) ]
+        queue.push(node)
+        queued[i] = node
+    while len(queued) > 0:
+        node = queue.pop()
+        assert queue.key(node) == min(queue.key(n) for n in queued.values())
+        del queued[node.depth]
+        # a new UB point changes the keys of the nodes around it
+        ub.merge([ integersolution.IntegerSolution(
+            z1=node.lbPoints[0][0] + 5, z2=node.lbPoints[0][1] + 5,
+            variables={}) ])
+    assert queue.empty()
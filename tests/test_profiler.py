@@ -0,0 +1,57 @@
+import pytest
+
+import lowerboundset
+import params
+import profiler
+import treesearch
+import upperboundset
+import weightedsumsolver
+
+@pytest.fixture
+def profiling(monkeypatch):
+    monkeypatch.setattr(profiler, 'enabled', True)
+    monkeypatch.setattr(profiler, 'maxQueueSize', 0)
+    monkeypatch.setattr(profiler, 'queueSizes', [])
+    profiler.reset()
+    yield profiler
+    profiler.reset()
+
+# node with a given LB set
+class FixedNode:
+    depth = 0
+
+    def __init__(self, lb):
+        self.lb = lb
+
+    def lowerBound(self, ub):
+        return self.lb
+
+class Model:
+    nLPs = 0
+
+def testInfeasibleAndDominatedCounts(profiling, monkeypatch):
+    monkeypatch.setattr(params, 'modelClass', Model, raising=False)
+    monkeypatch.setattr(params, 'debug', False, raising=False)
+    bounder = treesearch.Bounder()
+    ub = upperboundset.UpperBoundSet()
+    bounder.bound(FixedNode(lowerboundset.infeasibleLB()), ub)
+    assert profiler.counts == { 'pruned-infeasible': 1 }
+    # e.g. all segments dropped by segment tightening
+    bounder.bound(FixedNode(lowerboundset.LowerBoundSet([])), ub)
+    assert profiler.counts == { 'pruned-infeasible': 1,
+                                'pruned-dominated': 1 }
+    assert profiler.nodesPerDepth == { 0: 2 }
+
+def testNestedSearchesAreNotCounted(profiling, ssuflp, monkeypatch):
+    monkeypatch.setattr(params, 'strategy', 'breadth', raising=False)
+    lp = ssuflp(relaxed=True)
+    ub = upperboundset.UpperBoundSet()
+    nNodes = treesearch.TreeSearch.nNodes
+    point = weightedsumsolver.WeightedSumSolver().solve(
+        lp, 3, 1, float('inf'), float('inf'), ub)
+    assert point is not None
+    # the nested tree has more than the root node
+    assert treesearch.TreeSearch.nNodes - nNodes > 1
+    assert profiler.counts == {}
+    assert profiler.nodesPerDepth == {}
+    assert profiler.maxQueueSize == 0
@@ -0,0 +1,72 @@
+import os
+
+import numpy
+import pytest
+
+import params
+import ssuflpdata
+
+def testVariableNamesWithoutSolverNames(ssuflp, monkeypatch):
+    monkeypatch.setattr(params, 'modelNames', True)
+    named = ssuflp(n=3, m=5)
+    expected = named.variableNames(named.variables())
+    assert expected[:2] == [ 'x_0_0', 'x_0_1' ]
+    assert expected[-1] == 'y_2'
+    monkeypatch.setattr(params, 'modelNames', False)
+    lp = ssuflp(n=3, m=5)
+    assert lp.variableNames(lp.variables()) == expected
+
+# parser used before instances were stored as arrays, as a reference
+def parseAsBefore(fName):
+    stage = 1
+    with open(fName) as f:
+        for line in f:
+            tokens = line.split()
+            if len(tokens) == 0:
+                continue
+            if stage == 1:
+                n, m = int(tokens[0]), int(tokens[1])
+                s, fixed, c = [], [], []
+                stage = 2
+            elif stage == 2:
+                s.append(int(tokens[0]))
+                fixed.append(int(tokens[1]))
+                if len(s) == n:
+                    stage = 3
+            elif stage == 3:
+                d = [ int(x) for x in tokens ]
+                stage = 4
+            elif stage == 4:
+                c.append([ int(x) for x in tokens ])
+    return n, m, s, fixed, d, c
+
+# instance file with blank lines and irregular spacing
+def writeInstance(fName, n, m, seed):
+    rng = numpy.random.default_rng(seed)
+    lines = [ str(n) + '   ' + str(m) ]
+    lines += [ ' '.join(map(str, rng.integers(1, 500, 2))) for i in range(n) ]
+    lines += [ '', '\t'.join(map(str, rng.integers(1, 50, m))), '' ]
+    lines += [ '  '.join(map(str, rng.integers(0, 1000, m)))
+               for i in range(n) ]
+    with open(fName, 'w') as f:
+        f.write('\n'.join(lines) + '\n\n')
+
+@pytest.mark.parametrize('cached', [ False, True ])
+def testInstancesAreParsedAsBefore(tmp_path, monkeypatch, cached):
+    monkeypatch.setattr(params, 'instanceCacheDir',
+                        str(tmp_path / 'cache') if cached else None)
+    for seed, (n, m) in enumerate([ (1, 1), (3, 7), (20, 45) ]):
+        fName = str(tmp_path / ('instance' + str(seed) + '.txt'))
+        writeInstance(fName, n, m, seed)
+        # the second load comes from the cache, if there is one
+        for load in range(2):
+            data = ssuflpdata.SSCFLPInstance.__new__(
+                ssuflpdata.SSCFLPInstance)
+            data.loadFromFile(fName)
+            assert (data.n, data.m, data.s.tolist(), data.f.tolist(),
+                    data.d.tolist(), data.c.tolist()) == parseAsBefore(fName)
+            assert data.c.shape == (n, m)
+    if cached:
+        assert len(os.listdir(tmp_path / 'cache')) == 3
+    else:
+        assert not (tmp_path / 'cache').exists()
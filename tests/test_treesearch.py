@@ -0,0 +1,51 @@
+import biobabnode
+import params
+import treesearch
+
+def child(node, z):
+    branch = treesearch.ObjectiveSpaceBranching(z)
+    return biobabnode.Node(None, path=biobabnode.DecisionPath(node.path,
+                                                              branch),
+                           depth=node.depth + 1)
+
+# LB vertices are only compared by identity here
+def bounded(node, vertices):
+    node.vertices = vertices
+    return node
+
+def testChildrenGetTheDataOfTheirParent(monkeypatch):
+    monkeypatch.setattr(params, 'warmStartNodes', 2)
+    ts = treesearch.TreeSearch()
+    root = biobabnode.Node(None)
+    # the root node has no parent
+    ts.warmStart(root)
+    assert root.parentVertices is None
+    ts.keepWarmStart(bounded(root, 'root'))
+    # bounded nodes do not keep their own data
+    assert root.vertices is None
+    a, b = child(root, (1, 2)), child(root, (2, 1))
+    ts.warmStart(a)
+    assert a.parentVertices == 'root'
+    ts.keepWarmStart(bounded(a, 'a'))
+    ts.keepWarmStart(bounded(b, 'b'))
+    # the least recently used entry (root) is evicted
+    assert list(ts.warmStarts) == [ a.path, b.path ]
+    grandChild = child(a, (0, 3))
+    ts.warmStart(grandChild)
+    assert grandChild.parentVertices == 'a'
+    assert list(ts.warmStarts) == [ b.path, a.path ]
+    late = child(root, (3, 0))
+    ts.warmStart(late)
+    assert late.parentVertices is None
+
+def testNodesWithoutDataAreNotKept(monkeypatch):
+    ts = treesearch.TreeSearch()
+    ts.keepWarmStart(bounded(biobabnode.Node(None), None))
+    assert len(ts.warmStarts) == 0
+    monkeypatch.setattr(params, 'warmStartNodes', 0)
+    ts.keepWarmStart(bounded(biobabnode.Node(None), 'root'))
+    assert len(ts.warmStarts) == 0
+    monkeypatch.setattr(params, 'warmStartNodes', 64)
+    monkeypatch.setattr(params, 'lbWarmStart', False)
+    ts.keepWarmStart(bounded(biobabnode.Node(None), 'root'))
+    assert len(ts.warmStarts) == 0
@@ -0,0 +1,79 @@
+import numpy
+import pytest
+
+import uboflpinstance
+
+# parser used before instances were stored as arrays, as a reference
+# (locale.atoi and locale.atof were int and float with the C locale)
+def parseAsBefore(fName):
+    nPoints = 0
+    for line in open(fName):
+        # remove comments
+        line = line[:line.find('#')]
+        tokens = line.split()
+        if len(tokens) != 0:
+            if nPoints == 0:
+                nPoints = int(tokens[0])
+                nSamples, dmax1, dmax2, zeta = [ int(x) for x in tokens[3:] ]
+                x, y, name = [], [], []
+                w, c, gamma = [ 0 ], [ 0 ], [ 0 ]
+                xi, d = {}, {}
+            elif len(x) < nPoints:
+                x.append(float(tokens[1]))
+                y.append(float(tokens[2]))
+                name.append(' '.join(tokens[3:]))
+            elif len(d) < nPoints ** 2:
+                row = len(d) / nPoints
+                for col, tok in enumerate(tokens):
+                    d[row, col] = float(tok)
+            elif len(c) < nPoints:
+                c.append(int(tokens[1]))
+            elif len(w) < nPoints:
+                w.append(int(tokens[1]))
+            elif len(gamma) < nPoints:
+                gamma.append(int(tokens[1]))
+            elif len(xi) < nPoints * nSamples:
+                scenario = len(xi) / nPoints
+                for j, tok in enumerate(tokens):
+                    xi[0, scenario] = 0
+                    xi[j + 1, scenario] = float(tok) / zeta
+            else:
+                raise ValueError('unexpected input: ' + line)
+    matrix = [ [ d[row, col] for col in range(nPoints) ]
+               for row in range(nPoints) ]
+    return (nPoints, nSamples, dmax1, dmax2, zeta, x, y, name, matrix, c, w,
+            gamma)
+
+# instance file with comment lines, trailing comments and blank lines
+def writeInstance(fName, nPoints, nSamples, seed):
+    rng = numpy.random.default_rng(seed)
+    lines = [ '# generated instance', '',
+              ' '.join(map(str, [ nPoints, 0, 0, nSamples, 20, 40, 1 ])) ]
+    for i in range(nPoints):
+        x, y = rng.uniform(0, 50, 2).round(1)
+        lines.append(' '.join(map(str, [ i, x, y, 'village', i ])) +
+                     (' # village ' + str(i) if i % 3 == 0 else ''))
+    lines.append('# distance matrix')
+    for i in range(nPoints):
+        lines.append(' '.join(map(str, rng.integers(0, 60, nPoints))) +
+                     ('  # row ' + str(i) if i % 2 == 0 else ''))
+    for label in 'cwg':
+        lines.append('')
+        lines += [ label + str(i) + ' ' + str(rng.integers(1, 100))
+                   for i in range(1, nPoints) ]
+    lines.append('# scenarios')
+    lines += [ ' '.join([ '1' ] * nPoints) for i in range(nSamples) ]
+    with open(fName, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+
+@pytest.mark.parametrize('nPoints, nSamples', [ (2, 1), (8, 1), (30, 3) ])
+def testInstancesAreParsedAsBefore(tmp_path, nPoints, nSamples):
+    fName = str(tmp_path / 'instance.txt')
+    writeInstance(fName, nPoints, nSamples, nPoints)
+    instance = uboflpinstance.Instance.__new__(uboflpinstance.Instance)
+    arrays = instance.parse(fName)
+    parsed = tuple(int(arrays[key]) for key in ('nPoints', 'nSamples',
+                                                'dmax1', 'dmax2', 'zeta')) + \
+        tuple(arrays[key].tolist() for key in ('x', 'y', 'name', 'd', 'c',
+                                               'w', 'gamma'))
+    assert parsed == parseAsBefore(fName)
@@ -0,0 +1,117 @@
+import numpy
+import pytest
+
+import dominance
+import integersolution
+import params
+import upperboundset
+
+def solution(z1, z2):
+    return integersolution.IntegerSolution(z1=z1, z2=z2, variables={})
+
+def testObjectiveArraysDoNotLockTheSet():
+    ub = upperboundset.UpperBoundSet()
+    ub.solutions = [ solution(1, 5), solution(3, 3) ]
+    z1, z2 = dominance.objectiveArrays(ub)
+    improvedZ1, improvedZ2 = dominance.objectiveArrays(ub, True)
+    # resizes the arrays of the set while the numpy arrays are alive
+    assert ub.updateWithSolution(solution(2, 4))
+    assert ub.updateWithSolution(solution(0, 2))
+    assert [ (u.z1, u.z2) for u in ub.solutions ] == [ (0, 2) ]
+    assert z1.tolist() == [ 1, 3 ] and z2.tolist() == [ 5, 3 ]
+
+# list-based UB set used before the objective arrays, as a reference
+class ListUpperBoundSet:
+    def __init__(self):
+        self.solutions = []
+
+    def updateWithSolution(self, solution):
+        if len(self.solutions) == 0:
+            self.solutions = [ solution ]
+        elif len(self.solutions) == 1:
+            if self.solutions[0].dominates(solution):
+                pass
+            elif solution.dominates(self.solutions[0]):
+                self.solutions = [ solution ]
+            else:
+                self.solutions.append(solution)
+                self.solutions.sort(key=lambda x: x.z1)
+        else:
+            if solution.z1 <= self.solutions[0].z1:
+                left, right = -1, 0
+            elif solution.z1 == self.solutions[-1].z1:
+                left, right = len(self.solutions) - 2, len(self.solutions) - 1
+            elif solution.z1 > self.solutions[-1].z1:
+                left, right = len(self.solutions) - 1, len(self.solutions)
+            else:
+                left, right = 0, len(self.solutions) - 1
+                while right - left > 1:
+                    middle = (left + right) // 2
+                    if self.solutions[middle].z1 == solution.z1:
+                        left, right = middle - 1, middle
+                    elif self.solutions[middle].z1 < solution.z1:
+                        left = middle
+                    else:
+                        right = middle
+            if self.solutions[left].dominates(solution) or \
+                    (right < len(self.solutions) and \
+                         self.solutions[right].dominates(solution) ):
+                pass
+            else:
+                nDom = 0
+                while right+nDom < len(self.solutions) and \
+                        solution.dominates(self.solutions[right+nDom]):
+                    nDom += 1
+                self.solutions = self.solutions[:left+1] + \
+                    [ solution ] + self.solutions[right+nDom:]
+
+def points(ub):
+    return [ (u.z1, u.z2) for u in ub.solutions ]
+
+# the objective arrays follow the solutions
+def checkArrays(ub):
+    assert list(ub.z1Values) == [ u.z1 for u in ub.solutions ]
+    assert list(ub.minusZ2Values) == [ -u.z2 for u in ub.solutions ]
+    assert list(ub.improvedZ1Values) == [ u.improvedZ1 for u in ub.solutions ]
+    assert list(ub.minusImprovedZ2Values) == \
+        [ -u.improvedZ2 for u in ub.solutions ]
+
+# batches of random points, with many equal objective values
+def batches(rng, integer):
+    for size in [ 1, 2, 3, 50, 5, 200, 1, 20 ]:
+        values = rng.integers(0, 40, (size, 2)) if integer \
+            else rng.uniform(0, 40, (size, 2)).round(1)
+        yield [ solution(*map(float, v)) for v in values ]
+
+@pytest.mark.parametrize('integerDominance', [ True, False ])
+def testUpdatesMatchTheListVersion(integerDominance, monkeypatch):
+    monkeypatch.setattr(params, 'integerDominance', integerDominance)
+    rng = numpy.random.default_rng(1)
+    for trial in range(20):
+        ub, reference = upperboundset.UpperBoundSet(), ListUpperBoundSet()
+        for batch in batches(rng, integerDominance):
+            for u in batch:
+                before = points(reference)
+                reference.updateWithSolution(u)
+                assert ub.updateWithSolution(u) == \
+                    (points(reference) != before)
+                assert points(ub) == points(reference)
+        checkArrays(ub)
+
+@pytest.mark.parametrize('integerDominance', [ True, False ])
+def testMergeMatchesTheListVersion(integerDominance, monkeypatch):
+    monkeypatch.setattr(params, 'integerDominance', integerDominance)
+    rng = numpy.random.default_rng(2)
+    for trial in range(20):
+        ub, reference = upperboundset.UpperBoundSet(), ListUpperBoundSet()
+        for batch in batches(rng, integerDominance):
+            ub.merge(batch)
+            for u in batch:
+                reference.updateWithSolution(u)
+            assert points(ub) == points(reference)
+            checkArrays(ub)
+        # the result is sorted and no solution dominates another one
+        assert points(ub) == sorted(points(ub))
+        for u in ub.solutions:
+            assert not any(v is not u and v.dominates(u)
+                           for v in ub.solutions)
@@ -0,0 +1,77 @@
+import pytest
+
+import params
+import util
+
+# clock moved by hand: work takes the given number of seconds
+class FakeClock:
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(util, 'clock', clock)
+    monkeypatch.setattr(util, 'ticksAtStart', 0.0, raising=False)
+    monkeypatch.setattr(util, 'longestWork', {})
+    monkeypatch.setattr(util, 'workInProgress', False)
+    monkeypatch.setattr(params, 'timeLimit', 10)
+    monkeypatch.setattr(params, 'timeReserve', 1.0)
+    return clock
+
+def work(clock, seconds, nested=None):
+    @util.reserved('work')
+    def run():
+        clock.time += seconds
+        if nested is not None:
+            nested()
+        return seconds
+    return run
+
+def testNoReserve(clock, monkeypatch):
+    monkeypatch.setattr(params, 'timeReservePolicy', 'none')
+    clock.time = 9.5
+    assert work(clock, 0.2)() == 0.2
+    assert util.longestWork['work'] == pytest.approx(0.2)
+    clock.time = 10.5
+    with pytest.raises(util.TimeLimitReachedException):
+        work(clock, 0.2)()
+
+def testFixedReserve(clock, monkeypatch):
+    monkeypatch.setattr(params, 'timeReservePolicy', 'fixed')
+    clock.time = 8.5
+    work(clock, 0.6)()
+    # less than timeReserve seconds left: the work is not started
+    with pytest.raises(util.TimeLimitReachedException):
+        work(clock, 0.2)()
+    assert clock.time == pytest.approx(9.1)
+
+def testLongestReserve(clock, monkeypatch):
+    monkeypatch.setattr(params, 'timeReservePolicy', 'longest')
+    work(clock, 3)()
+    work(clock, 1)()
+    assert util.longestWork['work'] == 3
+    clock.time = 6.5
+    work(clock, 0.6)()
+    with pytest.raises(util.TimeLimitReachedException):
+        work(clock, 0.1)()
+    assert clock.time == pytest.approx(7.1)
+
+def testNestedWorkIsNotChecked(clock, monkeypatch):
+    monkeypatch.setattr(params, 'timeReservePolicy', 'fixed')
+    clock.time = 8
+    # the nested work starts with less than the reserve left
+    work(clock, 1.5, nested=work(clock, 0.5))()
+    assert clock.time == 10
+    assert util.longestWork['work'] == 2
+    assert not util.workInProgress
+
+def testNoTimeLimit(clock, monkeypatch):
+    monkeypatch.setattr(params, 'timeLimit', None)
+    monkeypatch.setattr(params, 'timeReservePolicy', 'fixed')
+    clock.time = 100
+    work(clock, 1)()
+    assert util.longestWork == {}
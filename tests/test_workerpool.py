@@ -0,0 +1,56 @@
+import pytest
+
+import dummydata
+import integersolution
+import params
+import workerpool
+
+@pytest.fixture
+def dummy(monkeypatch, tmp_path):
+    instance = tmp_path / 'dummy.txt'
+    instance.write_text('')
+    for name, value in [ ('problemType', 'dummy'),
+                         ('inputFile', str(instance)),
+                         ('modelClass', dummydata.DummyModel) ]:
+        monkeypatch.setattr(params, name, value, raising=False)
+    return instance
+
+# UB solution whose variables are restored with the model of the process that
+# unpickles it
+def solution(z1, z2):
+    return integersolution.IntegerSolution(
+        z1=z1, z2=z2, variables={ dummydata.DummyVariable(0): 1 })
+
+def testTasksAreRun(dummy):
+    pool = workerpool.WorkerPool(2)
+    try:
+        pool.share([ solution(1, 2) ])
+        pool.submit(dummydata.double, 3)
+        pool.submit(dummydata.double, 4)
+        results = sorted(pool.result()[1] for i in range(2))
+        assert results == [ ([ (1, 2) ], 6), ([ (1, 2) ], 8) ]
+        assert not pool.busy()
+    finally:
+        pool.close()
+
+def testSetupErrorIsReported(dummy, monkeypatch):
+    monkeypatch.setattr(params, 'inputFile', str(dummy) + '.missing')
+    pool = workerpool.WorkerPool(1)
+    try:
+        # the task cannot be unpickled without a model
+        pool.share([ solution(1, 2) ])
+        pool.submit(dummydata.double, 3)
+        with pytest.raises(IOError):
+            pool.result()
+    finally:
+        pool.close()
+
+def testExitedWorkerIsReported(dummy):
+    pool = workerpool.WorkerPool(2)
+    try:
+        pool.submit(dummydata.exitWorker, 3)
+        with pytest.raises(workerpool.WorkerExitedException):
+            pool.result()
+    finally:
+        pool.close()
+    assert all(not w.is_alive() for w in pool.workers)
@@ -2,81 +2,81 @@ import string
 import sys
 import itertools
 import math
-import locale
+
+import numpy
 
 import util
 import basicdata
-from functools import reduce
+import instancecache
 
 validEpsilon = 0.9
 
 class Instance(basicdata.BasicData):
     def __init__(self, fName):
-        self.nPoints = 0
-        for line in open(fName):
-            # remove comments
-            line = line[:line.find('#')]
-            tokens = line.split()
-            if len(tokens) != 0:
-                # case where we read the first line
-                if self.nPoints == 0:
-                    self.nPoints = locale.atoi(tokens[0])
-                    self.nSamples, self.dmax1, self.dmax2, self.zeta = \
-                        [ locale.atoi(x) for x in tokens[3:] ] 
-                    # at this point we can initialise our data
-                    self.x, self.y, self.name = [], [], []
-                    self.w = [ 0 ]
-                    self.c = [ 0 ]
-                    self.gamma = [ 0 ]
-                    self.xi = {}
-                    self.d = {}
-                # case where we read info on a village
-                elif len(self.x) < self.nPoints:
-                    self.x.append( locale.atof(tokens[1]) )
-                    self.y.append( locale.atof(tokens[2]) )
-                    self.name.append( reduce( lambda x, y: x + ' ' + y,
-                                              tokens[3:] ) )
-                # one line of the distance matrix
-                elif len(self.d) < self.nPoints ** 2:
-                    row = len(self.d) / self.nPoints
-                    for col, tok in enumerate(tokens):
-                        self.d[row,col] = locale.atof(tok)
-                # read node cost
-                elif len(self.c) < self.nPoints:
-                    self.c.append( locale.atoi(tokens[1]) )
-                # read baseline demand
-                elif len(self.w) < self.nPoints:
-                    self.w.append( locale.atoi(tokens[1]) )
-                # read node capacity
-                elif len(self.gamma) < self.nPoints:
-                    self.gamma.append( locale.atoi(tokens[1]) )
-                # read sample scenario
-                elif len(self.xi) < self.nPoints * self.nSamples:
-                    scenario = len(self.xi) / self.nPoints
-                    for j, tok in enumerate(tokens):
-                        self.xi[0,scenario] = 0
-                        self.xi[j+1,scenario] = locale.atof(tok) / self.zeta
-                else:
-                    print('error: unexpected input')
-                    print(line)
-                    sys.exit(9)
+        arrays = instancecache.load(fName, 'uboflp-1', self.parse)
+        self.nPoints, self.nSamples, self.dmax1, self.dmax2, self.zeta = \
+            [ int(arrays[key]) for key in ('nPoints', 'nSamples', 'dmax1',
+                                           'dmax2', 'zeta') ]
+        self.x, self.y = arrays['x'], arrays['y']
+        self.name = arrays['name'].tolist()
+        # distance matrix
+        self.d = arrays['d']
+        # node cost, baseline demand and node capacity; there is no such data
+        # for node 0
+        self.c, self.w, self.gamma = arrays['c'], arrays['w'], arrays['gamma']
         # psi function for share of clients willing to go from i to j
         self.psi = lambda d: 1.0 if d <= self.dmax1 else \
             .5 if d <= self.dmax2 else 0
         # default values, could be modified by normalising
-        self.costBound = sum(self.c)
+        self.costBound = int(self.c.sum())
         self.coverageBound = 0
         # deterministic version: only one sample, every xi value is 1
         self.nSamples = 1
-        for i in range(self.nPoints):
-            self.xi[i, 0] = 1
+        self.xi = numpy.ones( (self.nPoints, self.nSamples) )
         #
-        self.z1Epsilon = util.listGCD(self.c)
+        self.z1Epsilon = util.listGCD(self.c.tolist())
         self.z2Epsilon = 1.0 / self.nSamples
         #
         print('z1Epsilon =', self.z1Epsilon)
         print('z2Epsilon =', self.z2Epsilon)
 
+    # arrays describing the instance file (see instancecache)
+    # sample scenarios are read but not kept: the deterministic version is
+    # solved
+    def parse(self, fName):
+        lines = []
+        for line in open(fName):
+            # remove comments
+            tokens = line.split('#')[0].split()
+            if len(tokens) != 0:
+                lines.append(tokens)
+        header = lines[0]
+        nPoints = int(header[0])
+        nSamples, dmax1, dmax2, zeta = [ int(x) for x in header[3:] ]
+        # villages, distance matrix, then cost, demand and capacity of every
+        # node but node 0, then one line per sample scenario
+        sections = []
+        start = 1
+        for length in (nPoints, nPoints, 3 * (nPoints - 1), nSamples):
+            sections.append(lines[start:start + length])
+            start += length
+        villages, distances, nodeData, scenarios = sections
+        if start < len(lines):
+            print('error: unexpected input')
+            print(' '.join(lines[start]))
+            sys.exit(9)
+        nodeValues = numpy.array([ int(row[1]) for row in nodeData ],
+                                 dtype=numpy.int64).reshape(3, nPoints - 1)
+        c, w, gamma = [ numpy.concatenate(([ 0 ], values))
+                        for values in nodeValues ]
+        return { 'nPoints': nPoints, 'nSamples': nSamples,
+                 'dmax1': dmax1, 'dmax2': dmax2, 'zeta': zeta,
+                 'x': numpy.array([ float(v[1]) for v in villages ]),
+                 'y': numpy.array([ float(v[2]) for v in villages ]),
+                 'name': numpy.array([ ' '.join(v[3:]) for v in villages ]),
+                 'd': numpy.array(distances, dtype=float),
+                 'c': c, 'w': w, 'gamma': gamma }
+
     def boundRight(self):
         return util.infinity
 
@@ -1,7 +1,11 @@
-from gurobipy import *
+import itertools
+
+import numpy
 
 import basiclp
 import integersolution
+import lpbackend
+import params
 import util
 
 import uboflpinstance
@@ -19,72 +23,86 @@ basiclp.integralityEpsilon = 1e-8
 
 class UBOFLPModel(basiclp.BasicLP):
     def __init__(self, data, relaxed=False):
-        self.model = Model('Bi-objective stochastic facility location problem')
-        self.model._parent = self
+        self.createModel('Bi-objective stochastic facility location problem')
+        backend = self.backend
         self.data = data
         # decision variables
         # fraction of the population at i assigned to j
+        nPoints, nSamples = data.nPoints, data.nSamples
         print(util.TS() + '\tcreating y variables')
-        self.y = {}
-        for i in range(data.nPoints):
-            for j in range(data.nPoints):
-                for k in range(data.nSamples):
-                    self.y[i,j,k] = \
-                    self.model.addVar( vtype=GRB.CONTINUOUS,
-                                       name='y_' + str(i) + \
-                                       ',' + str(j) + \
-                                       ',' + str(k),
-                                       ub=1 if data.d[i,j] <= data.dmax1 else 0)
+        # y[i,j,k] is at position (i * nPoints + j) * nSamples + k
+        triples = list(itertools.product(range(nPoints), range(nPoints),
+                                         range(nSamples)))
+        reachable = data.d <= data.dmax1
+        # names are given by variableName
+        names = lambda first, count: [ self.variableName(first + i)
+                                       for i in range(count) ] \
+            if params.modelNames else None
+        yVars = backend.addVars( len(triples),
+                                 ub=reachable.repeat(nSamples).astype(float),
+                                 names=names(0, len(triples)) )
+        self.y = dict(zip(triples, yVars))
         # 1 if facility is built, 0 otherwise
         print(util.TS() + '\tcreating z variables')
-        self.z = [ self.model.addVar(
-                vtype=GRB.CONTINUOUS if relaxed else GRB.BINARY,
-                lb=0.0, ub=1.0,
-                name='z_' + str(i) )
-                   for i in range(data.nPoints) ]
+        self.z = backend.addVars(
+            nPoints, lb=0.0, ub=1.0,
+            vtype=lpbackend.CONTINUOUS if relaxed else lpbackend.BINARY,
+            names=names(len(triples), nPoints) )
         self.integerVars = self.z
         # demand covered by facility j in sample k
         print(util.TS() + '\tcreating u variables')
-        self.u = {}
-        for j in range(data.nPoints):
-            for k in range(data.nSamples):
-                self.u[j,k] = self.model.addVar( vtype=GRB.CONTINUOUS,
-                                                 name='u_' + str(j) + \
-                                                     ',' + str(k) )
+        pairs = list(itertools.product(range(nPoints), range(nSamples)))
+        uVars = backend.addVars( len(pairs),
+                                 names=names(len(triples) + nPoints,
+                                             len(pairs)) )
+        self.u = dict(zip(pairs, uVars))
         print(util.TS() + '\tupdating model')
-        self.model.update()
+        backend.update()
         # objective functions
         print(util.TS() + '\tcreating objective expressions')
-        self.cost = LinExpr( [ c * 1.0 for c in data.c ], self.z )
-        self.coverage = LinExpr( [ 1.0  / data.nSamples
-                                   for i in self.u ],
-                                 list(self.u.values()) )
+        self.cost = backend.linExpr( data.c.astype(float), self.z )
+        self.coverage = backend.linExpr( numpy.full(len(uVars),
+                                                    1.0 / nSamples),
+                                         uVars )
         # constraints
-        # link demand covered and actual demand
+        # columns refer to positions in yVars + z + uVars
+        allVars = yVars + self.z + uVars
+        points = numpy.arange(nPoints)
+        samples = numpy.arange(nSamples)
+        yIndex = lambda i, j, k: (i * nPoints + j) * nSamples + k
+        zIndex = len(yVars) + points
+        uIndex = len(yVars) + nPoints + numpy.arange(len(uVars))
+        # link demand covered and actual demand: one row per (j, k), with
+        # u[j,k] followed by y[i,j,k] for every i
         print(util.TS() + '\tcreating constraints: link demand')
-        for j in range(data.nPoints):
-            for k in range(data.nSamples):
-                self.model.addConstr( \
-                    self.u[j,k] <= quicksum( self.y[i,j,k] * \
-                                             data.w[i] * data.xi[i,k]
-                                             for i in range(data.nPoints) ) )
+        j, k, i = numpy.meshgrid(points, samples, points, indexing='ij')
+        demand = data.w[:, None] * data.xi
+        backend.addRows( allVars,
+                         numpy.column_stack(
+                             (uIndex, yIndex(i, j, k).reshape(len(uVars),
+                                                              nPoints)) ),
+                         numpy.column_stack(
+                             (numpy.ones(len(uVars)),
+                              - demand[i, k].reshape(len(uVars),
+                                                     nPoints)) ),
+                         '<', 0 )
         # only go to a facility if it is open
         print(util.TS() + '\tcreating constraints: y < z')
-        for i in range(data.nPoints):
-            for j in range(data.nPoints):
-                for k in range(data.nSamples):
-                    self.model.addConstr( self.y[i,j,k] <= self.z[j] )
+        i, j, k = numpy.meshgrid(points, points, samples, indexing='ij')
+        backend.addRows( allVars,
+                         numpy.column_stack(
+                             (yIndex(i, j, k).ravel(), zIndex[j.ravel()]) ),
+                         [ 1, -1 ], '<', 0 )
         # don't cover demand more than once
         print(util.TS() + '\tcreating constraints: covered at most once')
-        for i in range(data.nPoints):
-            for k in range(data.nSamples):
-                self.model.addConstr( quicksum( self.y[i,j,k]
-                                                for j in range(data.nPoints)) \
-                                      <= 1 )
+        i, k, j = numpy.meshgrid(points, samples, points, indexing='ij')
+        backend.addRows( allVars,
+                         yIndex(i, j, k).reshape(nPoints * nSamples, nPoints),
+                         1, '<', 1 )
         print(util.TS() + '\tsetting various parameters')
         # stuff used in the bi-objective LB calculation
         self.wsEpsilon = 1e-5
-        self.model.update()
+        backend.update()
         self.setSolverParameters()
         # must be defined in order to benefit from methods inherited
         # from BasicLP
@@ -92,11 +110,26 @@ class UBOFLPModel(basiclp.BasicLP):
         self.z2Expr = data.coverageBound - self.coverage
         print(util.TS() + '\tconstruction of the model is done')
 
+    # y[i,j,k] comes first, at position (i * nPoints + j) * nSamples + k, then
+    # z[i] and u[j,k]
+    def variableName(self, index):
+        nPoints, nSamples = self.data.nPoints, self.data.nSamples
+        nY = nPoints * nPoints * nSamples
+        if index < nY:
+            ij, k = divmod(index, nSamples)
+            i, j = divmod(ij, nPoints)
+            return 'y_' + str(i) + ',' + str(j) + ',' + str(k)
+        elif index < nY + nPoints:
+            return 'z_' + str(index - nY)
+        else:
+            j, k = divmod(index - nY - nPoints, nSamples)
+            return 'u_' + str(j) + ',' + str(k)
+
     def setSolverParameters(self):
-        self.model.setParam('Threads', 1)
-        self.model.setParam('MIPGap', GurobiMIPGap)
-        self.model.setParam('FeasibilityTol', GurobiFeasibilityTolerance)
-        self.model.setParam('IntFeasTol', GurobiIntFeasTol)
-        self.model.setParam('NumericFocus', GurobiNumericFocus)
-        self.model.setParam('Outputflag', 0)
+        self.backend.setParams(threads=1,
+                               mipGap=GurobiMIPGap,
+                               feasibilityTol=GurobiFeasibilityTolerance,
+                               intFeasTol=GurobiIntFeasTol,
+                               numericFocus=GurobiNumericFocus,
+                               outputFlag=0)
 